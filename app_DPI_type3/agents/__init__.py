@@ -3,15 +3,18 @@ Agents 패키지
 동적 LLM 모델 리스트 기반 Multi-Agent 시스템
 """
 
-from .state import VideoAnalysisState, create_initial_state
-from .video_processor_agent import VideoProcessorAgent
+from .state import VideoAnalysisState, create_initial_state, apply_state_update
+from .video_processor_agent import VideoProcessorAgent, FrameGridCache, get_shared_frame_cache
 from .video_analyzer_agent import VideoAnalyzerAgent
 from .reporter_agent import ReporterAgent
 
 __all__ = [
     'VideoAnalysisState',
     'create_initial_state',
+    'apply_state_update',
     'VideoProcessorAgent',
+    'FrameGridCache',
+    'get_shared_frame_cache',
     'VideoAnalyzerAgent',
     'ReporterAgent'
 ]
@@ -12,6 +12,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import plotly.graph_objects as go
 from datetime import datetime
+import stage_metrics
+import ensemble_voting
 from .state import VideoAnalysisState
 
 
@@ -35,21 +37,39 @@ class ReporterAgent:
         'clean_inhaler'
     ]
     
-    def __init__(self):
+    def __init__(self, show_visualization: bool = True, voting_strategy: str = "majority",
+                 model_reliability: dict = None):
+        """
+        Args:
+            show_visualization: 시각화를 브라우저에서도 표시할지 여부 (배치 실행 시 False)
+            voting_strategy: 앙상블 투표 방식 (ensemble_voting.VOTING_STRATEGIES 중 하나)
+            model_reliability: voting_strategy="reliability"일 때 사용할 {모델 이름: 정확도}
+        """
+        if voting_strategy not in ensemble_voting.VOTING_STRATEGIES:
+            raise ValueError(f"알 수 없는 투표 방식: {voting_strategy}")
+        if voting_strategy == "reliability" and not model_reliability:
+            raise ValueError("reliability 투표에는 model_reliability가 필요합니다.")
         self.name = "ReporterAgent"
+        self.show_visualization = show_visualization
+        self.voting_strategy = voting_strategy
+        self.model_reliability = model_reliability
     
-    def process(self, state: VideoAnalysisState) -> VideoAnalysisState:
+    def process(self, state: VideoAnalysisState) -> dict:
         """
         최종 리포트 생성 (여러 모델의 평균값 사용)
         
         Args:
-            state: 현재 상태
+            state: 현재 상태 (변경하지 않음)
             
         Returns:
-            업데이트된 상태
+            상태 변경분 (평균값, final_report, visualization_path, status, agent_logs 또는 errors)
         """
+        agent_logs = []
+        # 리포트 생성 단계에서 채우는 값들을 담는 상태 사본 (최상위 키만 복사)
+        report_state = dict(state)
+        update = {}
         try:
-            state["agent_logs"].append({
+            agent_logs.append({
                 "agent": self.name,
                 "action": "start_reporting",
                 "message": "리포트 생성 시작 (평균값 계산)"
@@ -59,15 +79,19 @@ class ReporterAgent:
             num_models = len(state.get("model_results", {}))
             print(f"\n[{self.name}] {num_models}개 모델 결과의 평균값 계산 중...")
             avg_data = self._compute_average(state)
-            state["reference_times_avg"] = avg_data["reference_times_avg"]
-            state["promptbank_data_avg"] = avg_data["promptbank_data_avg"]
+            update["reference_times_avg"] = avg_data["reference_times_avg"]
+            update["promptbank_data_avg"] = avg_data["promptbank_data_avg"]
+            report_state.update(update)
             
             # 최종 리포트 생성
-            final_report = self._create_final_report(state)
-            state["final_report"] = final_report
+            final_report = self._create_final_report(report_state)
+            final_report["ensemble_voting"] = avg_data["voting"]
+            update["final_report"] = final_report
+            report_state["final_report"] = final_report
+            update["metrics"] = self._aggregate_metrics(state)
             
             # 시각화 생성 (평균값 사용)
-            visualization_fig = self._create_visualization(state)
+            visualization_fig = self._create_visualization(report_state)
             
             # 시각화 표시 및 HTML 파일로 저장
             if visualization_fig:
@@ -84,13 +108,14 @@ class ReporterAgent:
                 print(f"  브라우저에서 열기: file://{html_path}")
                 
                 # 브라우저에서도 표시
-                visualization_fig.show()
+                if self.show_visualization:
+                    visualization_fig.show()
                 
-                state["visualization_path"] = html_path
+                update["visualization_path"] = html_path
             
-            state["status"] = "completed"
+            update["status"] = "completed"
             
-            state["agent_logs"].append({
+            agent_logs.append({
                 "agent": self.name,
                 "action": "reporting_complete",
                 "message": "리포트 생성 완료"
@@ -101,13 +126,31 @@ class ReporterAgent:
             
         except Exception as e:
             error_msg = f"[{self.name}] 리포트 생성 중 오류: {str(e)}"
-            state["errors"].append(error_msg)
-            state["status"] = "error"
+            update["errors"] = [error_msg]
+            update["status"] = "error"
             print(error_msg)
             import traceback
             traceback.print_exc()
         
-        return state
+        update["agent_logs"] = agent_logs
+        return update
+    
+    def _aggregate_metrics(self, state: VideoAnalysisState) -> dict:
+        """
+        모델별 단계 계측(model_results[*]["metrics"]) 합계를 모아 비디오 전체 합계 생성
+        
+        Returns:
+            {"models": {model_id: 합계}, "video": 전체 합계}
+        """
+        model_totals = {
+            model_id: result["metrics"]["totals"]
+            for model_id, result in state.get("model_results", {}).items()
+            if result.get("metrics")
+        }
+        return {
+            "models": model_totals,
+            "video": stage_metrics.summarize(list(model_totals.values())),
+        }
     
     def _compute_average(self, state: VideoAnalysisState) -> dict:
         """
@@ -127,102 +170,14 @@ class ReporterAgent:
         num_models = len(model_results)
         print(f"[ReporterAgent] {num_models}개 모델의 결과를 평균 계산 중...")
         
-        # Reference times 평균
-        reference_times_avg = {}
-        all_ref_time_keys = set()
-        for model_id, result in model_results.items():
-            ref_times = result.get("reference_times", {})
-            all_ref_time_keys.update(ref_times.keys())
-        
-        for key in all_ref_time_keys:
-            values = []
-            for model_id, result in model_results.items():
-                ref_times = result.get("reference_times", {})
-                if key in ref_times:
-                    values.append(ref_times[key])
-            reference_times_avg[key] = round(sum(values) / len(values), 1) if values else 0
-        
-        # PromptBank 데이터 평균
-        # search_reference_time 평균
-        search_reference_time_avg = {}
-        all_search_ref_keys = set()
-        for model_id, result in model_results.items():
-            promptbank = result.get("promptbank_data", {})
-            search_ref = promptbank.get("search_reference_time", {})
-            all_search_ref_keys.update(search_ref.keys())
-        
-        for key in all_search_ref_keys:
-            ref_times = []
-            action = None
-            for model_id, result in model_results.items():
-                promptbank = result.get("promptbank_data", {})
-                search_ref = promptbank.get("search_reference_time", {})
-                if key in search_ref:
-                    ref_times.append(search_ref[key].get('reference_time', 0))
-                    if action is None:
-                        action = search_ref[key].get('action', '')
-            
-            avg_ref_time = round(sum(ref_times) / len(ref_times), 1) if ref_times else 0
-            search_reference_time_avg[key] = {
-                'action': action or '',
-                'reference_time': avg_ref_time
-            }
-        
-        # check_action_step_DPI_type3 평균
-        check_action_step_DPI_type3_avg = {}
-        all_action_keys = set()
-        for model_id, result in model_results.items():
-            promptbank = result.get("promptbank_data", {})
-            check_action = promptbank.get("check_action_step_DPI_type3", {})
-            all_action_keys.update(check_action.keys())
+        # Reference times 평균 (search_reference_time 포함)
+        reference_times_avg, search_reference_time_avg = ensemble_voting.average_reference_times(model_results)
         
-        for action_key in all_action_keys:
-            # 모든 모델에서 해당 action_key의 데이터 수집
-            all_times_scores = {}  # {time: [(score, confidence), ...]}
-            action_description = None
-            
-            for model_id, result in model_results.items():
-                promptbank = result.get("promptbank_data", {})
-                check_action = promptbank.get("check_action_step_DPI_type3", {})
-                if action_key in check_action:
-                    action_data = check_action[action_key]
-                    if action_description is None:
-                        action_description = action_data.get('action', '')
-                    
-                    times = action_data.get('time', [])
-                    scores = action_data.get('score', [])
-                    confidences = dict(action_data.get('confidence_score', []))
-                    
-                    for i, t in enumerate(times):
-                        if t not in all_times_scores:
-                            all_times_scores[t] = []
-                        score = scores[i] if i < len(scores) else 0
-                        confidence = confidences.get(t, 0.5)
-                        all_times_scores[t].append((score, confidence))
-            
-            # 각 시간에 대해 평균 계산
-            time_avg = []
-            score_avg = []
-            confidence_avg = []
-            
-            for t in sorted(all_times_scores.keys()):
-                score_conf_list = all_times_scores[t]
-                scores = [sc[0] for sc in score_conf_list]
-                confidences = [sc[1] for sc in score_conf_list]
-                
-                avg_score = sum(scores) / len(scores) if scores else 0
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0.5
-                
-                time_avg.append(t)
-                score_avg.append(1 if avg_score >= 0.5 else 0)
-                confidence_avg.append((t, round(avg_confidence, 2)))
-            
-            check_action_step_DPI_type3_avg[action_key] = {
-                'action': action_description or '',
-                'time': time_avg,
-                'score': score_avg,
-                'confidence_score': confidence_avg
-            }
+        # check_action_step_DPI_type3 평균: 모델 × 행동 × 시간 배열에서 선택한 방식으로 투표 / confidence 평균
+        vote_table = ensemble_voting.VoteTable.from_model_results(model_results)
+        check_action_step_DPI_type3_avg, voting_summary = ensemble_voting.vote(
+            vote_table, self.voting_strategy, self.model_reliability
+        )
         
         promptbank_data_avg = {
             "search_reference_time": search_reference_time_avg,
@@ -231,7 +186,8 @@ class ReporterAgent:
         
         return {
             "reference_times_avg": reference_times_avg,
-            "promptbank_data_avg": promptbank_data_avg
+            "promptbank_data_avg": promptbank_data_avg,
+            "voting": voting_summary
         }
     
     def _evaluate_decisions(self, reference_times_avg: dict, promptbank_data_avg: dict) -> dict:
@@ -6,7 +6,7 @@ LangGraph State 정의
 모든 Agent가 공유하는 상태를 정의합니다.
 """
 
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, get_type_hints
 from typing_extensions import Annotated
 import operator
 
@@ -48,7 +48,8 @@ class VideoAnalysisState(TypedDict):
                     "reference_times": {...},
                     "action_analysis_results": {...},
                     "q_answers_accumulated": {...},
-                    "promptbank_data": {...}
+                    "promptbank_data": {...},
+                    "metrics": {...}  # 탐지별/구간별 단계 계측 (stage_metrics)
                 },
                 "gpt-4o-mini_1": {...},
                 ...
@@ -61,6 +62,7 @@ class VideoAnalysisState(TypedDict):
         # 최종 결과
         final_report: 최종 분석 리포트
         visualization_path: 시각화 결과 경로
+        metrics: 단계별 소요 시간/토큰 합계 ({"models": {model_id: {...}}, "video": {...}})
         
         # 메타데이터
         errors: 발생한 오류들
@@ -86,6 +88,7 @@ class VideoAnalysisState(TypedDict):
     # 최종 결과 (병렬 실행 시 None이 아닌 값 우선)
     final_report: Annotated[Optional[Dict[str, Any]], keep_non_none]
     visualization_path: Annotated[Optional[str], keep_non_none]
+    metrics: Annotated[Optional[Dict[str, Any]], keep_non_none]
     
     # 메타데이터
     errors: Annotated[List[str], operator.add]
@@ -121,8 +124,43 @@ def create_initial_state(video_path: str, llm_models: List[str] = None, api_key:
         promptbank_data_avg=None,
         final_report=None,
         visualization_path=None,
+        metrics=None,
         errors=[],
         status="initialized",
         agent_logs=[]
     )
 
+
+
+_state_reducers = None
+
+
+def apply_state_update(state: VideoAnalysisState, update: Dict[str, Any]) -> VideoAnalysisState:
+    """
+    Agent(노드)가 반환한 변경분을 LangGraph와 같은 reducer 규칙으로 상태에 병합
+    그래프 밖에서 Agent의 process()를 직접 호출할 때 사용합니다.
+    
+    Args:
+        state: 현재 상태
+        update: 노드가 반환한 변경분 (예: {"agent_logs": [...], "status": "..."})
+        
+    Returns:
+        병합된 새 상태 (state는 변경하지 않음)
+    """
+    global _state_reducers
+    if _state_reducers is None:
+        hints = get_type_hints(VideoAnalysisState, include_extras=True)
+        _state_reducers = {
+            key: hint.__metadata__[0]
+            for key, hint in hints.items()
+            if getattr(hint, "__metadata__", None) and callable(hint.__metadata__[0])
+        }
+    
+    new_state = dict(state)
+    for key, value in update.items():
+        reducer = _state_reducers.get(key)
+        if reducer is not None and key in new_state:
+            new_state[key] = reducer(new_state[key], value)
+        else:
+            new_state[key] = value
+    return new_state
@@ -12,11 +12,274 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import re
+import time
+import asyncio
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 import class_PromptBank_251107 as PB
+import stage_metrics
+import tracing
 from .state import VideoAnalysisState
 from .video_processor_agent import VideoProcessorAgent
 
 
+# Provider별 동시 LLM 호출 상한 (모든 VideoAnalyzerAgent 인스턴스가 공유)
+PROVIDER_CONCURRENCY = {
+    "openai": 8,
+    "google": 4,
+}
+_provider_semaphores = {}
+_provider_semaphores_lock = threading.Lock()
+
+
+def get_provider_semaphore(provider: str) -> threading.BoundedSemaphore:
+    """provider별 공유 세마포어 반환 (PROVIDER_CONCURRENCY에 없으면 4)"""
+    with _provider_semaphores_lock:
+        if provider not in _provider_semaphores:
+            _provider_semaphores[provider] = threading.BoundedSemaphore(PROVIDER_CONCURRENCY.get(provider, 4))
+        return _provider_semaphores[provider]
+
+
+def configure_provider_concurrency(limits: dict):
+    """
+    provider별 동시 LLM 호출 상한 변경 (예: {"openai": 16, "google": 8})
+    분석을 시작하기 전에 호출해야 합니다. (이미 만들어진 세마포어는 새 상한으로 교체됨)
+    """
+    with _provider_semaphores_lock:
+        PROVIDER_CONCURRENCY.update(limits)
+        for provider in limits:
+            _provider_semaphores.pop(provider, None)
+
+
+# 비동기 실행 시 provider별 동시 LLM 호출 상한 (하나의 이벤트 루프에서 공유)
+ASYNC_PROVIDER_CONCURRENCY = {
+    "openai": 128,
+    "google": 64,
+}
+_async_provider_semaphores = weakref.WeakKeyDictionary()  # {event_loop: {provider: asyncio.Semaphore}}
+
+
+def get_async_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """현재 이벤트 루프에서 provider별로 공유되는 asyncio 세마포어 반환 (ASYNC_PROVIDER_CONCURRENCY에 없으면 32)"""
+    loop_semaphores = _async_provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if provider not in loop_semaphores:
+        loop_semaphores[provider] = asyncio.Semaphore(ASYNC_PROVIDER_CONCURRENCY.get(provider, 32))
+    return loop_semaphores[provider]
+
+
+class WindowResponseMemo:
+    """
+    파이프라인 모드에서 한 번의 분석(process 호출) 안의 탐지들이 공유하는 구간 질의 결과
+    키: (질의 문구, 구간 시작 시간), 값: 질의 future (동기: concurrent.futures.Future, 비동기: asyncio.Task)
+    취소되었거나 예외로 끝난 질의는 없는 것으로 보고 다시 질의합니다.
+    release()로 취소를 요청한 질의는 바로 memo에서 빼므로 취소가 처리되기 전에 다른 탐색에 내주지 않습니다.
+    """
+    
+    def __init__(self):
+        self._entries = {}  # {key: [future, 사용 중인 탐색 수]}
+        self._lock = threading.Lock()
+    
+    def acquire(self, user_prompt: str, window_start: float, create):
+        """
+        구간 질의 future를 가져오고, 없으면 create()로 만들어 등록
+        
+        Returns:
+            future, 기존 질의를 재사용했는지 여부
+        """
+        key = (user_prompt, round(window_start, 3))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._failed(entry[0]):
+                entry[1] += 1
+                return entry[0], True
+            future = create()
+            self._entries[key] = [future, 1]
+            return future, False
+    
+    def release(self, user_prompt: str, window_start: float, future) -> bool:
+        """
+        질의 결과를 쓰지 않고 버림. 다른 탐색도 쓰지 않으면 취소하고 memo에서 뺌
+        (asyncio.Task는 cancel() 후 이벤트 루프가 돌기 전까지 cancelled()가 False이므로 등록된 채로 두면 안 됨)
+        
+        Returns:
+            취소했는지 여부 (이미 실행 중인 동기 질의는 취소되지 않고 결과가 memo에 남음)
+        """
+        key = (user_prompt, round(window_start, 3))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not future:
+                return False  # 이미 빠졌거나 다시 질의한 항목으로 바뀜
+            entry[1] -= 1
+            if entry[1] > 0 or not future.cancel():
+                return False
+            del self._entries[key]
+            return True
+    
+    @staticmethod
+    def _failed(future) -> bool:
+        if future.cancelled():
+            return True
+        return future.done() and future.exception() is not None
+
+
+class _PipelineScan:
+    """파이프라인 모드에서 탐색 하나에 넘기는 옵션"""
+    
+    def __init__(self, memo: WindowResponseMemo, on_candidate=None, stop_event=None):
+        self.memo = memo
+        self.on_candidate = on_candidate  # YES 응답이 나온 구간 시작 시간을 받는 콜백 (다음 탐지 투기 실행)
+        self.stop_event = stop_event      # 투기적 탐색 중단 신호 (투기적 탐색에서만 사용)
+    
+    @property
+    def speculative(self) -> bool:
+        return self.stop_event is not None
+    
+    def stopped(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
+
+
+class _SpeculativeDetector:
+    """
+    파이프라인 모드: 이전 기준 시점의 후보(YES 응답)가 나오면 다음 기준 시점 탐지를 그 시간부터 미리 실행
+    투기적 탐지의 결과는 쓰지 않고 구간 질의만 memo에 남기며, 이전 기준 시점이 확정된 뒤
+    실제 탐지가 같은 구간의 질의를 재사용합니다. (후보가 확정값과 다르면 겹치는 구간만 재사용)
+    투기적 탐지의 계측(질의 수, 지연 등)은 실제 탐지와 섞이지 않도록 metrics에 따로 기록합니다.
+    """
+    
+    def __init__(self, agent, reference_key: str, video_path: str, play_time: float, memo: WindowResponseMemo,
+                 metrics: stage_metrics.StageMetrics = None):
+        self.agent = agent
+        self.reference_key = reference_key
+        self.video_path = video_path
+        self.play_time = play_time
+        self.memo = memo
+        self.metrics = metrics
+        self.parent_span = tracing.current_span()
+        self._lock = threading.Lock()
+        self._start_time = None
+        self._stop_event = None
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=2)
+    
+    def on_candidate(self, candidate_time: float):
+        """후보 시간이 지금 실행 중인 투기적 탐지보다 이르면 그 시간부터 다시 시작"""
+        with self._lock:
+            if self._stopped or (self._start_time is not None and candidate_time >= self._start_time):
+                return
+            if self._stop_event is not None:
+                self._stop_event.set()
+            self._start_time = candidate_time
+            self._stop_event = threading.Event()
+            self._launch(candidate_time, self._stop_event)
+    
+    def _launch(self, start_time: float, stop_event):
+        self._executor.submit(self._run, start_time, stop_event)
+    
+    def _run(self, start_time: float, stop_event):
+        with stage_metrics.recording(self.metrics), \
+                tracing.span(f"speculate_{self.reference_key}", parent=self.parent_span, start_time=start_time):
+            try:
+                self.agent._detect(self.reference_key, self.video_path, self.play_time, start_time,
+                                   _PipelineScan(self.memo, stop_event=stop_event))
+            except Exception:
+                stage_metrics.record("speculative_errors", 1)  # 실패한 구간은 실제 탐지에서 다시 질의함
+    
+    def stop(self):
+        """이전 기준 시점이 확정되면 투기적 탐지 중단 (이미 보낸 질의는 memo에 남음)"""
+        with self._lock:
+            self._stopped = True
+            if self._stop_event is not None:
+                self._stop_event.set()
+        self._executor.shutdown(wait=False)
+
+
+class _AsyncSpeculativeDetector(_SpeculativeDetector):
+    """_SpeculativeDetector의 비동기 버전 (투기적 탐지를 이벤트 루프의 태스크로 실행)"""
+    
+    def __init__(self, agent, reference_key: str, video_path: str, play_time: float, memo: WindowResponseMemo,
+                 metrics: stage_metrics.StageMetrics = None):
+        super().__init__(agent, reference_key, video_path, play_time, memo, metrics)
+        self._executor = None
+        self._tasks = []
+    
+    def _launch(self, start_time: float, stop_event):
+        self._tasks.append(asyncio.ensure_future(self._arun(start_time, stop_event)))
+    
+    async def _arun(self, start_time: float, stop_event):
+        # 콜백의 컨텍스트를 물려받으므로 실제 탐지의 계측 기록기에 섞이지 않도록 투기적 탐지의 기록기로 바꿈
+        with stage_metrics.recording(self.metrics), \
+                tracing.span(f"speculate_{self.reference_key}", parent=self.parent_span, start_time=start_time):
+            try:
+                await self.agent._adetect(self.reference_key, self.video_path, self.play_time, start_time,
+                                          _PipelineScan(self.memo, stop_event=stop_event))
+            except Exception:
+                stage_metrics.record("speculative_errors", 1)  # 실패한 구간은 실제 탐지에서 다시 질의함
+    
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            if self._stop_event is not None:
+                self._stop_event.set()
+        for task in self._tasks:
+            task.cancel()
+
+
+class _CombinedDetection:
+    """
+    통합 질의 모드에서 한 번의 구간 스캔으로 묶인 기준 시점들을 순서대로 판정
+    구간마다 현재 탐지 중인 기준 시점의 답을 보고, YES이면 같은 구간에서 다음 기준 시점을 이어서 판정합니다.
+    (순차 탐지에서 다음 탐지가 이전 기준 시간의 구간부터 시작하는 것과 같은 규칙)
+    """
+    
+    def __init__(self, agent, reference_order: list):
+        self.agent = agent
+        self.reference_order = reference_order
+        self.stage = 0
+        self.scanned = {key: [] for key in reference_order}    # {기준 시점: [(구간 시작, Q 답변, Q 신뢰도), ...]}
+        self.yes_index = {key: None for key in reference_order}  # {기준 시점: 첫 YES 구간의 scanned 인덱스}
+        self.last_window = None
+    
+    def interpret(self, start_time: float, response: str):
+        """구간 응답 하나를 판정하고, 묶인 기준 시점을 모두 찾았으면 YES 반환 (_scan_windows의 interpret)"""
+        self.last_window = (start_time, response)
+        self._advance(start_time, response)
+        return ("YES" if self.stage >= len(self.reference_order) else "NO"), {}, {}
+    
+    def _advance(self, start_time: float, response: str):
+        while self.stage < len(self.reference_order):
+            reference_key = self.reference_order[self.stage]
+            prefix = f"{reference_key}_"
+            q_answers, q_confidence = self.agent._parse_q_answers(response, prefix)
+            self.scanned[reference_key].append((start_time, q_answers, q_confidence))
+            if self.agent._parse_overall_answer(response, prefix) != "YES":
+                return
+            self.yes_index[reference_key] = len(self.scanned[reference_key]) - 1
+            self.stage += 1
+    
+    def results(self, end_start_time: float, offset_time: float) -> dict:
+        """
+        기준 시점별 (기준 시간, 시간 순서대로 누적된 Q 답변)
+        영상 끝까지 YES가 없던 기준 시점은 마지막 구간 시작 시간을 사용하고, 그 뒤의 기준 시점들은
+        순차 탐지와 같이 마지막 구간만 판정 (마지막 구간의 응답을 재사용)
+        """
+        if self.last_window is not None:
+            for index in range(self.stage + 1, len(self.reference_order)):
+                if not self.scanned[self.reference_order[index]]:
+                    self.stage = index
+                    self._advance(*self.last_window)
+        
+        results = {}
+        for reference_key in self.reference_order:
+            scanned = self.scanned[reference_key]
+            windows = [(start, start + offset_time) for start, _, _ in scanned]
+            results[reference_key] = self.agent._finalize_search(
+                windows, scanned, self.yes_index[reference_key], end_start_time, offset_time
+            )
+        return results
+
+
 class VideoAnalyzerAgent:
     """
     비디오 분석 통합 Agent (Generic)
@@ -33,171 +296,444 @@ class VideoAnalyzerAgent:
        - 시간대별 행동 매핑
     """
     
-    def __init__(self, mllm, video_processor: VideoProcessorAgent, model_id: str, model_name: str):
+    # 기준 시점 탐지 순서 (각 탐지는 이전 기준 시간부터 탐색)
+    REFERENCE_ORDER = ['inhalerIN', 'faceONinhaler', 'inhalerOUT']
+    
+    # 기준 시점별 탐지 질의 생성 메서드
+    DETECTOR_QUERIES = {
+        'inhalerIN': '_inhaler_in_query',
+        'faceONinhaler': '_face_on_inhaler_query',
+        'inhalerOUT': '_inhaler_out_query',
+    }
+    
+    # 기준 시점별 Q번호 -> 행동 키 매핑 (PromptBank 저장용)
+    Q_MAPPINGS = {
+        'inhalerIN': {'Q1': 'sit_stand'},
+        'faceONinhaler': {
+            'Q1': 'sit_stand',
+            'Q2': 'load_dose',
+            'Q3': 'remove_cover',
+            'Q4': 'inspect_mouthpiece',
+            'Q5': 'hold_inhaler',
+            'Q6': 'exhale_before'
+        },
+        'inhalerOUT': {
+            'Q1': 'seal_lips',
+            'Q2': 'inhale_deeply',
+            'Q3': 'remove_inhaler',
+            'Q4': 'hold_breath',
+            'Q5': 'exhale_after',
+            'Q6': 'clean_inhaler'
+        },
+    }
+    
+    # 기준 시간 탐색 전략 (이름 -> 계획 제너레이터 메서드)
+    SEARCH_STRATEGIES = {
+        "linear": "_plan_linear",
+        "coarse_to_fine": "_plan_coarse_to_fine",
+    }
+    
+    def __init__(self, mllm, video_processor: VideoProcessorAgent, model_id: str, model_name: str,
+                 speculative_windows: int = 1, search_strategy: str = "linear", coarse_stride: int = 4,
+                 pipeline_detectors: bool = False, combined_query: bool = False):
         """
         Args:
             mllm: Multimodal LLM 인스턴스
             video_processor: VideoProcessorAgent 인스턴스
             model_id: 모델 고유 ID (예: "gpt-4o_0", "gpt-4o-mini_1")
             model_name: 모델 이름 (예: "gpt-4o", "gpt-4o-mini")
+            speculative_windows: 기준 시간 탐색 시 미리 동시에 질의할 구간 수 (1이면 순차 탐색)
+            search_strategy: 기준 시간 탐색 전략 ("linear" 또는 "coarse_to_fine")
+            coarse_stride: coarse_to_fine 전략에서 1차 탐색의 구간 간격 (원래 구간 단위)
+                (기준 시간은 linear와 같지만 누적 Q 답변은 질의한 구간의 것만 남음)
+            pipeline_detectors: 이전 기준 시점의 후보가 나오면 다음 기준 시점 탐지를 미리 시작할지 여부
+                (확정 후 같은 구간의 질의를 재사용하므로 최종 결과는 순차 탐지와 동일)
+            combined_query: 구간 길이가 같은 연속 기준 시점 질의를 구간마다 한 번의 LLM 호출로 묻는 통합 질의 모드 여부
+                (inhalerIN은 자기 2.0초 구간으로, 확정 후 faceONinhaler / inhalerOUT은 0.5초 구간 하나의 스캔으로 탐지.
+                묶인 탐지는 search_strategy / pipeline_detectors를 사용하지 않음)
         """
         self.mllm = mllm
         self.video_processor = video_processor
         self.model_id = model_id
         self.model_name = model_name
+        self.speculative_windows = max(1, speculative_windows)
+        self.search_strategy = search_strategy
+        self.coarse_stride = coarse_stride
+        self.pipeline_detectors = pipeline_detectors
+        self.combined_query = combined_query
         self.name = f"VideoAnalyzerAgent_{model_id}"
+        # 질의 문구 템플릿 전용 (읽기만 함). 탐지 결과는 실행마다 새 PromptBank에 저장하므로
+        # 같은 Agent로 여러 비디오를 (동시에) 분석해도 결과가 섞이거나 누적되지 않음
         self.promptbank = PB.PromptBank()
     
-    def process(self, state: VideoAnalysisState) -> VideoAnalysisState:
+    def process(self, state: VideoAnalysisState) -> dict:
         """
         기준 시점 탐지 및 행동 단계 분석을 수행
         
         Args:
-            state: 현재 상태
+            state: 현재 상태 (변경하지 않음)
             
         Returns:
-            업데이트된 상태
+            상태 변경분 (이 모델의 model_results 항목과 agent_logs, 실패 시 errors/status)
         """
+        agent_logs = []
         try:
-            video_path = state["video_path"]
-            video_info = state["video_info"]
-            play_time = video_info["play_time"]
-            
-            state["agent_logs"].append({
-                "agent": self.name,
-                "action": "start_analysis",
-                "message": f"비디오 분석 시작 (기준 시점 탐지 + 행동 분석) - {self.model_name}"
-            })
+            video_path, play_time = self._start_analysis(state, agent_logs)
             
             # ========================================
             # Part 1: 기준 시점 탐지
             # ========================================
             print(f"\n[{self.name}] 기준 시점 탐지 시작...")
             
-            # 1. inhalerIN 탐지
-            print(f"\n[{self.name}] inhalerIN 탐지 시작...")
-            ref_time_in, q_answers_in = self._detect_inhaler_in(
-                video_path, play_time, start_time=0.0
-            )
-            # PromptBank에 저장
-            q_mapping_in = {'Q1': 'sit_stand'}
-            self.promptbank.save_to_promptbank('inhalerIN', ref_time_in, q_answers_in, q_mapping_in)
-            
-            print(f"[{self.name}] inhalerIN 탐지 완료: {ref_time_in}초")
-            
-            # 2. faceONinhaler 탐지
-            print(f"\n[{self.name}] faceONinhaler 탐지 시작...")
-            ref_time_face, q_answers_face = self._detect_face_on_inhaler(
-                video_path, play_time, start_time=ref_time_in
-            )
-            # PromptBank에 저장
-            q_mapping_face = {
-                'Q1': 'sit_stand',
-                'Q2': 'load_dose',
-                'Q3': 'remove_cover',
-                'Q4': 'inspect_mouthpiece',
-                'Q5': 'hold_inhaler',
-                'Q6': 'exhale_before'
-            }
-            self.promptbank.save_to_promptbank('faceONinhaler', ref_time_face, q_answers_face, q_mapping_face)
-            
-            print(f"[{self.name}] faceONinhaler 탐지 완료: {ref_time_face}초")
-            
-            # 3. inhalerOUT 탐지
-            print(f"\n[{self.name}] inhalerOUT 탐지 시작...")
-            ref_time_out, q_answers_out = self._detect_inhaler_out(
-                video_path, play_time, start_time=ref_time_face
-            )
-            # PromptBank에 저장
-            q_mapping_out = {
-                'Q1': 'seal_lips',
-                'Q2': 'inhale_deeply',
-                'Q3': 'remove_inhaler',
-                'Q4': 'hold_breath',
-                'Q5': 'exhale_after',
-                'Q6': 'clean_inhaler'
-            }
-            self.promptbank.save_to_promptbank('inhalerOUT', ref_time_out, q_answers_out, q_mapping_out)
+            # inhalerIN -> faceONinhaler -> inhalerOUT 순서로, 이전 기준 시간부터 탐색
+            promptbank = PB.PromptBank()  # 이번 실행의 탐지 결과 저장용
+            reference_times = {}
+            q_answers_accumulated = {}
+            detector_metrics = {}  # 탐지별 계측 (구간별 기록 포함)
+            analysis_start = time.perf_counter()
+            if self.combined_query:
+                detections = self._detect_combined(video_path, play_time, detector_metrics)
+            else:
+                detections = self._detect_sequential(video_path, play_time, detector_metrics)
+            for reference_key in self.REFERENCE_ORDER:
+                ref_time, q_answers = detections[reference_key]
+                self._save_detection(promptbank, reference_key, ref_time, q_answers, reference_times, q_answers_accumulated)
             
-            print(f"[{self.name}] inhalerOUT 탐지 완료: {ref_time_out}초")
+            metrics = self._summarize_metrics(detector_metrics, time.perf_counter() - analysis_start)
+            return self._finish_analysis(promptbank, reference_times, q_answers_accumulated, agent_logs, metrics)
             
-            # PromptBank 데이터 저장
-            promptbank_data = {
-                "search_reference_time": self.promptbank.search_reference_time,
-                "check_action_step_DPI_type3": self.promptbank.check_action_step_DPI_type3
-            }
+        except Exception as e:
+            return self._record_error(e, agent_logs)
+    
+    def _detect_sequential(self, video_path: str, play_time: float, detector_metrics: dict) -> dict:
+        """
+        inhalerIN -> faceONinhaler -> inhalerOUT 순서로, 이전 기준 시간부터 탐지
+        
+        Returns:
+            {기준 시점: (기준 시간, Q 답변)}
+        """
+        detections = {}
+        memo = WindowResponseMemo() if self.pipeline_detectors else None
+        start_time = 0.0
+        for index, reference_key in enumerate(self.REFERENCE_ORDER):
+            print(f"\n[{self.name}] {reference_key} 탐지 시작...")
+            speculation, pipeline = self._start_pipeline(index, video_path, play_time, memo, _SpeculativeDetector,
+                                                         detector_metrics)
+            detector_metrics[reference_key] = stage_metrics.StageMetrics()
+            try:
+                with stage_metrics.recording(detector_metrics[reference_key]), \
+                        tracing.span(f"detect_{reference_key}", model=self.model_name, start_time=start_time) as detect_span:
+                    ref_time, q_answers = self._detect(reference_key, video_path, play_time, start_time, pipeline)
+                    detect_span.set_attribute("reference_time", ref_time)
+            finally:
+                if speculation is not None:
+                    speculation.stop()
+            detections[reference_key] = (ref_time, q_answers)
+            start_time = ref_time
+        return detections
+    
+    async def aprocess(self, state: VideoAnalysisState) -> dict:
+        """
+        process()의 비동기 버전 (LLM 질의를 mllm.aquery로 이벤트 루프에서 수행)
+        
+        Args:
+            state: 현재 상태 (변경하지 않음)
             
-            reference_times = {
-                "inhalerIN": ref_time_in,
-                "faceONinhaler": ref_time_face,
-                "inhalerOUT": ref_time_out
-            }
+        Returns:
+            상태 변경분 (이 모델의 model_results 항목과 agent_logs, 실패 시 errors/status)
+        """
+        agent_logs = []
+        try:
+            video_path, play_time = self._start_analysis(state, agent_logs)
             
-            q_answers_accumulated = {
-                "inhalerIN": q_answers_in,
-                "faceONinhaler": q_answers_face,
-                "inhalerOUT": q_answers_out
-            }
+            print(f"\n[{self.name}] 기준 시점 탐지 시작...")
             
-            state["agent_logs"].append({
-                "agent": self.name,
-                "action": "reference_detection_complete",
-                "message": f"기준 시점 탐지 완료: IN={ref_time_in}초, FACE={ref_time_face}초, OUT={ref_time_out}초"
-            })
+            promptbank = PB.PromptBank()  # 이번 실행의 탐지 결과 저장용
+            reference_times = {}
+            q_answers_accumulated = {}
+            detector_metrics = {}
+            analysis_start = time.perf_counter()
+            if self.combined_query:
+                detections = await self._adetect_combined(video_path, play_time, detector_metrics)
+            else:
+                detections = await self._adetect_sequential(video_path, play_time, detector_metrics)
+            for reference_key in self.REFERENCE_ORDER:
+                ref_time, q_answers = detections[reference_key]
+                self._save_detection(promptbank, reference_key, ref_time, q_answers, reference_times, q_answers_accumulated)
             
-            # ========================================
-            # Part 2: 행동 단계 분석
-            # ========================================
-            print(f"\n[{self.name}] 행동 단계 분석 시작...")
+            metrics = self._summarize_metrics(detector_metrics, time.perf_counter() - analysis_start)
+            return self._finish_analysis(promptbank, reference_times, q_answers_accumulated, agent_logs, metrics)
             
-            if promptbank_data:
-                # 행동 분석 결과 생성
-                action_summary = self._create_action_summary(promptbank_data)
-                
-                state["agent_logs"].append({
-                    "agent": self.name,
-                    "action": "action_analysis_complete",
-                    "message": f"행동 단계 분석 완료: {len(action_summary)}개 행동 인식"
-                })
-                
-                print(f"[{self.name}] 행동 단계 분석 완료: {len(action_summary)}개 행동")
+        except Exception as e:
+            return self._record_error(e, agent_logs)
+    
+    async def _adetect_sequential(self, video_path: str, play_time: float, detector_metrics: dict) -> dict:
+        """_detect_sequential()의 비동기 버전"""
+        detections = {}
+        memo = WindowResponseMemo() if self.pipeline_detectors else None
+        start_time = 0.0
+        for index, reference_key in enumerate(self.REFERENCE_ORDER):
+            print(f"\n[{self.name}] {reference_key} 탐지 시작...")
+            speculation, pipeline = self._start_pipeline(index, video_path, play_time, memo, _AsyncSpeculativeDetector,
+                                                         detector_metrics)
+            detector_metrics[reference_key] = stage_metrics.StageMetrics()
+            try:
+                with stage_metrics.recording(detector_metrics[reference_key]), \
+                        tracing.span(f"detect_{reference_key}", model=self.model_name, start_time=start_time) as detect_span:
+                    ref_time, q_answers = await self._adetect(reference_key, video_path, play_time, start_time, pipeline)
+                    detect_span.set_attribute("reference_time", ref_time)
+            finally:
+                if speculation is not None:
+                    speculation.stop()
+            detections[reference_key] = (ref_time, q_answers)
+            start_time = ref_time
+        return detections
+    
+    def _detect_combined(self, video_path: str, play_time: float, detector_metrics: dict) -> dict:
+        """
+        통합 질의 모드: 구간 길이가 같은 연속 기준 시점끼리 묶어, 묶음마다 영상을 한 번만 훑어 탐지
+        각 묶음은 이전 묶음의 기준 시간부터 자기 구간 길이(기본 해상도)로 탐색하므로,
+        inhalerIN이 확정되기 전에는 inhalerIN의 2.0초 구간만 질의하고 그 뒤에는 남은 탐지만 0.5초 구간으로 질의함
+        
+        Returns:
+            {기준 시점: (기준 시간, Q 답변)}
+        """
+        detections = {}
+        start_time = 0.0
+        for group in self._combined_groups():
+            if len(group) == 1:
+                reference_key = group[0]
+                print(f"\n[{self.name}] {reference_key} 탐지 시작...")
+                detector_metrics[reference_key] = stage_metrics.StageMetrics()
+                with stage_metrics.recording(detector_metrics[reference_key]), \
+                        tracing.span(f"detect_{reference_key}", model=self.model_name, start_time=start_time):
+                    detections[reference_key] = self._detect(reference_key, video_path, play_time, start_time)
             else:
-                raise ValueError("PromptBank 데이터가 생성되지 않았습니다")
-            
-            # 동적 모델별 결과 저장
-            state["model_results"][self.model_id] = {
-                "reference_times": reference_times,
-                "action_analysis_results": action_summary,
-                "q_answers_accumulated": q_answers_accumulated,
-                "promptbank_data": promptbank_data
+                print(f"\n[{self.name}] 통합 질의로 {', '.join(group)} 탐지 시작...")
+                system_prompt, user_prompt, segment_time = self._combined_query(group)
+                M, N, gridSize, windows, end_start_time = self._build_search_windows(
+                    play_time, start_time, segment_time, segment_time, segment_time / 10.0
+                )
+                combined = _CombinedDetection(self, group)
+                group_key = "+".join(group)
+                detector_metrics[group_key] = stage_metrics.StageMetrics()
+                with stage_metrics.recording(detector_metrics[group_key]), \
+                        tracing.span("detect_combined", model=self.model_name, start_time=start_time):
+                    self._scan_windows(video_path, system_prompt, user_prompt, windows, M, N, gridSize,
+                                       interpret=combined.interpret)
+                detections.update(combined.results(end_start_time, segment_time))
+            start_time = detections[group[-1]][0]
+        return detections
+    
+    async def _adetect_combined(self, video_path: str, play_time: float, detector_metrics: dict) -> dict:
+        """_detect_combined()의 비동기 버전"""
+        detections = {}
+        start_time = 0.0
+        for group in self._combined_groups():
+            if len(group) == 1:
+                reference_key = group[0]
+                print(f"\n[{self.name}] {reference_key} 탐지 시작...")
+                detector_metrics[reference_key] = stage_metrics.StageMetrics()
+                with stage_metrics.recording(detector_metrics[reference_key]), \
+                        tracing.span(f"detect_{reference_key}", model=self.model_name, start_time=start_time):
+                    detections[reference_key] = await self._adetect(reference_key, video_path, play_time, start_time)
+            else:
+                print(f"\n[{self.name}] 통합 질의로 {', '.join(group)} 탐지 시작...")
+                system_prompt, user_prompt, segment_time = self._combined_query(group)
+                M, N, gridSize, windows, end_start_time = self._build_search_windows(
+                    play_time, start_time, segment_time, segment_time, segment_time / 10.0
+                )
+                combined = _CombinedDetection(self, group)
+                group_key = "+".join(group)
+                detector_metrics[group_key] = stage_metrics.StageMetrics()
+                with stage_metrics.recording(detector_metrics[group_key]), \
+                        tracing.span("detect_combined", model=self.model_name, start_time=start_time):
+                    await self._ascan_windows(video_path, system_prompt, user_prompt, windows, M, N, gridSize,
+                                              interpret=combined.interpret)
+                detections.update(combined.results(end_start_time, segment_time))
+            start_time = detections[group[-1]][0]
+        return detections
+    
+    def _combined_groups(self) -> list:
+        """
+        REFERENCE_ORDER를 구간 길이(segment_time)가 같은 연속 기준 시점끼리 묶은 목록
+        (기본 질의: [['inhalerIN'], ['faceONinhaler', 'inhalerOUT']])
+        """
+        groups = []
+        previous_segment = None
+        for reference_key in self.REFERENCE_ORDER:
+            segment_time = getattr(self, self.DETECTOR_QUERIES[reference_key])()[2]
+            if groups and segment_time == previous_segment:
+                groups[-1].append(reference_key)
+            else:
+                groups.append([reference_key])
+            previous_segment = segment_time
+        return groups
+    
+    def _start_analysis(self, state: VideoAnalysisState, agent_logs: list):
+        """분석 시작 로그를 남기고 (video_path, play_time) 반환"""
+        video_path = state["video_path"]
+        video_info = state["video_info"]
+        play_time = video_info["play_time"]
+        
+        # VideoProcessorAgent가 만든 프레임 저장소가 있으면 디코딩 대신 사용 (다른 프로세스에서 실행될 때도)
+        if video_info.get("frame_store_path"):
+            self.video_processor.attach_frame_store(video_path, video_info["frame_store_path"])
+        
+        agent_logs.append({
+            "agent": self.name,
+            "action": "start_analysis",
+            "message": f"비디오 분석 시작 (기준 시점 탐지 + 행동 분석) - {self.model_name}"
+        })
+        return video_path, play_time
+    
+    def _start_pipeline(self, index: int, video_path: str, play_time: float, memo, speculation_cls,
+                        detector_metrics: dict):
+        """
+        파이프라인 모드에서 REFERENCE_ORDER[index] 탐지에 넘길 옵션과 다음 탐지의 투기적 실행기 생성
+        투기적 실행기의 계측은 detector_metrics["speculate_<다음 기준 시점>"]에 기록
+        
+        Returns:
+            speculation: 다음 기준 시점의 투기적 실행기 (마지막 탐지이거나 파이프라인 모드가 아니면 None)
+            pipeline: _PipelineScan (파이프라인 모드가 아니면 None)
+        """
+        if memo is None:
+            return None, None
+        speculation = None
+        if index + 1 < len(self.REFERENCE_ORDER):
+            next_key = self.REFERENCE_ORDER[index + 1]
+            detector_metrics[f"speculate_{next_key}"] = stage_metrics.StageMetrics()
+            speculation = speculation_cls(self, next_key, video_path, play_time, memo,
+                                          detector_metrics[f"speculate_{next_key}"])
+        return speculation, _PipelineScan(memo, on_candidate=speculation.on_candidate if speculation else None)
+    
+    def _save_detection(self, promptbank, reference_key: str, ref_time: float, q_answers: dict,
+                        reference_times: dict, q_answers_accumulated: dict):
+        """기준 시점 탐지 결과를 이번 실행의 PromptBank와 결과 딕셔너리에 저장"""
+        promptbank.save_to_promptbank(reference_key, ref_time, q_answers, self.Q_MAPPINGS[reference_key])
+        reference_times[reference_key] = ref_time
+        q_answers_accumulated[reference_key] = q_answers
+        
+        print(f"[{self.name}] {reference_key} 탐지 완료: {ref_time}초")
+    
+    def _summarize_metrics(self, detector_metrics: dict, elapsed: float) -> dict:
+        """탐지별 구간 기록을 합산하여 이 모델의 계측 결과 생성"""
+        detectors = {}
+        for reference_key, metrics in detector_metrics.items():
+            detectors[reference_key] = {
+                "windows": metrics.windows,
+                "totals": stage_metrics.summarize(metrics.windows + [metrics.to_dict()]),
             }
+        return {
+            "detectors": detectors,
+            "totals": stage_metrics.summarize([detector["totals"] for detector in detectors.values()]),
+            "wall_ms": round(elapsed * 1000.0, 2),
+        }
+    
+    def _finish_analysis(self, promptbank, reference_times: dict, q_answers_accumulated: dict, agent_logs: list,
+                         metrics: dict = None) -> dict:
+        """행동 단계 분석을 수행하고 모델별 결과를 상태 변경분으로 반환"""
+        # PromptBank 데이터 저장
+        promptbank_data = {
+            "search_reference_time": promptbank.search_reference_time,
+            "check_action_step_DPI_type3": promptbank.check_action_step_DPI_type3
+        }
+        
+        agent_logs.append({
+            "agent": self.name,
+            "action": "reference_detection_complete",
+            "message": f"기준 시점 탐지 완료: IN={reference_times['inhalerIN']}초, FACE={reference_times['faceONinhaler']}초, OUT={reference_times['inhalerOUT']}초"
+        })
+        
+        # ========================================
+        # Part 2: 행동 단계 분석
+        # ========================================
+        print(f"\n[{self.name}] 행동 단계 분석 시작...")
+        
+        if promptbank_data:
+            # 행동 분석 결과 생성
+            action_summary = self._create_action_summary(promptbank_data)
             
-            # 최종 상태 업데이트
-            state["agent_logs"].append({
+            agent_logs.append({
                 "agent": self.name,
-                "action": "complete",
-                "message": f"비디오 분석 완료 (기준 시점 탐지 + 행동 분석) - {self.model_name}"
+                "action": "action_analysis_complete",
+                "message": f"행동 단계 분석 완료: {len(action_summary)}개 행동 인식"
             })
             
-        except Exception as e:
-            error_msg = f"[{self.name}] 비디오 분석 중 오류: {str(e)}"
-            state["errors"].append(error_msg)
-            state["status"] = "error"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            print(f"[{self.name}] 행동 단계 분석 완료: {len(action_summary)}개 행동")
+        else:
+            raise ValueError("PromptBank 데이터가 생성되지 않았습니다")
+        
+        agent_logs.append({
+            "agent": self.name,
+            "action": "complete",
+            "message": f"비디오 분석 완료 (기준 시점 탐지 + 행동 분석) - {self.model_name}"
+        })
         
-        return state
+        # 동적 모델별 결과 (model_results reducer가 다른 모델 결과와 병합)
+        return {
+            "model_results": {
+                self.model_id: {
+                    "model_name": self.model_name,
+                    "reference_times": reference_times,
+                    "action_analysis_results": action_summary,
+                    "q_answers_accumulated": q_answers_accumulated,
+                    "promptbank_data": promptbank_data,
+                    "metrics": metrics
+                }
+            },
+            "agent_logs": agent_logs
+        }
+    
+    def _record_error(self, e: Exception, agent_logs: list) -> dict:
+        """분석 중 발생한 오류를 상태 변경분으로 반환"""
+        error_msg = f"[{self.name}] 비디오 분석 중 오류: {str(e)}"
+        print(error_msg)
+        import traceback
+        traceback.print_exc()
+        return {"errors": [error_msg], "status": "error", "agent_logs": agent_logs}
     
     # ========================================
     # 기준 시점 탐지 메서드들
     # ========================================
     
+    def _detect(self, reference_key: str, video_path: str, play_time: float, start_time: float, pipeline=None):
+        """reference_key 기준 시간 탐지 (start_time부터 탐색, pipeline은 파이프라인 모드 옵션)"""
+        system_prompt, user_prompt, segment_time = getattr(self, self.DETECTOR_QUERIES[reference_key])()
+        sampling_time = segment_time / 10.0
+        offset_time = segment_time
+        
+        return self._search_reference_time(
+            video_path, system_prompt, user_prompt, play_time,
+            start_time, segment_time, offset_time, sampling_time, pipeline
+        )
+    
+    async def _adetect(self, reference_key: str, video_path: str, play_time: float, start_time: float, pipeline=None):
+        """_detect()의 비동기 버전"""
+        system_prompt, user_prompt, segment_time = getattr(self, self.DETECTOR_QUERIES[reference_key])()
+        sampling_time = segment_time / 10.0
+        offset_time = segment_time
+        
+        return await self._asearch_reference_time(
+            video_path, system_prompt, user_prompt, play_time,
+            start_time, segment_time, offset_time, sampling_time, pipeline
+        )
+    
     def _detect_inhaler_in(self, video_path: str, play_time: float, start_time: float = 0.0):
         """inhalerIN 기준 시간 탐지"""
+        return self._detect('inhalerIN', video_path, play_time, start_time)
+    
+    def _detect_face_on_inhaler(self, video_path: str, play_time: float, start_time: float):
+        """faceONinhaler 기준 시간 탐지"""
+        return self._detect('faceONinhaler', video_path, play_time, start_time)
+    
+    def _detect_inhaler_out(self, video_path: str, play_time: float, start_time: float):
+        """inhalerOUT 기준 시간 탐지"""
+        return self._detect('inhalerOUT', video_path, play_time, start_time)
+    
+    def _inhaler_in_query(self):
+        """inhalerIN 탐지 질의 (system_prompt, user_prompt, segment_time)"""
         segment_time = 2.0
-        sampling_time = segment_time / 10.0
-        offset_time = segment_time
         
         system_prompt = "You are a helpful assistant that analyzes images and videos to determine if the user is performing a specific action."
         user_prompt = f"""
@@ -230,18 +766,11 @@ Q1_Answer: [YES or NO]
 Q1_Confidence: [0.0 to 1.0, indicating your confidence level in the answer]
 """
         
-        final_start_time, q_answers_acc = self._search_reference_time(
-            video_path, system_prompt, user_prompt, play_time, 
-            start_time, segment_time, offset_time, sampling_time
-        )
-        
-        return final_start_time, q_answers_acc
+        return system_prompt, user_prompt, segment_time
     
-    def _detect_face_on_inhaler(self, video_path: str, play_time: float, start_time: float):
-        """faceONinhaler 기준 시간 탐지"""
+    def _face_on_inhaler_query(self):
+        """faceONinhaler 탐지 질의 (system_prompt, user_prompt, segment_time)"""
         segment_time = 0.5
-        sampling_time = segment_time / 10.0
-        offset_time = segment_time
         
         system_prompt = "You are a helpful assistant that analyzes images and videos to determine if the user is performing a specific action."
         user_prompt = f"""
@@ -289,18 +818,11 @@ Q6_Answer: [YES or NO]
 Q6_Confidence: [0.0 to 1.0, indicating your confidence level in the answer]
 """
         
-        final_start_time, q_answers_acc = self._search_reference_time(
-            video_path, system_prompt, user_prompt, play_time,
-            start_time, segment_time, offset_time, sampling_time
-        )
-        
-        return final_start_time, q_answers_acc
+        return system_prompt, user_prompt, segment_time
     
-    def _detect_inhaler_out(self, video_path: str, play_time: float, start_time: float):
-        """inhalerOUT 기준 시간 탐지"""
+    def _inhaler_out_query(self):
+        """inhalerOUT 탐지 질의 (system_prompt, user_prompt, segment_time)"""
         segment_time = 0.5
-        sampling_time = segment_time / 10.0
-        offset_time = segment_time
         
         system_prompt = "You are a helpful assistant that analyzes images and videos to determine if the user is performing a specific action."
         user_prompt = f"""
@@ -348,86 +870,515 @@ Q6_Answer: [YES or NO]
 Q6_Confidence: [0.0 to 1.0, indicating your confidence level in the answer]
 """
         
-        final_start_time, q_answers_acc = self._search_reference_time(
-            video_path, system_prompt, user_prompt, play_time,
-            start_time, segment_time, offset_time, sampling_time
+        return system_prompt, user_prompt, segment_time
+    
+    def _combined_query(self, reference_keys: list):
+        """
+        reference_keys의 질의를 하나로 합친 통합 질의 (system_prompt, user_prompt, segment_time)
+        답변 항목에는 기준 시점 이름을 접두어로 붙임 (예: faceONinhaler_Overall_Answer, faceONinhaler_Q2_Answer)
+        segment_time은 각 기준 시점 질의의 구간 길이 (_combined_groups로 묶여 모두 같음)
+        """
+        segment_time = getattr(self, self.DETECTOR_QUERIES[reference_keys[0]])()[2]
+        
+        questions = "\n".join(
+            f"{reference_key}_Question: {self.promptbank.search_reference_time[reference_key]['action']}"
+            for reference_key in reference_keys
+        )
+        overall_format = "\n".join(
+            f"{reference_key}_Overall_Answer: [YES or NO]" for reference_key in reference_keys
+        )
+        q_questions = "\n".join(
+            f"{reference_key}_{q_key}. {self.promptbank.check_action_step_DPI_type3[action_key]['action']}"
+            for reference_key in reference_keys
+            for q_key, action_key in self.Q_MAPPINGS[reference_key].items()
+        )
+        q_format = "\n".join(
+            f"{reference_key}_{q_key}_Answer: [YES or NO]\n"
+            f"{reference_key}_{q_key}_Confidence: [0.0 to 1.0, indicating your confidence level in the answer]"
+            for reference_key in reference_keys
+            for q_key in self.Q_MAPPINGS[reference_key]
         )
         
-        return final_start_time, q_answers_acc
+        system_prompt = "You are a helpful assistant that analyzes images and videos to determine if the user is performing a specific action."
+        user_prompt = f"""
+[Task 1] Individual Image Analysis
+Analyze each image independently without using context from other images.
+Answer every question below separately.
+
+{questions}
+
+* Judgment Criteria (apply all):
+- Each image is evaluated as a standalone frame.
+- If the person holds an object, treat it as an inhaler.
+- For each question, if consecutive images satisfy its conditions, its overall answer is YES; otherwise, NO.
+
+* Output Format:
+{overall_format}
+Reason: {{Explain the decisions very shortly in Korean.}}
+
+[Task 2] Sequential Video Analysis
+Analyze the sequence of images as consecutive video frames.
+
+{q_questions}
+
+* Judgment Criteria (apply all):
+- Treat all frames as parts of a continuous video.
+- Use temporal continuity to determine whether the inhaler appears across frames.
+- Allow inference of inhaler visibility even if partially obscured in some frames, based on continuity.
+
+* Output Format:
+{q_format}
+"""
+        
+        return system_prompt, user_prompt, segment_time
     
     def _search_reference_time(self, video_path: str, system_prompt: str, user_prompt: str,
                               play_time: float, start_time: float, segment_time: float,
-                              offset_time: float, sampling_time: float):
+                              offset_time: float, sampling_time: float, pipeline=None):
         """
         기준 시간 탐색
+        self.search_strategy에 따라 선형 탐색 또는 coarse-to-fine 탐색을 수행
+        """
+        M, N, gridSize, windows, end_start_time = self._build_search_windows(
+            play_time, start_time, segment_time, offset_time, sampling_time
+        )
+        
+        def scan(scan_windows):
+            return self._scan_windows(video_path, system_prompt, user_prompt, scan_windows, M, N, gridSize, pipeline)
+        
+        plan = self._create_search_plan(windows)
+        try:
+            scan_windows = next(plan)
+            while True:
+                scan_windows = plan.send(scan(scan_windows))
+        except StopIteration as stop:
+            scanned, yes_index = stop.value
+        
+        return self._finalize_search(windows, scanned, yes_index, end_start_time, offset_time)
+    
+    async def _asearch_reference_time(self, video_path: str, system_prompt: str, user_prompt: str,
+                                      play_time: float, start_time: float, segment_time: float,
+                                      offset_time: float, sampling_time: float, pipeline=None):
+        """_search_reference_time()의 비동기 버전"""
+        M, N, gridSize, windows, end_start_time = self._build_search_windows(
+            play_time, start_time, segment_time, offset_time, sampling_time
+        )
+        
+        plan = self._create_search_plan(windows)
+        try:
+            scan_windows = next(plan)
+            while True:
+                scan_result = await self._ascan_windows(video_path, system_prompt, user_prompt, scan_windows, M, N, gridSize,
+                                                        pipeline)
+                scan_windows = plan.send(scan_result)
+        except StopIteration as stop:
+            scanned, yes_index = stop.value
+        
+        return self._finalize_search(windows, scanned, yes_index, end_start_time, offset_time)
+    
+    def _build_search_windows(self, play_time: float, start_time: float, segment_time: float,
+                              offset_time: float, sampling_time: float):
+        """
+        탐색할 구간 목록 (선형 탐색 기준의 세밀한 격자) 생성
+        
+        Returns:
+            M, N, gridSize: 그리드 레이아웃
+            windows: [(start, end), ...]
+            end_start_time: 마지막 구간 다음의 시작 시간
         """
         M, N = 1, int(segment_time / sampling_time)
         gridSize = (int(1280/2)*N, int(720/2)*M)
         
-        q_answers_accumulated = {}
-        final_start_time = start_time
+        windows = []
+        window_start = start_time
+        while window_start <= play_time - segment_time:
+            windows.append((window_start, window_start + segment_time))
+            window_start += offset_time
         
-        while start_time <= play_time - segment_time:
-            print(f'  검색 중... start_time={start_time:.1f}초')
-            end_time = start_time + segment_time
-            
-            # 프레임 추출
-            output_image, _, _ = self.video_processor.extract_frames(
-                video_path, start_time, end_time, M, N, gridSize, (0, 0)
-            )
-            
-            # LLM 쿼리
-            response = self.mllm.query_answer_chatGPT(
-                system_prompt, user_prompt, image_array=output_image
-            )
-            
-            # 응답 파싱
-            overall_answer = self._parse_overall_answer(response)
-            current_q_answers, current_q_confidence = self._parse_q_answers(response)
-            
-            # 누적 저장
+        return M, N, gridSize, windows, window_start
+    
+    def _create_search_plan(self, windows: list):
+        """self.search_strategy에 해당하는 탐색 계획 제너레이터 생성"""
+        if self.search_strategy not in self.SEARCH_STRATEGIES:
+            raise ValueError(f"지원하지 않는 탐색 전략입니다: {self.search_strategy} (지원: {list(self.SEARCH_STRATEGIES)})")
+        return getattr(self, self.SEARCH_STRATEGIES[self.search_strategy])(windows)
+    
+    def _finalize_search(self, windows: list, scanned: list, yes_index, end_start_time: float, offset_time: float):
+        """탐색 결과로 최종 기준 시간과 시간 순서대로 누적된 Q 답변 생성"""
+        q_answers_accumulated = {}
+        for scanned_start, current_q_answers, current_q_confidence in sorted(scanned, key=lambda item: item[0]):
             for q_key, answer in current_q_answers.items():
                 if q_key not in q_answers_accumulated:
                     q_answers_accumulated[q_key] = []
                 confidence = current_q_confidence.get(q_key, None)
-                q_answers_accumulated[q_key].append((round(start_time, 1), answer, confidence))
-            
-            # 종료 조건
-            if overall_answer == "YES":
-                final_start_time = round(start_time, 1)
-                break
-            
-            start_time += offset_time
+                q_answers_accumulated[q_key].append((round(scanned_start, 1), answer, confidence))
         
-        # 루프 종료 후 처리
-        if start_time > play_time - segment_time:
+        if yes_index is not None:
+            final_start_time = round(windows[yes_index][0], 1)
+        else:
+            # 영상 끝까지 YES가 없으면 마지막 구간의 시작 시간 사용
             print("  영상 거의 끝까지 탐색했습니다.")
-            final_start_time = round(start_time - offset_time, 1)
+            final_start_time = round(end_start_time - offset_time, 1)
         
         return final_start_time, q_answers_accumulated
     
-    def _parse_overall_answer(self, response: str) -> str:
-        """Overall_Answer 파싱"""
-        overall_pattern = re.compile(r'\*{0,2}Overall_Answer:\s*\*{0,2}\s*(YES|NO)', re.IGNORECASE)
+    # ----------------------------------------
+    # 탐색 전략 (계획 제너레이터)
+    # 질의할 구간 목록을 yield하고 (scanned, yes_index)를 돌려받으며,
+    # 최종 (scanned, yes_index)를 return 한다. 동기/비동기 탐색이 같은 계획을 공유함.
+    # ----------------------------------------
+    
+    def _plan_linear(self, windows: list):
+        """선형 탐색: 모든 구간을 앞에서부터 순서대로 질의하여 첫 YES에서 멈춤"""
+        scanned, yes_index = yield windows
+        return scanned, yes_index
+    
+    def _plan_coarse_to_fine(self, windows: list):
+        """
+        Coarse-to-fine 탐색
+        1. coarse_stride 구간 간격으로 먼저 탐색하여 첫 YES 구간을 찾음
+        2. 직전 coarse NO 구간과 첫 YES 구간 사이의 구간만 원래 해상도로 선형 탐색
+        
+        구간 답변이 시간에 대해 단조(첫 YES 이후로 계속 YES)이면 기준 시간은 선형 탐색과 같음.
+        누적 Q 답변은 질의한 구간의 것만 남으므로 선형 탐색 답변의 부분집합이 됨
+        (같은 구간의 답변은 같고, coarse 단계에서 건너뛴 구간의 답변은 빠짐 -> 행동 단계 분석의 표본이 줄어듦,
+        benchmark_search_strategy.py에서 확인)
+        """
+        stride = max(1, self.coarse_stride)
+        coarse_indices = list(range(0, len(windows), stride))
+        if coarse_indices and coarse_indices[-1] != len(windows) - 1:
+            coarse_indices.append(len(windows) - 1)  # 마지막 구간은 항상 확인
+        
+        coarse_scanned, coarse_yes = yield [windows[i] for i in coarse_indices]
+        if coarse_yes is None:
+            return coarse_scanned, None
+        
+        yes_index = coarse_indices[coarse_yes]
+        prev_index = coarse_indices[coarse_yes - 1] if coarse_yes > 0 else -1
+        refine_windows = windows[prev_index + 1:yes_index]
+        if not refine_windows:
+            return coarse_scanned, yes_index
+        
+        print(f'  세부 탐색... {refine_windows[0][0]:.1f}초 ~ {refine_windows[-1][0]:.1f}초')
+        fine_scanned, fine_yes = yield refine_windows
+        if fine_yes is not None:
+            # 더 이른 YES를 찾았으면 그 이후의 coarse YES 결과는 버림
+            return coarse_scanned[:-1] + fine_scanned, prev_index + 1 + fine_yes
+        return coarse_scanned + fine_scanned, yes_index
+    
+    def _scan_windows(self, video_path: str, system_prompt: str, user_prompt: str,
+                      windows: list, M: int, N: int, gridSize: tuple, pipeline=None, interpret=None):
+        """
+        구간들을 순서대로 질의하여 첫 YES에서 멈춤
+        파이프라인 모드(pipeline)에서는 구간 질의를 memo로 다른 탐지와 공유하고, YES 응답이 나오면
+        (순서와 무관하게) 바로 on_candidate로 알림
+        interpret: 응답 해석 함수 (start_time, response) -> (overall_answer, Q 답변, Q 신뢰도)
+            (없으면 Overall_Answer / Q 답변을 파싱, 통합 질의 모드에서 사용)
+        
+        Returns:
+            scanned: [(구간 시작 시간, Q 답변 dict, Q 신뢰도 dict), ...] 질의한 구간들의 파싱 결과
+            yes_index: 첫 YES 구간의 windows 인덱스 (없으면 None)
+        """
+        frame_stream = self.video_processor.iter_frames(
+            video_path, windows, M, N, gridSize, (0, 0)
+        )
+        window_iter = enumerate(zip(windows, frame_stream))
+        scanned = []
+        yes_index = None
+        
+        # 투기적 탐색: 다음 K개 구간을 미리 동시에 질의하고, 결과는 순서대로 처리
+        # (첫 YES 이후 구간의 결과는 버리므로 순차 탐색과 결과가 동일)
+        num_ahead = self.speculative_windows
+        executor = ThreadPoolExecutor(max_workers=num_ahead) if num_ahead > 1 else None
+        pending = deque()  # [(window_index, future 또는 response, 구간 계측, 구간 스팬), ...]
+        detector = stage_metrics.current()  # 탐지 단위 기록기 (없으면 계측 안 함)
+        
+        def _dispatch_next():
+            """다음 구간의 프레임을 추출하고 LLM 질의를 시작 (남은 구간이 없으면 False)"""
+            metrics = stage_metrics.StageMetrics() if detector is not None else None
+            window_span = tracing.start_span("window_query", model=self.model_name)
+            try:
+                with stage_metrics.recording(metrics), tracing.span("frame_grid", parent=window_span):
+                    window_index, (_, (output_image, _, _)) = next(window_iter)
+            except StopIteration:
+                window_span.set_attribute("answer", "end_of_video")
+                window_span.end()
+                return False
+            window_start = windows[window_index][0]
+            window_span.set_attribute("window_start", round(window_start, 1))
+            if pipeline is None:
+                if metrics is not None:
+                    metrics.add("window_queries", 1)
+                if executor is None:
+                    result = self._query_window(system_prompt, user_prompt, output_image, metrics, window_span)
+                else:
+                    result = executor.submit(self._query_window, system_prompt, user_prompt, output_image, metrics, window_span)
+            else:
+                result, shared = pipeline.memo.acquire(user_prompt, window_start, Future)
+                if shared:
+                    window_span.set_attribute("pipelined", True)
+                    if metrics is not None:
+                        metrics.add("pipelined_hits", 1)
+                else:
+                    if metrics is not None:
+                        metrics.add("window_queries", 1)
+                    query_args = (result, system_prompt, user_prompt, output_image, metrics, window_span)
+                    if executor is None:
+                        self._fulfil_query(*query_args)
+                    else:
+                        executor.submit(self._fulfil_query, *query_args)
+                self._watch_candidate(result, window_start, pipeline)
+            pending.append((window_index, result, metrics, window_span))
+            return True
+        
+        try:
+            while True:
+                while len(pending) < num_ahead and not (pipeline and pipeline.stopped()) and _dispatch_next():
+                    pass
+                if not pending or (pipeline and pipeline.stopped()):
+                    break
+                
+                window_index, result, metrics, window_span = pending.popleft()
+                start_time = windows[window_index][0]
+                if pipeline is None or not pipeline.speculative:
+                    print(f'  검색 중... start_time={start_time:.1f}초')
+                try:
+                    response = result.result() if isinstance(result, Future) else result
+                    self._check_response(response, start_time)
+                except Exception:
+                    self._record_window(detector, metrics, start_time, "error", window_span)
+                    raise
+                
+                # 응답 파싱
+                overall_answer, current_q_answers, current_q_confidence = self._interpret_response(
+                    start_time, response, interpret
+                )
+                scanned.append((start_time, current_q_answers, current_q_confidence))
+                self._record_window(detector, metrics, start_time, overall_answer, window_span)
+                
+                # 종료 조건
+                if overall_answer == "YES":
+                    yes_index = window_index
+                    break
+        finally:
+            # 첫 YES 이후에 미리 보낸 질의는 취소하거나 결과를 버림 (그때까지의 비용은 기록)
+            for window_index, result, metrics, window_span in pending:
+                window_start = windows[window_index][0]
+                if isinstance(result, Future):
+                    if pipeline is None:
+                        result.cancel()
+                    else:
+                        pipeline.memo.release(user_prompt, window_start, result)
+                self._record_window(detector, metrics, window_start, None, window_span)
+            if executor is not None:
+                executor.shutdown(wait=False)
+            frame_stream.close()
+        
+        return scanned, yes_index
+    
+    async def _ascan_windows(self, video_path: str, system_prompt: str, user_prompt: str,
+                             windows: list, M: int, N: int, gridSize: tuple, pipeline=None, interpret=None):
+        """_scan_windows()의 비동기 버전 (프레임 추출은 스레드에서, LLM 질의는 이벤트 루프에서 수행)"""
+        frame_stream = self.video_processor.iter_frames(
+            video_path, windows, M, N, gridSize, (0, 0)
+        )
+        window_iter = enumerate(zip(windows, frame_stream))
+        scanned = []
+        yes_index = None
+        
+        num_ahead = self.speculative_windows
+        semaphore = get_async_provider_semaphore(getattr(self.mllm, "provider", "unknown"))
+        pending = deque()  # [(window_index, asyncio.Task, 구간 계측, 구간 스팬, 질의 생성 함수), ...]
+        detector = stage_metrics.current()
+        
+        async def _query(output_image, metrics, window_span):
+            with stage_metrics.recording(metrics), tracing.span("llm_query", parent=window_span, model=self.model_name):
+                async with semaphore:
+                    if hasattr(self.mllm, "aquery"):
+                        return await self.mllm.aquery(system_prompt, user_prompt, image_array=output_image)
+                    return await asyncio.to_thread(
+                        self.mllm.query_answer_chatGPT, system_prompt, user_prompt, image_array=output_image
+                    )
+        
+        async def _dispatch_next():
+            """다음 구간의 프레임을 추출하고 LLM 질의 태스크를 시작 (남은 구간이 없으면 False)"""
+            metrics = stage_metrics.StageMetrics() if detector is not None else None
+            window_span = tracing.start_span("window_query", model=self.model_name)
+            with stage_metrics.recording(metrics), tracing.span("frame_grid", parent=window_span):
+                item = await asyncio.to_thread(next, window_iter, None)
+            if item is None:
+                window_span.set_attribute("answer", "end_of_video")
+                window_span.end()
+                return False
+            window_index, (_, (output_image, _, _)) = item
+            window_start = windows[window_index][0]
+            window_span.set_attribute("window_start", round(window_start, 1))
+            create = lambda: asyncio.ensure_future(_query(output_image, metrics, window_span))
+            if pipeline is None:
+                if metrics is not None:
+                    metrics.add("window_queries", 1)
+                task = create()
+            else:
+                task, shared = pipeline.memo.acquire(user_prompt, window_start, create)
+                if shared:
+                    window_span.set_attribute("pipelined", True)
+                    if metrics is not None:
+                        metrics.add("pipelined_hits", 1)
+                elif metrics is not None:
+                    metrics.add("window_queries", 1)
+                self._watch_candidate(task, window_start, pipeline)
+            pending.append((window_index, task, metrics, window_span, create))
+            return True
+        
+        async def _await_response(task, create, window_start, metrics):
+            """
+            구간 질의 결과를 기다림
+            파이프라인 모드에서는 다른 탐색과 공유하는 질의이므로 shield로 기다려 이 탐색이 취소되어도 질의는 memo에 남기고,
+            공유 질의가 다른 탐색의 취소로 끝났으면 다시 질의
+            """
+            while True:
+                if pipeline is None:
+                    return await task
+                try:
+                    return await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise  # 이 탐색이 취소됨
+                task, shared = pipeline.memo.acquire(user_prompt, window_start, create)
+                if not shared and metrics is not None:
+                    metrics.add("window_queries", 1)
+                self._watch_candidate(task, window_start, pipeline)
+        
+        try:
+            while True:
+                while len(pending) < num_ahead and not (pipeline and pipeline.stopped()) and await _dispatch_next():
+                    pass
+                if not pending or (pipeline and pipeline.stopped()):
+                    break
+                
+                window_index, task, metrics, window_span, create = pending.popleft()
+                start_time = windows[window_index][0]
+                if pipeline is None or not pipeline.speculative:
+                    print(f'  검색 중... start_time={start_time:.1f}초')
+                try:
+                    response = await _await_response(task, create, start_time, metrics)
+                    self._check_response(response, start_time)
+                except Exception:
+                    self._record_window(detector, metrics, start_time, "error", window_span)
+                    raise
+                
+                overall_answer, current_q_answers, current_q_confidence = self._interpret_response(
+                    start_time, response, interpret
+                )
+                scanned.append((start_time, current_q_answers, current_q_confidence))
+                self._record_window(detector, metrics, start_time, overall_answer, window_span)
+                
+                if overall_answer == "YES":
+                    yes_index = window_index
+                    break
+        finally:
+            # 첫 YES 이후에 미리 보낸 질의는 취소 (그때까지의 비용은 기록)
+            for window_index, task, metrics, window_span, _ in pending:
+                window_start = windows[window_index][0]
+                if pipeline is None:
+                    task.cancel()
+                else:
+                    pipeline.memo.release(user_prompt, window_start, task)
+                self._record_window(detector, metrics, window_start, None, window_span)
+            await asyncio.to_thread(frame_stream.close)
+        
+        return scanned, yes_index
+    
+    def _query_window(self, system_prompt: str, user_prompt: str, output_image, metrics=None, window_span=None):
+        """
+        구간 그리드 하나에 대한 LLM 질의 (provider별 동시 호출 상한 적용)
+        metrics, window_span: 이 구간의 계측 기록기와 추적 스팬 (작업 스레드에서도 이어지도록 여기서 지정)
+        """
+        semaphore = get_provider_semaphore(getattr(self.mllm, "provider", "unknown"))
+        with stage_metrics.recording(metrics), tracing.span("llm_query", parent=window_span, model=self.model_name):
+            with semaphore:
+                return self.mllm.query_answer_chatGPT(
+                    system_prompt, user_prompt, image_array=output_image
+                )
+    
+    def _fulfil_query(self, future: Future, system_prompt: str, user_prompt: str, output_image, metrics, window_span):
+        """파이프라인 모드: _query_window() 결과를 memo에 등록된 future에 채움 (이미 취소되었으면 질의 안 함)"""
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._query_window(system_prompt, user_prompt, output_image, metrics, window_span))
+        except Exception as e:
+            future.set_exception(e)
+    
+    def _watch_candidate(self, future, window_start: float, pipeline):
+        """파이프라인 모드: 구간 질의가 YES로 끝나면 그 시간을 다음 탐지의 후보로 알림 (완료 순서와 무관)"""
+        if pipeline.on_candidate is None:
+            return
+        
+        def _on_done(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            if self._parse_overall_answer(done.result()) == "YES":
+                pipeline.on_candidate(round(window_start, 1))
+        
+        future.add_done_callback(_on_done)
+    
+    def _record_window(self, detector, metrics, start_time: float, answer, window_span=None):
+        """
+        구간 계측을 탐지 단위 기록기에 추가하고 구간 스팬을 끝냄
+        (answer가 None이면 첫 YES 이후 버린 구간)
+        """
+        values = metrics.to_dict() if metrics is not None else {}
+        if window_span is not None:
+            window_span.set_attribute("answer", answer if answer is not None else "discarded")
+            window_span.set_attributes(values)
+            window_span.end()
+        if detector is not None:
+            detector.add_window({"start_time": round(start_time, 1), "answer": answer, **values})
+    
+    def _check_response(self, response: str, start_time: float):
+        """
+        재시도 후에도 실패한 API 오류 응답은 NO로 파싱하지 않고 예외로 올림
+        (한도 초과 등으로 탐색 결과가 잘못 기록되는 것을 방지)
+        """
+        if isinstance(response, str) and response.startswith("API Error"):
+            raise RuntimeError(f"LLM 질의 실패 (start_time={start_time:.1f}초): {response}")
+    
+    def _interpret_response(self, start_time: float, response: str, interpret=None):
+        """구간 응답을 (overall_answer, Q 답변, Q 신뢰도)로 해석"""
+        if interpret is not None:
+            return interpret(start_time, response)
+        overall_answer = self._parse_overall_answer(response)
+        current_q_answers, current_q_confidence = self._parse_q_answers(response)
+        return overall_answer, current_q_answers, current_q_confidence
+    
+    def _parse_overall_answer(self, response: str, prefix: str = "") -> str:
+        """Overall_Answer 파싱 (prefix: 통합 질의의 기준 시점 접두어, 예: "inhalerIN_")"""
+        overall_pattern = re.compile(r'\*{0,2}' + re.escape(prefix) + r'Overall_Answer:\s*\*{0,2}\s*(YES|NO)', re.IGNORECASE)
         overall_match = overall_pattern.search(response)
         if overall_match:
             return overall_match.group(1).upper()
         return "NO"
     
-    def _parse_q_answers(self, response: str):
-        """Q1_Answer, Q2_Answer 등 파싱"""
+    def _parse_q_answers(self, response: str, prefix: str = ""):
+        """
+        Q1_Answer, Q2_Answer 등 파싱
+        prefix: 통합 질의의 기준 시점 접두어 (예: "faceONinhaler_"이면 faceONinhaler_Q1_Answer 등만 파싱)
+        """
         current_q_answers = {}
         current_q_confidence = {}
         
+        prefix_pattern = re.escape(prefix)
+        
         # Q1_Answer, Q2_Answer 파싱
-        q_pattern = re.compile(r'\*{0,2}Q(\d+)_Answer:\s*\*{0,2}\s*(YES|NO)', re.IGNORECASE)
+        q_pattern = re.compile(r'\*{0,2}' + prefix_pattern + r'Q(\d+)_Answer:\s*\*{0,2}\s*(YES|NO)', re.IGNORECASE)
         q_matches = q_pattern.findall(response)
         
         for q_num, answer in q_matches:
             current_q_answers[f'Q{q_num}'] = answer.upper()
         
         # Q1_Confidence, Q2_Confidence 파싱
-        confidence_pattern = re.compile(r'\*{0,2}Q(\d+)_Confidence:\s*\*{0,2}\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+        confidence_pattern = re.compile(r'\*{0,2}' + prefix_pattern + r'Q(\d+)_Confidence:\s*\*{0,2}\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
         confidence_matches = confidence_pattern.findall(response)
         
         for q_num, confidence in confidence_matches:
@@ -10,37 +10,237 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
 import class_Media_Edit_251107 as ME
+import stage_metrics
 from .state import VideoAnalysisState
 
 
+class FrameGridCache:
+    """
+    프로세스 전역에서 공유되는 프레임 그리드 캐시 (thread-safe)
+    - 키: (비디오 경로, mtime, 구간, 그리드 레이아웃)
+    - 바이트 예산 기반 LRU 제거
+    - 동일 키를 동시에 요청하면 한 스레드만 디코딩하고 나머지는 결과를 기다림
+    """
+    
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 캐시에 보관할 최대 바이트 수 (기본값: 1GiB)
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {key: (output_image, image_W, image_H)}
+        self._inflight = {}  # {key: threading.Event}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(video_path: str, start_time: float, end_time: float,
+                 M: int, N: int, gridSize: tuple, padSize: tuple):
+        """캐시 키 생성 (파일이 변경되면 mtime이 달라져 자동으로 무효화됨)"""
+        abs_path = os.path.abspath(video_path)
+        try:
+            mtime = os.stat(abs_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (abs_path, mtime, round(start_time, 3), round(end_time, 3),
+                M, N, tuple(gridSize), tuple(padSize))
+    
+    def get_or_create(self, key, create_fn):
+        """
+        캐시에서 결과를 찾고, 없으면 create_fn()으로 생성하여 저장
+        
+        Args:
+            key: make_key()로 생성한 캐시 키
+            create_fn: (output_image, image_W, image_H)를 반환하는 함수
+            
+        Returns:
+            output_image, image_W, image_H
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    stage_metrics.record("frame_cache_hits", 1)
+                    return self._entries[key]
+                event = self._inflight.get(key)
+                if event is None:
+                    # 이 스레드가 디코딩 담당
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self.misses += 1
+                    break
+            # 다른 스레드가 같은 구간을 디코딩 중이면 완료를 기다린 뒤 다시 조회
+            event.wait()
+        
+        try:
+            result = create_fn()
+            self._put(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+    
+    def _put(self, key, result):
+        """결과를 저장하고 바이트 예산을 초과하면 오래된 항목부터 제거"""
+        output_image = result[0]
+        if output_image is None or not hasattr(output_image, 'nbytes'):
+            return  # 실패한 추출 결과는 캐시하지 않음
+        
+        nbytes = output_image.nbytes
+        if nbytes > self.max_bytes:
+            return
+        
+        # 여러 Agent가 같은 배열을 공유하므로 읽기 전용으로 설정
+        output_image.flags.writeable = False
+        
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = result
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (old_image, _, _) = self._entries.popitem(last=False)
+                self.current_bytes -= old_image.nbytes
+    
+    def clear(self):
+        """캐시 비우기"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def get_stats(self) -> dict:
+        """캐시 통계 반환"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 프로세스 전역 공유 캐시 (모든 VideoProcessorAgent / VideoAnalyzerAgent가 공유)
+_shared_frame_cache = FrameGridCache()
+
+
+def get_shared_frame_cache() -> FrameGridCache:
+    """프로세스 전역 프레임 그리드 캐시 반환"""
+    return _shared_frame_cache
+
+
+class ProxyVideo:
+    """원본 비디오의 분석용 저해상도 프록시 (원본 시간 -> 프록시 프레임 번호 변환)"""
+    
+    def __init__(self, path: str, source_fps: float, source_index=None):
+        """
+        Args:
+            path: 프록시 비디오 경로 (프레임 번호는 원본과 같음)
+            source_fps: 원본 비디오의 FPS (CAP_PROP_FPS, MediaEdit.query_fps)
+            source_index: 원본 비디오의 프레임 색인 (있으면 PTS 기준으로 변환)
+        """
+        self.path = path
+        self.source_fps = source_fps
+        self.source_index = source_index
+    
+    def frame_range(self, start_time: float, end_time: float):
+        """원본 기준 시간 구간을 프레임 번호 구간으로 변환 (MediaEdit._time_to_frame_range의 'time' 옵션과 같은 방식)"""
+        if self.source_index is not None:
+            return self.source_index.frame_at(start_time), self.source_index.frame_at(end_time)
+        return int(start_time * self.source_fps), int(end_time * self.source_fps)
+
+
+# 기준 시점 탐지 구간 레이아웃 [(구간 길이(초), MxN), ...] (VideoAnalyzerAgent의 질의별 segment_time / 그리드와 같게 유지)
+# 탐지 구간은 0초부터 구간 길이 간격으로 놓이므로, 프레임 저장소는 이 구간들의 그리드가 쓰는 프레임만 저장
+DETECTOR_SAMPLE_LAYOUTS = ((2.0, (1, 10)), (0.5, (1, 10)))
+
+
 class VideoProcessorAgent:
     """
     비디오 처리 전담 Agent
     - 비디오 메타데이터 추출
+    - 저해상도 프록시 생성 (use_proxy=True일 때, 이후 프레임 추출은 프록시에서)
+    - 디코딩된 프레임 저장소 생성 (use_frame_store=True일 때, analyzer는 디코딩 없이 메모리 맵에서 그리드 생성)
     - 프레임 샘플링 및 전처리
     - 이미지 그리드 생성
     """
     
-    def __init__(self):
-        self.video_edit = ME.MediaEdit()
+    def __init__(self, frame_cache: FrameGridCache = None, use_frame_cache: bool = True,
+                 use_proxy: bool = False, proxy_size: tuple = (640, 360), proxy_dir: str = None,
+                 keep_proxies: bool = False, max_proxies: int = 4,
+                 use_frame_store: bool = False, frame_store_size: tuple = (640, 360), frame_store_dir: str = None,
+                 frame_store_layouts: tuple = DETECTOR_SAMPLE_LAYOUTS, max_frame_stores: int = 2,
+                 use_frame_index: bool = False, frame_index_dir: str = None):
+        """
+        Args:
+            frame_cache: 사용할 프레임 그리드 캐시 (None이면 프로세스 전역 캐시 사용)
+            use_frame_cache: False이면 캐시 없이 매번 디코딩
+            use_proxy: True이면 비디오 처리 시 저해상도 프록시를 만들고 프레임 추출에 사용
+            proxy_size: 프록시 최대 크기 (너비, 높이), 탐지 그리드의 셀 크기와 같게 두면 셀 리사이즈가 거의 없음
+            proxy_dir: 프록시 저장 폴더 (None이면 시스템 임시 폴더), 같은 폴더에 유효한 프록시가 있으면 재사용
+            keep_proxies: False이면 이 agent가 만든 프록시 파일을 release_video() 또는 등록 제거 시 삭제
+                (True이면 남겨 두고 다음 실행에서 재사용)
+            max_proxies: 등록해 둘 최대 프록시 수 (넘으면 가장 오래 쓰지 않은 프록시를 제거)
+            use_frame_store: True이면 비디오 처리 시 한 번 디코딩한 프레임을 메모리 맵 저장소(.npy)에 쓰고
+                경로를 video_info["frame_store_path"]로 넘김 (다른 프로세스의 analyzer도 같은 파일을 공유)
+            frame_store_size: 저장할 프레임 크기 (너비, 높이), 탐지 그리드의 셀 크기와 같아야 디코딩한 그리드와 같음
+                (640x360이면 프레임당 약 0.7MB)
+            frame_store_dir: 저장소 폴더 (None이면 시스템 임시 폴더)
+            frame_store_layouts: 저장할 프레임을 정하는 구간 레이아웃 (기본값은 탐지 구간, None이면 모든 프레임)
+                저장소에 없는 프레임이 필요한 구간은 디코딩해서 만듦
+            max_frame_stores: 등록해 둘 최대 저장소 수 (넘으면 가장 오래 쓰지 않은 저장소를 닫고, 직접 만든 저장소는 파일도 삭제)
+            use_frame_index: True이면 프레임 색인(PTS/키프레임)으로 시간 -> 프레임 변환 및 탐색 (비디오마다 패킷을 한 번 훑음)
+            frame_index_dir: 프레임 색인을 저장해 다음 실행에서 재사용할 캐시 폴더 (None이면 메모리에만 보관)
+        """
+        self.video_edit = ME.MediaEdit(use_frame_index=use_frame_index, frame_index_dir=frame_index_dir)
         self.name = "VideoProcessorAgent"
+        if use_frame_cache:
+            self.frame_cache = frame_cache if frame_cache is not None else get_shared_frame_cache()
+        else:
+            self.frame_cache = None
+        self.use_proxy = use_proxy
+        self.proxy_size = tuple(proxy_size)
+        self.proxy_dir = proxy_dir
+        self.keep_proxies = keep_proxies
+        self.max_proxies = max_proxies
+        self._proxies = OrderedDict()  # {원본 절대 경로: ProxyVideo} (LRU 순서)
+        self._built_proxy_paths = set()  # 이 agent가 만든 프록시 파일
+        self._proxy_lock = threading.Lock()
+        self.use_frame_store = use_frame_store
+        self.frame_store_size = tuple(frame_store_size)
+        self.frame_store_dir = frame_store_dir
+        self.frame_store_layouts = frame_store_layouts
+        self.max_frame_stores = max_frame_stores
+        self._frame_stores = OrderedDict()  # {원본 절대 경로: ME.FrameStore} (LRU 순서)
+        self._built_store_paths = set()  # 이 agent가 만든 저장소 파일 (제거할 때 삭제)
+        self._frame_store_lock = threading.Lock()
     
-    def process(self, state: VideoAnalysisState) -> VideoAnalysisState:
+    def process(self, state: VideoAnalysisState) -> dict:
         """
-        비디오 정보를 추출하고 상태에 저장
+        비디오 정보를 추출
         
         Args:
-            state: 현재 상태
+            state: 현재 상태 (변경하지 않음)
             
         Returns:
-            업데이트된 상태
+            상태 변경분 (video_info, status, agent_logs 또는 errors)
         """
+        agent_logs = []
         try:
             video_path = state["video_path"]
             
             # 로그 추가
-            state["agent_logs"].append({
+            agent_logs.append({
                 "agent": self.name,
                 "action": "start_processing",
                 "message": f"비디오 파일 처리 시작: {video_path}"
@@ -53,8 +253,8 @@ class VideoProcessorAgent:
             if video_name is None:
                 raise ValueError(f"비디오 파일을 열 수 없습니다: {video_path}")
             
-            # 비디오 정보를 상태에 저장
-            state["video_info"] = {
+            # 비디오 정보
+            video_info = {
                 "video_name": video_name,
                 "play_time": play_time,
                 "frame_count": frame_count,
@@ -63,11 +263,8 @@ class VideoProcessorAgent:
                 "file_size": file_size
             }
             
-            # 상태 업데이트
-            state["status"] = "video_processed"
-            
             # 로그 추가
-            state["agent_logs"].append({
+            agent_logs.append({
                 "agent": self.name,
                 "action": "processing_complete",
                 "message": f"비디오 정보 추출 완료: {video_name}, {play_time}초, {frame_count}프레임, {video_width}x{video_height}px"
@@ -75,18 +272,239 @@ class VideoProcessorAgent:
             
             print(f"[{self.name}] 비디오 정보: {video_name}, {play_time}초, {frame_count}프레임")
             
+            # 프록시 생성 (실패하면 원본에서 추출)
+            if self.use_proxy:
+                proxy = self.ingest(video_path, frame_count)
+                video_info["proxy_path"] = proxy.path if proxy is not None else None
+                agent_logs.append({
+                    "agent": self.name,
+                    "action": "proxy_ready" if proxy is not None else "proxy_failed",
+                    "message": f"프록시: {proxy.path}" if proxy is not None else "프록시 생성 실패, 원본 비디오 사용"
+                })
+            
+            # 프레임 저장소 생성 (실패하면 analyzer가 직접 디코딩)
+            if self.use_frame_store:
+                store = self.build_frame_store(video_path)
+                video_info["frame_store_path"] = store.path if store is not None else None
+                agent_logs.append({
+                    "agent": self.name,
+                    "action": "frame_store_ready" if store is not None else "frame_store_failed",
+                    "message": f"프레임 저장소: {store.path} ({store.frame_count}프레임)" if store is not None
+                               else "프레임 저장소 생성 실패, 구간마다 디코딩"
+                })
+            
+            return {"video_info": video_info, "status": "video_processed", "agent_logs": agent_logs}
+            
         except Exception as e:
             error_msg = f"[{self.name}] 비디오 처리 중 오류: {str(e)}"
-            state["errors"].append(error_msg)
-            state["status"] = "error"
             print(error_msg)
+            return {"errors": [error_msg], "status": "error", "agent_logs": agent_logs}
+    
+    def ingest(self, video_path: str, frame_count: int = None):
+        """
+        비디오의 분석용 프록시를 준비 (유효한 프록시가 이미 있으면 재사용)
+        이후 이 비디오의 extract_frames / iter_frames는 프록시에서 프레임을 추출
         
-        return state
+        Args:
+            video_path: 원본 비디오 경로
+            frame_count: 원본 프레임 수 (None이면 조회), 기존 프록시의 유효성 검사에 사용
+            
+        Returns:
+            ProxyVideo (생성에 실패하면 None)
+        """
+        if frame_count is None:
+            frame_count = self.video_edit.query_videoInfo(video_path)[2]
+        proxy_path = self._proxy_path(video_path)
+        
+        if not self._is_valid_proxy(video_path, proxy_path, frame_count):
+            with stage_metrics.timed("proxy_ms"):
+                proxy_path, written = self.video_edit.create_proxy(video_path, proxy_path, self.proxy_size)
+            if proxy_path is None or written != frame_count:
+                print(f"[{self.name}] 프록시 생성 실패: {video_path}")
+                return None
+            print(f"[{self.name}] 프록시 생성: {proxy_path}")
+            with self._proxy_lock:
+                self._built_proxy_paths.add(proxy_path)
+        
+        # 원본 경로와 같은 프레임을 읽도록 원본의 CAP_PROP_FPS로 변환 (반올림된 play_time으로 나누면 경계가 한 프레임씩 어긋남)
+        source_fps = self.video_edit.query_fps(video_path)
+        if not source_fps:
+            print(f"[{self.name}] 원본 FPS를 읽을 수 없습니다: {video_path}")
+            return None
+        proxy = ProxyVideo(proxy_path, source_fps, self.video_edit.get_frame_index(video_path))
+        evicted = []
+        with self._proxy_lock:
+            key = os.path.abspath(video_path)
+            self._proxies[key] = proxy
+            self._proxies.move_to_end(key)
+            while len(self._proxies) > max(self.max_proxies, 1):
+                evicted.append(self._proxies.popitem(last=False)[1])
+        for old_proxy in evicted:
+            self._remove_proxy_file(old_proxy)
+        return proxy
+    
+    def release_proxy(self, video_path: str):
+        """비디오의 프록시 등록을 해제 (keep_proxies=False이면 이 agent가 만든 프록시 파일도 삭제)"""
+        with self._proxy_lock:
+            proxy = self._proxies.pop(os.path.abspath(video_path), None)
+        if proxy is not None:
+            self._remove_proxy_file(proxy)
+    
+    def release_video(self, video_path: str):
+        """
+        비디오 분석이 끝난 뒤 이 비디오의 프록시와 프레임 저장소 등록을 해제
+        (이 agent가 만든 저장소 파일은 삭제, 프록시 파일은 keep_proxies=False일 때 삭제)
+        """
+        self.release_proxy(video_path)
+        with self._frame_store_lock:
+            store = self._frame_stores.pop(os.path.abspath(video_path), None)
+        if store is not None:
+            self._close_frame_store(store, delete=store.path in self._built_store_paths)
+    
+    def _remove_proxy_file(self, proxy: ProxyVideo):
+        """keep_proxies=False이고 이 agent가 만든 프록시이면 파일 삭제 (다른 비디오가 같은 파일을 쓰고 있으면 유지)"""
+        if self.keep_proxies:
+            return
+        with self._proxy_lock:
+            if proxy.path not in self._built_proxy_paths \
+                    or any(other.path == proxy.path for other in self._proxies.values()):
+                return
+            self._built_proxy_paths.discard(proxy.path)
+        try:
+            os.remove(proxy.path)
+        except OSError:
+            pass
+    
+    def _proxy_path(self, video_path: str) -> str:
+        proxy_dir = self.proxy_dir or os.path.join(tempfile.gettempdir(), "inhaler_proxy")
+        # 폴더가 달라도 같은 파일명이 겹치지 않도록 절대 경로의 해시를 붙임
+        digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+        name = os.path.basename(video_path)
+        return os.path.join(proxy_dir, f"{name}.{digest}.{self.proxy_size[0]}x{self.proxy_size[1]}.mp4")
+    
+    def _is_valid_proxy(self, video_path: str, proxy_path: str, frame_count: int) -> bool:
+        """원본보다 나중에 만들어졌고 프레임 수가 같은 프록시만 재사용"""
+        try:
+            if os.stat(proxy_path).st_mtime_ns < os.stat(video_path).st_mtime_ns:
+                return False
+        except OSError:
+            return False
+        return self.video_edit.query_videoInfo(proxy_path)[2] == frame_count
+    
+    def _get_proxy(self, video_path: str):
+        if not self.use_proxy:
+            return None
+        key = os.path.abspath(video_path)
+        with self._proxy_lock:
+            proxy = self._proxies.get(key)
+            if proxy is not None:
+                self._proxies.move_to_end(key)
+            return proxy
+    
+    def build_frame_store(self, video_path: str):
+        """
+        비디오를 한 번 디코딩해 frame_store_layouts 구간이 쓰는 프레임을 frame_store_size로 메모리 맵 저장소에 쓰고 등록
+        (유효한 저장소가 있으면 재사용, 프록시가 있으면 프록시에서 디코딩)
+        
+        Args:
+            video_path: 원본 비디오 경로
+            
+        Returns:
+            ME.FrameStore (생성에 실패하면 None)
+        """
+        proxy = self._get_proxy(video_path)
+        store = self.video_edit.create_frame_store(
+            video_path, self._frame_store_path(video_path), self.frame_store_size,
+            source_path=proxy.path if proxy is not None else None,
+            sample_layouts=self.frame_store_layouts
+        )
+        if store is None:
+            print(f"[{self.name}] 프레임 저장소 생성 실패: {video_path}")
+            return None
+        print(f"[{self.name}] 프레임 저장소: {store.path} ({store.frame_count}프레임)")
+        with self._frame_store_lock:
+            self._built_store_paths.add(store.path)
+        return self._register_frame_store(os.path.abspath(video_path), store)
+    
+    def _register_frame_store(self, key: str, store):
+        """저장소를 등록하고, max_frame_stores를 넘으면 가장 오래 쓰지 않은 저장소를 제거. 등록된 저장소를 반환"""
+        evicted = []
+        with self._frame_store_lock:
+            existing = self._frame_stores.get(key)
+            if existing is not None and existing.path == store.path and existing is not store:
+                store.close()
+                store = existing
+            elif existing is not None and existing is not store:
+                evicted.append(existing)
+            self._frame_stores[key] = store
+            self._frame_stores.move_to_end(key)
+            while len(self._frame_stores) > max(self.max_frame_stores, 1):
+                evicted.append(self._frame_stores.popitem(last=False)[1])
+        for old_store in evicted:
+            self._close_frame_store(old_store, delete=old_store.path in self._built_store_paths)
+        return store
+    
+    def _close_frame_store(self, store, delete: bool):
+        """저장소의 메모리 맵을 닫고, delete=True이면 파일도 삭제"""
+        store.close()
+        if not delete:
+            return
+        with self._frame_store_lock:
+            self._built_store_paths.discard(store.path)
+        for path in (store.path, ME.FrameStore.meta_path(store.path)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def attach_frame_store(self, video_path: str, store_path: str):
+        """
+        다른 VideoProcessorAgent(다른 프로세스 포함)가 만든 프레임 저장소를 이 비디오의 프레임 추출에 사용
+        
+        Returns:
+            ME.FrameStore (열 수 없으면 None, 이 경우 구간마다 디코딩)
+        """
+        key = os.path.abspath(video_path)
+        with self._frame_store_lock:
+            store = self._frame_stores.get(key)
+        if store is not None and store.path == store_path:
+            return store
+        store = ME.FrameStore.load(store_path)
+        if store is None or store.video_path != key:
+            print(f"[{self.name}] 프레임 저장소를 열 수 없습니다: {store_path}")
+            if store is not None:
+                store.close()
+            return None
+        return self._register_frame_store(key, store)
+    
+    def release_frame_store(self, video_path: str, delete: bool = False):
+        """비디오의 프레임 저장소 등록을 해제하고 메모리 맵을 닫음 (delete=True이면 파일도 삭제)"""
+        with self._frame_store_lock:
+            store = self._frame_stores.pop(os.path.abspath(video_path), None)
+        if store is not None:
+            self._close_frame_store(store, delete)
+    
+    def _frame_store_path(self, video_path: str) -> str:
+        store_dir = self.frame_store_dir or os.path.join(tempfile.gettempdir(), "inhaler_frame_store")
+        # 폴더가 달라도 같은 파일명이 겹치지 않도록 절대 경로의 해시를 붙임
+        digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+        name = os.path.basename(video_path)
+        return os.path.join(store_dir, f"{name}.{digest}.{self.frame_store_size[0]}x{self.frame_store_size[1]}.frames.npy")
+    
+    def _get_frame_store(self, video_path: str):
+        key = os.path.abspath(video_path)
+        with self._frame_store_lock:
+            store = self._frame_stores.get(key)
+            if store is not None:
+                self._frame_stores.move_to_end(key)
+            return store
     
     def extract_frames(self, video_path: str, start_time: float, end_time: float, 
                       M: int, N: int, gridSize: tuple = (640, 360), padSize: tuple = (0, 0)):
         """
         비디오에서 프레임을 추출하여 MxN 그리드 이미지로 생성
+        동일한 구간/레이아웃은 프레임 그리드 캐시에서 재사용 (여러 모델이 한 번만 디코딩)
+        프레임 저장소가 있는 비디오는 저장소에서, ingest()로 프록시를 만든 비디오는 프록시에서 추출
         
         Args:
             video_path: 비디오 파일 경로
@@ -98,20 +516,100 @@ class VideoProcessorAgent:
             padSize: 패딩 크기
             
         Returns:
-            output_image: 생성된 이미지 배열
+            output_image: 생성된 이미지 배열 (캐시 사용 시 읽기 전용)
             image_W: 이미지 너비
             image_H: 이미지 높이
         """
-        output_image, image_W, image_H = self.video_edit.extract_frames_to_MxN_image(
-            option='time',
-            start=start_time,
-            end=end_time,
-            MxN=(M, N),
-            video_path=video_path,
-            output_dir=None,  # None이면 image_array를 반환
-            gridSize=gridSize,
-            padSize=padSize
-        )
+        store = self._get_frame_store(video_path)
+        proxy = self._get_proxy(video_path)
+        if proxy is not None:
+            decode_path, option = proxy.path, 'frame'
+            start, end = proxy.frame_range(start_time, end_time)
+        else:
+            decode_path, option, start, end = video_path, 'time', start_time, end_time
+        source_path = store.path if store is not None else decode_path
+        
+        def _decode():
+            if store is not None:
+                # 저장소에 없는 프레임이 필요한 구간은 디코딩
+                stored = self.video_edit.extract_frames_to_MxN_image_from_store(
+                    store, 'time', start_time, end_time, (M, N), gridSize, padSize
+                )
+                if stored[0] is not None:
+                    return stored
+            return self.video_edit.extract_frames_to_MxN_image(
+                option=option,
+                start=start,
+                end=end,
+                MxN=(M, N),
+                video_path=decode_path,
+                output_dir=None,  # None이면 image_array를 반환
+                gridSize=gridSize,
+                padSize=padSize
+            )
+        
+        if self.frame_cache is None:
+            return _decode()
+        
+        key = FrameGridCache.make_key(source_path, start_time, end_time, M, N, gridSize, padSize)
+        output_image, image_W, image_H = self.frame_cache.get_or_create(key, _decode)
         
         return output_image, image_W, image_H
 
+    
+    def iter_frames(self, video_path: str, windows: list, M: int, N: int,
+                    gridSize: tuple = (640, 360), padSize: tuple = (0, 0)):
+        """
+        여러 구간의 MxN 그리드 이미지를 순서대로 생성하는 제너레이터
+        캐시에 없는 구간은 비디오를 한 번만 앞에서 뒤로 디코딩하는 순차 디코더로 생성 (프레임 저장소가 있으면 저장소에서)
+        
+        Args:
+            video_path: 비디오 파일 경로
+            windows: [(start_time, end_time), ...] 구간 목록 (시작 시간 오름차순)
+            M: 행 수
+            N: 열 수
+            gridSize: 그리드 크기
+            padSize: 패딩 크기
+            
+        Yields:
+            output_image: 생성된 이미지 배열 (캐시 사용 시 읽기 전용)
+            image_W: 이미지 너비
+            image_H: 이미지 높이
+        """
+        # 순차 디코더는 처음 캐시 미스가 발생할 때 연다
+        decoder = None
+        store = self._get_frame_store(video_path)
+        proxy = self._get_proxy(video_path)
+        decode_path = proxy.path if proxy is not None else video_path
+        source_path = store.path if store is not None else decode_path
+        
+        def _decode(start_time, end_time):
+            nonlocal decoder
+            if store is not None:
+                # 저장소에 없는 프레임이 필요한 구간은 디코딩
+                stored = self.video_edit.extract_frames_to_MxN_image_from_store(
+                    store, 'time', start_time, end_time, (M, N), gridSize, padSize
+                )
+                if stored[0] is not None:
+                    return stored
+            if decoder is None:
+                decoder = self.video_edit.open_sequential_decoder(decode_path)
+            if proxy is not None:
+                start_frame, end_frame = proxy.frame_range(start_time, end_time)
+                return self.video_edit.extract_frames_to_MxN_image_sequential(
+                    decoder, 'frame', start_frame, end_frame, (M, N), gridSize, padSize
+                )
+            return self.video_edit.extract_frames_to_MxN_image_sequential(
+                decoder, 'time', start_time, end_time, (M, N), gridSize, padSize
+            )
+        
+        try:
+            for start_time, end_time in windows:
+                if self.frame_cache is None:
+                    yield _decode(start_time, end_time)
+                    continue
+                key = FrameGridCache.make_key(source_path, start_time, end_time, M, N, gridSize, padSize)
+                yield self.frame_cache.get_or_create(key, lambda: _decode(start_time, end_time))
+        finally:
+            if decoder is not None:
+                decoder.release()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+LangGraph 기반 흡입기 비디오 배치 분석기
+디렉터리 또는 매니페스트 파일의 비디오들을 InhalerAnalysisWorkflow로 분석하고,
+비디오마다 결과 한 줄을 JSONL 파일에 기록합니다. (중단 후 다시 실행하면 끝난 비디오는 건너뜀)
+
+사용 예:
+    python batch_langgraph.py /data/clinic_uploads --output results.jsonl \\
+        --models gemini-2.5-pro gpt-5-mini --video-concurrency 4 --request-concurrency 16
+
+매니페스트 형식:
+    - .txt: 한 줄에 비디오 경로 하나 (# 주석, 빈 줄 무시, 상대 경로는 매니페스트 위치 기준)
+    - .jsonl: 한 줄에 {"video_path": ..., "video_id": ...(선택)}
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import class_MultimodalLLM_QA_251107 as mLLM
+import tracing
+import ensemble_voting
+from agents.state import create_initial_state
+from agents.video_analyzer_agent import configure_provider_concurrency
+from graph_workflow import create_workflow
+from main_langgraph import create_mllm_instances, openai_api_key, google_api_key
+
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.webm', '.mpeg']
+
+
+def load_video_list(source: str) -> list:
+    """
+    디렉터리 또는 매니페스트 파일에서 분석할 비디오 목록 생성
+
+    Args:
+        source: 비디오 디렉터리 또는 매니페스트 파일(.txt/.jsonl) 경로
+
+    Returns:
+        [(video_id, video_path), ...] (video_id 순서대로 정렬, 디렉터리는 하위 폴더 포함)
+    """
+    videos = []
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            # 숨김 폴더(이전 실행의 .proxy 등 파생 파일)는 제외
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for file_name in files:
+                if os.path.splitext(file_name)[1].lower() in VIDEO_EXTENSIONS:
+                    video_path = os.path.join(root, file_name)
+                    # 하위 폴더가 달라도 같은 파일명이 겹치지 않도록 상대 경로를 ID로 사용
+                    videos.append((os.path.relpath(video_path, source), video_path))
+    elif os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if source.lower().endswith(".jsonl"):
+                    entry = json.loads(line)
+                    video_path = entry["video_path"]
+                    video_id = entry.get("video_id")
+                else:
+                    video_path = line
+                    video_id = None
+                if not os.path.isabs(video_path):
+                    video_path = os.path.join(base_dir, video_path)
+                videos.append((video_id or os.path.basename(video_path), video_path))
+    else:
+        raise FileNotFoundError(f"비디오 디렉터리 또는 매니페스트 파일을 찾을 수 없습니다: {source}")
+
+    video_ids = [video_id for video_id, _ in videos]
+    duplicates = sorted({video_id for video_id in video_ids if video_ids.count(video_id) > 1})
+    if duplicates:
+        raise ValueError(f"video_id가 중복되었습니다: {duplicates}")
+    return sorted(videos)
+
+
+def load_finished_ids(output_path: str, retry_failed: bool = False) -> set:
+    """
+    결과 JSONL(체크포인트)에서 이미 처리한 video_id 목록 읽기
+
+    Args:
+        output_path: 결과 JSONL 파일 경로
+        retry_failed: True이면 실패한 비디오는 다시 분석 대상으로 둠
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 중단 시 잘린 마지막 줄
+            if record.get("status") == "completed" or not retry_failed:
+                finished.add(record.get("video_id"))
+    return finished
+
+
+def summarize_result(video_id: str, video_path: str, final_state: dict, elapsed: float) -> dict:
+    """최종 상태에서 JSONL에 기록할 비디오별 결과 요약 생성"""
+    final_report = final_state.get("final_report") or {}
+    return {
+        "video_id": video_id,
+        "video_path": video_path,
+        "status": final_state.get("status"),
+        "llm_models": final_state.get("llm_models"),
+        "reference_times_avg": final_state.get("reference_times_avg"),
+        "model_reference_times": {
+            model_id: result.get("reference_times")
+            for model_id, result in (final_state.get("model_results") or {}).items()
+        },
+        "action_decisions": final_report.get("action_decisions"),
+        "total_actions_detected": final_report.get("summary", {}).get("total_actions_detected"),
+        "ensemble_voting": final_report.get("ensemble_voting"),
+        "visualization_path": final_state.get("visualization_path"),
+        "metrics": (final_state.get("metrics") or {}).get("video"),
+        "errors": final_state.get("errors", []),
+        "elapsed_sec": round(elapsed, 1),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+class BatchResultWriter:
+    """비디오별 결과를 JSONL 파일에 한 줄씩 추가 (여러 스레드에서 호출 가능, 줄마다 디스크에 반영)"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def analyze_video(workflow, video_id: str, video_path: str, llm_models: list) -> dict:
+    """비디오 하나를 워크플로우로 분석하고 결과 요약 반환 (예외도 실패 결과로 기록)"""
+    start = time.time()
+    try:
+        api_key = google_api_key if "gemini" in llm_models[0] else openai_api_key
+        initial_state = create_initial_state(video_path=video_path, llm_models=llm_models, api_key=api_key)
+        final_state = workflow.run(initial_state)
+    except Exception as e:
+        final_state = {"status": "error", "llm_models": llm_models, "errors": [f"배치 실행 중 오류: {str(e)}"]}
+    finally:
+        # 프록시 / 프레임 저장소(사용한 경우)는 비디오마다 수십~수백 MB이므로 분석이 끝나면 해제하고 삭제
+        workflow.video_processor.release_video(video_path)
+    return summarize_result(video_id, video_path, final_state, time.time() - start)
+
+
+def run_batch(source: str, output_path: str, llm_models: list, video_concurrency: int = 2,
+              request_concurrency: int = None, speculative_windows: int = 1,
+              search_strategy: str = "linear", retry_failed: bool = False, use_response_cache: bool = True,
+              pipeline_detectors: bool = False, combined_query: bool = False,
+              voting_strategy: str = "majority", model_reliability: dict = None,
+              use_proxy: bool = False, use_frame_store: bool = False,
+              use_frame_index: bool = False, frame_index_dir: str = None) -> dict:
+    """
+    비디오 목록을 배치로 분석
+
+    Args:
+        source: 비디오 디렉터리 또는 매니페스트 파일 경로
+        output_path: 결과 JSONL 파일 경로 (체크포인트로도 사용)
+        llm_models: 사용할 LLM 모델 리스트
+        video_concurrency: 동시에 분석할 비디오 수
+        request_concurrency: provider별 동시 LLM 호출 상한 (모든 비디오가 공유, None이면 기본값)
+        speculative_windows: 기준 시간 탐색 시 미리 동시에 질의할 구간 수
+        search_strategy: 기준 시간 탐색 전략 ("linear" 또는 "coarse_to_fine")
+        retry_failed: 이전 실행에서 실패한 비디오도 다시 분석할지 여부
+        use_response_cache: LLM 응답 디스크 캐시 사용 여부
+        pipeline_detectors: 기준 시점 탐지 간 파이프라인 실행 여부
+        combined_query: 구간 길이가 같은 기준 시점 질의를 구간마다 한 번에 묻는 통합 질의 모드 여부
+        voting_strategy: 앙상블 투표 방식 ("majority", "confidence_weighted", "reliability")
+        model_reliability: reliability 투표에 사용할 {모델 이름: 정확도}
+        use_proxy: 비디오마다 저해상도 프록시(시스템 임시 폴더)를 만들고 프레임 추출에 사용할지 여부 (분석이 끝나면 삭제)
+        use_frame_store: 비디오마다 프레임을 한 번 디코딩해 메모리 맵 저장소에 쓰고 모든 모델이 공유할지 여부
+        use_frame_index: 프레임 색인(PTS/키프레임)으로 시간 -> 프레임 변환 및 탐색할지 여부
+        frame_index_dir: 프레임 색인을 저장해 다음 배치에서 재사용할 캐시 폴더 (None이면 메모리에만 보관)
+
+    Returns:
+        {"total", "skipped", "completed", "failed"} 개수
+    """
+    videos = load_video_list(source)
+    finished = load_finished_ids(output_path, retry_failed)
+    pending = [(video_id, video_path) for video_id, video_path in videos if video_id not in finished]
+    print(f"비디오 {len(videos)}개 중 {len(videos) - len(pending)}개는 이미 처리됨, {len(pending)}개 분석 예정")
+
+    if request_concurrency is not None:
+        configure_provider_concurrency({"openai": request_concurrency, "google": request_concurrency})
+
+    response_cache = None
+    if use_response_cache:
+        response_cache = mLLM.LLMResponseCache(
+            db_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_response_cache.sqlite")
+        )
+    mllm_instances = create_mllm_instances(llm_models, response_cache=response_cache)
+    # 워크플로우는 한 번만 컴파일하여 모든 비디오에 (동시에) 재사용
+    workflow = create_workflow(mllm_instances, llm_models, speculative_windows, search_strategy,
+                               show_visualization=False, pipeline_detectors=pipeline_detectors,
+                               combined_query=combined_query, voting_strategy=voting_strategy,
+                               model_reliability=model_reliability, use_proxy=use_proxy,
+                               use_frame_store=use_frame_store, use_frame_index=use_frame_index,
+                               frame_index_dir=frame_index_dir)
+    # 동시에 분석 중인 비디오의 프록시 / 저장소가 등록 수 제한으로 제거되지 않도록
+    workflow.video_processor.max_proxies = max(workflow.video_processor.max_proxies, video_concurrency)
+    workflow.video_processor.max_frame_stores = max(workflow.video_processor.max_frame_stores, video_concurrency)
+    writer = BatchResultWriter(output_path)
+
+    counts = {"total": len(videos), "skipped": len(videos) - len(pending), "completed": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, video_concurrency)) as executor:
+        futures = {
+            executor.submit(analyze_video, workflow, video_id, video_path, llm_models): video_id
+            for video_id, video_path in pending
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            writer.write(record)
+            if record["status"] == "completed":
+                counts["completed"] += 1
+            else:
+                counts["failed"] += 1
+            done = counts["completed"] + counts["failed"]
+            print(f"[배치 {done}/{len(pending)}] {record['video_id']}: {record['status']} ({record['elapsed_sec']}초)")
+
+    if response_cache is not None:
+        response_cache.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="흡입기 비디오 배치 분석 (결과는 비디오당 JSONL 한 줄)")
+    parser.add_argument("source", help="비디오 디렉터리 또는 매니페스트 파일(.txt/.jsonl)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="결과 JSONL 경로 (체크포인트로도 사용)")
+    parser.add_argument("--models", nargs="+", default=["gemini-2.5-pro"], help="사용할 LLM 모델 (중복 가능)")
+    parser.add_argument("--video-concurrency", type=int, default=2, help="동시에 분석할 비디오 수")
+    parser.add_argument("--request-concurrency", type=int, default=None, help="provider별 동시 LLM 호출 상한")
+    parser.add_argument("--speculative-windows", type=int, default=1, help="기준 시간 탐색 시 미리 질의할 구간 수")
+    parser.add_argument("--search-strategy", default="linear", choices=["linear", "coarse_to_fine"])
+    parser.add_argument("--pipeline-detectors", action="store_true",
+                        help="이전 기준 시점의 후보가 나오면 다음 기준 시점 탐지를 미리 시작")
+    parser.add_argument("--combined-query", action="store_true",
+                        help="inhalerIN 확정 후 faceONinhaler와 inhalerOUT 질의를 구간마다 한 번의 LLM 호출로 물음")
+    parser.add_argument("--voting-strategy", default="majority", choices=list(ensemble_voting.VOTING_STRATEGIES),
+                        help="앙상블 투표 방식")
+    parser.add_argument("--reliability-file", default=None,
+                        help="reliability 투표에 사용할 모델별 정확도 JSON (ensemble_voting.save_reliability로 저장)")
+    parser.add_argument("--proxy", action="store_true",
+                        help="비디오마다 저해상도 프록시를 한 번 만들고 프레임 추출에 사용 (시스템 임시 폴더에 저장, 분석이 끝나면 삭제)")
+    parser.add_argument("--frame-store", action="store_true",
+                        help="비디오마다 프레임을 한 번 디코딩해 메모리 맵 저장소(임시 폴더)에 쓰고 모든 모델이 공유")
+    parser.add_argument("--frame-index", nargs="?", const="", default=None, metavar="DIR",
+                        help="프레임 색인(PTS/키프레임)으로 시간 -> 프레임 변환 및 탐색 (DIR을 주면 색인을 저장해 다음 실행에서 재사용)")
+    parser.add_argument("--retry-failed", action="store_true", help="이전에 실패한 비디오도 다시 분석")
+    parser.add_argument("--no-response-cache", action="store_true", help="LLM 응답 디스크 캐시 사용 안 함")
+    parser.add_argument("--trace-output", default=None, help="추적 스팬을 저장할 JSONL 경로 (지정하면 추적 켜짐)")
+    parser.add_argument("--trace-otel", action="store_true", help="추적 스팬을 opentelemetry TracerProvider로 보냄")
+    args = parser.parse_args()
+    
+    if args.trace_output or args.trace_otel:
+        tracing.configure_tracing(output_path=args.trace_output, use_opentelemetry=args.trace_otel)
+
+    counts = run_batch(
+        args.source, args.output, args.models,
+        video_concurrency=args.video_concurrency,
+        request_concurrency=args.request_concurrency,
+        speculative_windows=args.speculative_windows,
+        search_strategy=args.search_strategy,
+        retry_failed=args.retry_failed,
+        use_response_cache=not args.no_response_cache,
+        pipeline_detectors=args.pipeline_detectors,
+        combined_query=args.combined_query,
+        voting_strategy=args.voting_strategy,
+        model_reliability=ensemble_voting.load_reliability(args.reliability_file) if args.reliability_file else None,
+        use_proxy=args.proxy,
+        use_frame_store=args.frame_store,
+        use_frame_index=args.frame_index is not None,
+        frame_index_dir=args.frame_index or None,
+    )
+    print(f"\n배치 분석 완료: 전체 {counts['total']}개, 건너뜀 {counts['skipped']}개, "
+          f"성공 {counts['completed']}개, 실패 {counts['failed']}개")
+    print(f"결과 파일: {args.output}")
+    if args.trace_output and os.path.exists(args.trace_output):
+        chrome_trace_path = os.path.splitext(args.trace_output)[0] + ".chrome.json"
+        tracing.export_chrome_trace(args.trace_output, chrome_trace_path)
+        print(f"추적 파일: {args.trace_output} (flame graph: {chrome_trace_path})")
+
+
+if __name__ == "__main__":
+    main()
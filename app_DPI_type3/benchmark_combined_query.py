@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+통합 질의 모드 벤치마크
+기준 시점별로 따로 질의하는 기본 모드와, 구간 길이가 같은 기준 시점(faceONinhaler, inhalerOUT)을
+구간마다 한 번에 묻는 통합 질의 모드의 LLM 호출 수 / 소요 시간 / 탐지된 기준 시간을 비교하고,
+통합 질의의 호출 수가 기본 모드보다 많지 않은지 확인합니다. (호출마다 그리드 이미지 하나를 올리므로 호출 수 = 이미지 수)
+(benchmark_pipeline_detectors의 합성 비디오 + 규칙 기반 LLM 사용, API 호출 없음)
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+
+from agents.state import create_initial_state, apply_state_update
+from agents.video_processor_agent import VideoProcessorAgent, get_shared_frame_cache
+from agents.video_analyzer_agent import VideoAnalyzerAgent
+from benchmark_pipeline_detectors import TRUE_TIMES, RuleBasedLLM, make_video
+
+
+def run(video_path: str, combined_query: bool, speculative_windows: int = 1, use_async: bool = False):
+    """기준 시점 탐지를 한 번 수행하고 (기준 시간, LLM 호출 수, 소요 시간) 반환"""
+    get_shared_frame_cache().clear()
+    video_processor = VideoProcessorAgent()
+    state = create_initial_state(video_path=video_path, llm_models=["rule"])
+    state = apply_state_update(state, video_processor.process(state))
+    mllm = RuleBasedLLM()
+    analyzer = VideoAnalyzerAgent(mllm, video_processor, "rule_0", "rule",
+                                  speculative_windows=speculative_windows, combined_query=combined_query)
+    start = time.perf_counter()
+    update = asyncio.run(analyzer.aprocess(state)) if use_async else analyzer.process(state)
+    elapsed = time.perf_counter() - start
+    assert "errors" not in update, update.get("errors")
+    return update["model_results"]["rule_0"]["reference_times"], mllm.call_count, elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic.mp4")
+        make_video(video_path)
+
+        print(f"정답 기준 시간: {TRUE_TIMES}\n")
+        print(f"{'mode':<6} {'query':<9} {'ahead':>5} {'calls':>6} {'time(s)':>8}  reference_times")
+        for use_async in [False, True]:
+            for speculative_windows in [1, 3]:
+                calls_by_query = {}
+                for combined_query in [False, True]:
+                    reference_times, calls, elapsed = run(video_path, combined_query, speculative_windows, use_async)
+                    assert reference_times == TRUE_TIMES, reference_times
+                    calls_by_query[combined_query] = calls
+                    print(f"{'async' if use_async else 'sync':<6} {'combined' if combined_query else 'separate':<9} "
+                          f"{speculative_windows:>5} {calls:>6} {elapsed:>8.2f}  {reference_times}")
+                assert calls_by_query[True] <= calls_by_query[False], \
+                    f"통합 질의의 호출 수가 더 많음: {calls_by_query[True]} > {calls_by_query[False]}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+앙상블 평균 벤치마크
+ReporterAgent._compute_average의 기존 반복문 구현과 모델 × 행동 × 시간 배열(ensemble_voting) 구현을
+50개 모델 × 12개 행동 × 200개 시간 합성 결과로 비교하고, 두 구현의 결과가 같은지 확인합니다.
+(일부 시간의 답변 / confidence를 빼서 마스크 처리도 확인)
+"""
+
+import time
+import random
+
+import ensemble_voting
+from agents.reporter_agent import ReporterAgent
+
+
+REFERENCE_KEYS = ["inhalerIN", "faceONinhaler", "inhalerOUT"]
+
+
+def make_model_results(num_models: int = 50, num_actions: int = 12, num_times: int = 200,
+                       missing_rate: float = 0.1, missing_confidence_rate: float = 0.1, seed: int = 0) -> dict:
+    """모델별 promptbank_data 합성 (모델마다 일부 시간 / confidence가 빠져 있음)"""
+    rng = random.Random(seed)
+    action_keys = ReporterAgent.ACTION_ORDER[:num_actions]
+    time_points = [round(i * 0.5, 1) for i in range(num_times)]
+    model_results = {}
+    for m in range(num_models):
+        reference_times = {key: round(rng.uniform(0, 30), 1) for key in REFERENCE_KEYS}
+        check_action = {}
+        for action_key in action_keys:
+            times = [t for t in time_points if rng.random() >= missing_rate]
+            check_action[action_key] = {
+                "action": f"{action_key} 설명",
+                "time": times,
+                "score": [1 if rng.random() < 0.5 else 0 for _ in times],
+                "confidence_score": [
+                    (t, round(rng.random(), 2)) for t in times if rng.random() >= missing_confidence_rate
+                ],
+            }
+        model_results[f"model-{m}"] = {
+            "reference_times": reference_times,
+            "promptbank_data": {
+                "search_reference_time": {
+                    key: {"action": f"{key} 설명", "reference_time": value} for key, value in reference_times.items()
+                },
+                "check_action_step_DPI_type3": check_action,
+            },
+        }
+    return model_results
+
+
+def legacy_compute_average(model_results: dict) -> dict:
+    """기존 ReporterAgent._compute_average (모델별 반복문 + 시간별 리스트)"""
+    # Reference times 평균
+    reference_times_avg = {}
+    all_ref_time_keys = set()
+    for model_id, result in model_results.items():
+        ref_times = result.get("reference_times", {})
+        all_ref_time_keys.update(ref_times.keys())
+
+    for key in all_ref_time_keys:
+        values = []
+        for model_id, result in model_results.items():
+            ref_times = result.get("reference_times", {})
+            if key in ref_times:
+                values.append(ref_times[key])
+        reference_times_avg[key] = round(sum(values) / len(values), 1) if values else 0
+
+    # PromptBank 데이터 평균
+    # search_reference_time 평균
+    search_reference_time_avg = {}
+    all_search_ref_keys = set()
+    for model_id, result in model_results.items():
+        promptbank = result.get("promptbank_data", {})
+        search_ref = promptbank.get("search_reference_time", {})
+        all_search_ref_keys.update(search_ref.keys())
+
+    for key in all_search_ref_keys:
+        ref_times = []
+        action = None
+        for model_id, result in model_results.items():
+            promptbank = result.get("promptbank_data", {})
+            search_ref = promptbank.get("search_reference_time", {})
+            if key in search_ref:
+                ref_times.append(search_ref[key].get('reference_time', 0))
+                if action is None:
+                    action = search_ref[key].get('action', '')
+
+        avg_ref_time = round(sum(ref_times) / len(ref_times), 1) if ref_times else 0
+        search_reference_time_avg[key] = {
+            'action': action or '',
+            'reference_time': avg_ref_time
+        }
+
+    # check_action_step_DPI_type3 평균
+    check_action_step_DPI_type3_avg = {}
+    all_action_keys = set()
+    for model_id, result in model_results.items():
+        promptbank = result.get("promptbank_data", {})
+        check_action = promptbank.get("check_action_step_DPI_type3", {})
+        all_action_keys.update(check_action.keys())
+
+    for action_key in all_action_keys:
+        # 모든 모델에서 해당 action_key의 데이터 수집
+        all_times_scores = {}  # {time: [(score, confidence), ...]}
+        action_description = None
+
+        for model_id, result in model_results.items():
+            promptbank = result.get("promptbank_data", {})
+            check_action = promptbank.get("check_action_step_DPI_type3", {})
+            if action_key in check_action:
+                action_data = check_action[action_key]
+                if action_description is None:
+                    action_description = action_data.get('action', '')
+
+                times = action_data.get('time', [])
+                scores = action_data.get('score', [])
+                confidences = dict(action_data.get('confidence_score', []))
+
+                for i, t in enumerate(times):
+                    if t not in all_times_scores:
+                        all_times_scores[t] = []
+                    score = scores[i] if i < len(scores) else 0
+                    confidence = confidences.get(t, 0.5)
+                    all_times_scores[t].append((score, confidence))
+
+        # 각 시간에 대해 평균 계산
+        time_avg = []
+        score_avg = []
+        confidence_avg = []
+
+        for t in sorted(all_times_scores.keys()):
+            score_conf_list = all_times_scores[t]
+            scores = [sc[0] for sc in score_conf_list]
+            confidences = [sc[1] for sc in score_conf_list]
+
+            avg_score = sum(scores) / len(scores) if scores else 0
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.5
+
+            time_avg.append(t)
+            score_avg.append(1 if avg_score >= 0.5 else 0)
+            confidence_avg.append((t, round(avg_confidence, 2)))
+
+        check_action_step_DPI_type3_avg[action_key] = {
+            'action': action_description or '',
+            'time': time_avg,
+            'score': score_avg,
+            'confidence_score': confidence_avg
+        }
+
+    promptbank_data_avg = {
+        "search_reference_time": search_reference_time_avg,
+        "check_action_step_DPI_type3": check_action_step_DPI_type3_avg
+    }
+
+    return {
+        "reference_times_avg": reference_times_avg,
+        "promptbank_data_avg": promptbank_data_avg
+    }
+
+
+def same_result(legacy: dict, vectorized: dict) -> bool:
+    """두 구현의 결과 비교 (confidence는 부동소수점 합산 순서 차이로 0.01까지 허용)"""
+    if legacy["reference_times_avg"] != vectorized["reference_times_avg"]:
+        return False
+    legacy_pb, vectorized_pb = legacy["promptbank_data_avg"], vectorized["promptbank_data_avg"]
+    if legacy_pb["search_reference_time"] != vectorized_pb["search_reference_time"]:
+        return False
+    legacy_actions = legacy_pb["check_action_step_DPI_type3"]
+    vectorized_actions = vectorized_pb["check_action_step_DPI_type3"]
+    if legacy_actions.keys() != vectorized_actions.keys():
+        return False
+    for action_key, expected in legacy_actions.items():
+        actual = vectorized_actions[action_key]
+        if (expected["action"], expected["time"], expected["score"]) != (actual["action"], actual["time"], actual["score"]):
+            return False
+        for (t1, c1), (t2, c2) in zip(expected["confidence_score"], actual["confidence_score"]):
+            if t1 != t2 or abs(c1 - c2) > 0.01 + 1e-9:
+                return False
+    return True
+
+
+def measure(fn, repeat: int = 5) -> float:
+    """repeat번 실행한 평균 시간(ms)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000.0 / repeat
+
+
+def main():
+    reporter = ReporterAgent(show_visualization=False)
+    print(f"{'models':>6} {'actions':>7} {'times':>5} {'legacy(ms)':>10} {'vector(ms)':>10} {'speedup':>7} "
+          f"{'table(ms)':>9} {'vote(ms)':>8}")
+    for num_models, num_actions, num_times in [(3, 12, 60), (10, 12, 200), (50, 12, 200)]:
+        model_results = make_model_results(num_models, num_actions, num_times)
+        state = {"model_results": model_results}
+        legacy = legacy_compute_average(model_results)
+        vectorized = reporter._compute_average(state)
+        assert same_result(legacy, vectorized), "배열 구현의 결과가 기존 구현과 다름"
+
+        legacy_ms = measure(lambda: legacy_compute_average(model_results))
+        vectorized_ms = measure(lambda: reporter._compute_average(state))
+        # 배열 구현 내역: 리스트 -> 배열 변환(table) / 다수결 계산(vote)
+        table_ms = measure(lambda: ensemble_voting.VoteTable.from_model_results(model_results))
+        table = ensemble_voting.VoteTable.from_model_results(model_results)
+        vote_ms = measure(lambda: ensemble_voting.majority_vote(table))
+        print(f"{num_models:>6} {num_actions:>7} {num_times:>5} {legacy_ms:>10.1f} {vectorized_ms:>10.1f} "
+              f"{legacy_ms / vectorized_ms:>6.1f}x {table_ms:>9.1f} {vote_ms:>8.2f}")
+    print("\n배열 구현의 결과가 기존 구현과 동일")
+
+
+if __name__ == "__main__":
+    main()
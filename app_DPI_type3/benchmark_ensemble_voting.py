@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+앙상블 투표 방식 벤치마크
+정확도가 서로 다른 모델들의 합성 답변(정답 라벨 있음)으로 투표 방식별 정확도를 앙상블 크기에 따라 비교합니다.
+- reliability 가중치는 학습용 실행에서 learn_reliability()로 학습하고 평가용 실행에 적용
+- quorum_members()로 다수결 결과가 확정되는 모델 수를 사후 통계로 함께 출력 (투표 방식 아님)
+  (모든 모델이 답한 뒤 계산하므로 호출을 줄이지는 않고, 앙상블 크기를 정할 때 참고용)
+(API 호출 없음)
+"""
+
+import numpy as np
+
+import ensemble_voting
+from agents.reporter_agent import ReporterAgent
+
+
+# 모델 이름별 정확도 (앙상블 순서대로 반복 사용)
+MODEL_ACCURACY = {"model-a": 0.9, "model-b": 0.8, "model-c": 0.7, "model-d": 0.6, "model-e": 0.55}
+
+
+def make_run(rng, model_names: list, num_times: int = 60):
+    """
+    정답 라벨과 모델별 답변 합성
+
+    정답과 맞는 답변은 confidence가 높고 틀린 답변은 낮도록(완전하지는 않게) 생성
+
+    Returns:
+        (model_results, labels)
+    """
+    action_keys = ReporterAgent.ACTION_ORDER
+    times = [round(i * 0.5, 1) for i in range(num_times)]
+    truth = {key: rng.integers(0, 2, num_times) for key in action_keys}
+    labels = {key: {"time": times, "score": truth[key].tolist()} for key in action_keys}
+
+    model_results = {}
+    for idx, name in enumerate(model_names):
+        check_action = {}
+        for key in action_keys:
+            correct = rng.random(num_times) < MODEL_ACCURACY[name]
+            scores = np.where(correct, truth[key], 1 - truth[key])
+            confidence = np.clip(np.where(correct, rng.normal(0.75, 0.15, num_times),
+                                          rng.normal(0.55, 0.15, num_times)), 0.0, 1.0).round(2)
+            check_action[key] = {
+                "action": key,
+                "time": times,
+                "score": scores.tolist(),
+                "confidence_score": list(zip(times, confidence.tolist())),
+            }
+        model_results[f"{name}_{idx}"] = {
+            "model_name": name,
+            "promptbank_data": {"check_action_step_DPI_type3": check_action},
+        }
+    return model_results, labels
+
+
+def accuracy(result: dict, labels: dict) -> float:
+    """투표 결과와 정답 라벨이 일치하는 비율"""
+    hits = total = 0
+    for key, data in labels.items():
+        predicted = dict(zip(result[key]["time"], result[key]["score"]))
+        for t, label in zip(data["time"], data["score"]):
+            if t in predicted:
+                hits += predicted[t] == label
+                total += 1
+    return hits / total if total else 0.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    ensemble_order = list(MODEL_ACCURACY)[::-1] * 2  # 약한 모델부터 더해 가는 순서
+    reliability = ensemble_voting.learn_reliability(
+        make_run(rng, list(MODEL_ACCURACY)) for _ in range(20)
+    )
+    print(f"학습한 모델별 정확도: {reliability}\n")
+
+    test_runs = [make_run(rng, ensemble_order) for _ in range(30)]
+    strategies = ["majority", "confidence_weighted", "reliability"]
+    print(f"{'size':>4} " + " ".join(f"{s:>19}" for s in strategies) + f" {'quorum members':>15}")
+    for size in range(1, len(ensemble_order) + 1):
+        scores = {strategy: [] for strategy in strategies}
+        members = []
+        for model_results, labels in test_runs:
+            subset = dict(list(model_results.items())[:size])
+            table = ensemble_voting.VoteTable.from_model_results(subset)
+            for strategy in strategies:
+                result, _ = ensemble_voting.vote(table, strategy, reliability)
+                scores[strategy].append(accuracy(result, labels))
+            quorum = ensemble_voting.quorum_members(table)
+            members.append(quorum[quorum > 0].mean())
+        print(f"{size:>4} " + " ".join(f"{np.mean(scores[s]):>19.3f}" for s in strategies)
+              + f" {np.mean(members):>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
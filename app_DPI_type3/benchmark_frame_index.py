@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+프레임 색인(FrameIndex) 벤치마크
+1. 색인 생성(패킷만 훑기) / 캐시 폴더의 사이드카 파일 읽기 시간 (비디오 폴더에는 쓰지 않음)
+2. 구간별 그리드 추출: 명목 FPS + 프레임마다 CAP_PROP_POS_FRAMES 탐색(기존) vs 색인 + 키프레임 탐색 후 앞으로 디코딩
+   vs 키프레임을 모르는 색인(raw 패킷 모드 미지원, 일반 탐색)
+   (프레임 번호를 밝기로 기록한 합성 비디오로 실제로 읽은 프레임이 기대한 프레임인지 확인)
+3. 가변 프레임 레이트(VFR) PTS에서 명목 FPS 변환의 오차 (색인은 PTS 기준이라 오차 없음)
+"""
+
+import os
+import time
+import tempfile
+import numpy as np
+
+import class_Media_Edit_251107 as ME
+from benchmark_pipeline_detectors import make_video, FPS
+
+
+def decode_frame_number(frame) -> int:
+    """make_video가 왼쪽/오른쪽 밝기로 기록한 프레임 번호 복원"""
+    h, w = frame.shape[:2]
+    low = frame[h // 4: h * 3 // 4, w // 8: w * 3 // 8].mean()
+    high = frame[h // 4: h * 3 // 4, w * 5 // 8: w * 7 // 8].mean()
+    return int(low // 16) + 16 * int(high // 12)
+
+
+def extract_windows(media, video_path, windows, MxN=(1, 4)):
+    """구간마다 그리드를 추출하고 (소요 시간, 셀별 프레임 번호 목록) 반환"""
+    cell_w = 160
+    numbers = []
+    start = time.perf_counter()
+    for window_start, window_end in windows:
+        grid, _, _ = media.extract_frames_to_MxN_image('time', window_start, window_end, MxN, video_path,
+                                                       gridSize=(cell_w * MxN[1], 90), padSize=(0, 0))
+        numbers.append([decode_frame_number(grid[:, i * cell_w:(i + 1) * cell_w]) for i in range(MxN[1])])
+    return time.perf_counter() - start, numbers
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_dir = os.path.join(temp_dir, "videos")
+        cache_dir = os.path.join(temp_dir, "frame_index")
+        os.makedirs(video_dir)
+        video_path = os.path.join(video_dir, "synthetic.mp4")
+        make_video(video_path)  # 30초 (밝기로 기록할 수 있는 최대 길이)
+
+        start = time.perf_counter()
+        index = ME.FrameIndex.build(video_path)
+        build_ms = (time.perf_counter() - start) * 1000.0
+        index.save(video_path, cache_dir)
+        start = time.perf_counter()
+        loaded = ME.FrameIndex.load(video_path, cache_dir)
+        load_ms = (time.perf_counter() - start) * 1000.0
+        assert loaded is not None and np.array_equal(loaded.pts_ms, index.pts_ms)
+        assert os.listdir(video_dir) == ["synthetic.mp4"], "비디오 폴더에 파일이 생김"
+        keyframe_count = len(index.keyframes) if index.keyframes is not None else "알 수 없음"
+        print(f"색인: 프레임 {index.frame_count}개, 키프레임 {keyframe_count}개, "
+              f"생성 {build_ms:.1f}ms, 사이드카 읽기 {load_ms:.1f}ms\n")
+
+        windows = [(t, t + 1.0) for t in np.arange(0.0, 28.0, 0.5)]
+        rng = np.random.default_rng(0)
+        shuffled = [windows[i] for i in rng.permutation(len(windows))]
+        expected = [[int(s * FPS) + i * max((int(e * FPS) - int(s * FPS)) // 4, 1) for i in range(4)] for s, e in windows]
+
+        print(f"{'order':<9} {'mode':<12} {'ms/window':>9}  frames")
+        for order, window_list in [("forward", windows), ("shuffled", shuffled)]:
+            results = {}
+            for mode, use_index in [("nominal_fps", False), ("frame_index", True), ("no_keyframes", True)]:
+                media = ME.MediaEdit(use_capture_pool=True, use_frame_index=use_index, frame_index_dir=cache_dir)
+                if mode == "no_keyframes":
+                    media.get_frame_index(video_path).keyframes = None  # raw 패킷 모드를 지원하지 않는 환경
+                elapsed, numbers = extract_windows(media, video_path, window_list)
+                media.close()
+                results[mode] = numbers
+                print(f"{order:<9} {mode:<12} {elapsed * 1000 / len(window_list):>9.2f}  "
+                      f"{'정확' if numbers == [expected[windows.index(w)] for w in window_list] else '불일치'}")
+            assert results["nominal_fps"] == results["frame_index"] == results["no_keyframes"]
+
+        # 30fps로 기록되었지만 중간에 프레임이 빠지는(VFR) 휴대폰 영상의 PTS 예시
+        vfr_pts = np.concatenate([np.arange(0, 5000, 1000 / 30), np.arange(5000, 10000, 1000 / 15),
+                                  np.arange(10000, 15000, 1000 / 30)])
+        vfr = ME.FrameIndex(vfr_pts.round(3).tolist(), None, 30.0)
+        times = np.arange(0.0, 15.0, 0.5)
+        nominal = np.array([int(t * 30.0) for t in times])
+        exact = np.array([vfr.frame_at(t) for t in times])
+        error_ms = np.abs(vfr_pts[np.minimum(nominal, len(vfr_pts) - 1)] - times * 1000.0)
+        print(f"\nVFR 예시: 명목 FPS 변환은 최대 {error_ms.max() / 1000:.2f}초 어긋난 프레임을 선택 "
+              f"(색인 기준과 다른 구간 {int((nominal != exact).sum())}/{len(times)}개)")
+
+
+if __name__ == "__main__":
+    main()
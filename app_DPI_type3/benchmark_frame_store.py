@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+디코딩된 프레임 저장소(FrameStore, 메모리 맵 .npy) 벤치마크
+1. 저장소 생성(한 번) 시간 / 파일 크기: 탐지 구간이 샘플링하는 프레임만 저장(기본값) vs 모든 프레임
+2. 저장소에서 만든 그리드가 비디오를 디코딩해서 만든 그리드와 같은지 확인 (탐지 구간 레이아웃 1x10, 셀 640x360)
+   저장소에 없는 프레임이 필요한 구간(격자 밖 시작 시간)은 디코딩으로 대신 만드는지 확인
+3. analyzer를 작업 프로세스 여러 개로 실행할 때: 프로세스마다 직접 디코딩 vs 저장소 공유
+   (프로세스별 소요 시간과 익명 메모리(RssAnon) 증가량, 저장소는 파일 페이지(RssFile)로 공유됨)
+4. 등록 수 제한(max_frame_stores)을 넘으면 오래된 저장소의 메모리 맵을 닫고 파일을 삭제하는지 확인
+"""
+
+import os
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agents.video_processor_agent import VideoProcessorAgent
+from benchmark_proxy_ingest import make_video
+
+
+WORKERS = 4
+FPS = 30
+M, N = 1, 10
+GRID_SIZE = (640 * N, 360)
+
+
+def detector_windows(play_time: float):
+    """
+    기준 시점 탐지와 같은 구간 격자 (segment 2.0초와 0.5초, offset = segment)
+    0.5초 구간(15프레임)도 10프레임을 읽으므로 끝의 1초는 제외
+    """
+    windows = []
+    for segment_time in [2.0, 0.5]:
+        start = 0.0
+        while start <= play_time - max(segment_time, 1.0):
+            windows.append((start, start + segment_time))
+            start += segment_time
+    return windows
+
+
+def _memory_kb():
+    """(RssAnon, RssFile) kB (리눅스가 아니면 None)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            values = dict(line.split(":", 1) for line in f if line.startswith(("RssAnon", "RssFile")))
+        return int(values["RssAnon"].split()[0]), int(values["RssFile"].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def analyzer_worker(video_path: str, windows: list, store_path: str = None):
+    """작업 프로세스 하나(모델 하나)의 그리드 생성: (소요 ms, RssAnon 증가 kB, RssFile 증가 kB, 그리드 합계)"""
+    agent = VideoProcessorAgent(use_frame_cache=False)
+    before = _memory_kb()
+    start = time.perf_counter()
+    if store_path is not None:
+        agent.attach_frame_store(video_path, store_path)
+    checksum = 0
+    for grid, _, _ in agent.iter_frames(video_path, windows, M, N, GRID_SIZE):
+        checksum += int(grid[::37, ::41].sum())
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    after = _memory_kb()
+    if before is None or after is None:
+        return elapsed_ms, None, None, checksum
+    return elapsed_ms, after[0] - before[0], after[1] - before[1], checksum
+
+
+def run_workers(video_path: str, windows: list, store_path: str = None):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=WORKERS, mp_context=context) as executor:
+        # 프로세스 시작/모듈 임포트 시간은 제외
+        for future in [executor.submit(time.sleep, 0.2) for _ in range(WORKERS)]:
+            future.result()
+        start = time.perf_counter()
+        results = list(executor.map(analyzer_worker, [video_path] * WORKERS, [windows] * WORKERS,
+                                    [store_path] * WORKERS))
+        wall_ms = (time.perf_counter() - start) * 1000.0
+    return wall_ms, results
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic_1080p.mp4")
+        make_video(video_path, seconds=8.0, fps=FPS)
+        store_dir = os.path.join(temp_dir, "store")
+        processor = VideoProcessorAgent(use_frame_cache=False, use_frame_store=True, frame_store_dir=store_dir)
+        play_time = processor.video_edit.query_videoInfo(video_path)[1]
+        windows = detector_windows(play_time)
+
+        full_processor = VideoProcessorAgent(use_frame_cache=False, use_frame_store=True, frame_store_layouts=None,
+                                             frame_store_dir=os.path.join(temp_dir, "store_full"))
+        for label, agent in [("모든 프레임", full_processor), ("탐지 구간 프레임", processor)]:
+            start = time.perf_counter()
+            store = agent.build_frame_store(video_path)
+            build_ms = (time.perf_counter() - start) * 1000.0
+            print(f"저장소 생성({label}) {build_ms:.0f} ms (한 번), {store.frame_count}프레임 {store.frame_size}, "
+                  f"{os.path.getsize(store.path) / 1e6:.0f} MB")
+        full_processor.release_frame_store(video_path, delete=True)
+        print()
+
+        # 저장소 그리드 == 디코딩 그리드
+        decoder_agent = VideoProcessorAgent(use_frame_cache=False)
+        decoded = [grid for grid, _, _ in decoder_agent.iter_frames(video_path, windows, M, N, GRID_SIZE)]
+        stored = [grid for grid, _, _ in processor.iter_frames(video_path, windows, M, N, GRID_SIZE)]
+        random_access = [processor.extract_frames(video_path, s, e, M, N, GRID_SIZE)[0] for s, e in windows[::3]]
+        assert all(np.array_equal(a, b) for a, b in zip(decoded, stored)), "저장소 그리드가 디코딩 그리드와 다름"
+        assert all(np.array_equal(a, b) for a, b in zip(decoded[::3], random_access)), "저장소 그리드가 디코딩 그리드와 다름"
+        off_grid = [(s + 0.4, e + 0.4) for s, e in windows[::5]]
+        missing = sum(not store.has_frames(processor.video_edit._MxN_frame_indices(int(s * FPS), int(e * FPS), (M, N)))
+                      for s, e in off_grid)
+        assert missing > 0, "격자 밖 구간의 프레임이 모두 저장소에 있음"
+        decoded = [grid for grid, _, _ in decoder_agent.iter_frames(video_path, off_grid, M, N, GRID_SIZE)]
+        fallback = [grid for grid, _, _ in processor.iter_frames(video_path, off_grid, M, N, GRID_SIZE)]
+        assert all(a is not None and np.array_equal(a, b) for a, b in zip(decoded, fallback)), "디코딩 대체 실패"
+        print(f"구간 {len(windows)}개의 그리드가 디코딩 결과와 모두 동일 "
+              f"(격자 밖 구간 {len(off_grid)}개 중 저장소에 없는 {missing}개는 디코딩으로 생성)\n")
+
+        print(f"작업 프로세스 {WORKERS}개 (프로세스마다 구간 {len(windows)}개)")
+        print(f"{'mode':<8} {'wall(ms)':>9} {'worker(ms)':>11} {'RssAnon+(MB)':>13} {'RssFile+(MB)':>13}")
+        checksums = set()
+        for mode, store_path in [("decode", None), ("store", store.path)]:
+            wall_ms, results = run_workers(video_path, windows, store_path)
+            worker_ms = sum(r[0] for r in results) / len(results)
+            anon = f"{sum(r[1] for r in results) / 1024:.0f}" if results[0][1] is not None else "-"
+            shared = f"{sum(r[2] for r in results) / 1024:.0f}" if results[0][2] is not None else "-"
+            checksums.update(r[3] for r in results)
+            print(f"{mode:<8} {wall_ms:>9.0f} {worker_ms:>11.0f} {anon:>13} {shared:>13}")
+        assert len(checksums) == 1, "프로세스별 그리드가 다름"
+        print("\n(RssFile은 같은 파일 페이지를 모든 프로세스가 공유하므로 실제 메모리는 파일 크기 이하)")
+
+        # 등록 수 제한: 다른 비디오의 저장소를 만들면 가장 오래된 저장소를 닫고 삭제
+        other_paths = []
+        for i in range(processor.max_frame_stores):
+            other_paths.append(os.path.join(temp_dir, f"other_{i}.mp4"))
+            make_video(other_paths[-1], seconds=2.0, fps=FPS, size=(640, 360))
+            processor.build_frame_store(other_paths[-1])
+        assert store.frames is None and not os.path.exists(store.path), "제거된 저장소가 남아 있음"
+        assert processor.extract_frames(video_path, 0.0, 2.0, M, N, GRID_SIZE)[0] is not None
+        for path in other_paths:
+            processor.release_frame_store(path, delete=True)
+        assert not os.listdir(store_dir), "저장소 파일이 남아 있음"
+        print(f"저장소 {processor.max_frame_stores}개 제한: 오래된 저장소는 닫고 삭제, 해제한 저장소 파일 없음")
+
+
+if __name__ == "__main__":
+    main()
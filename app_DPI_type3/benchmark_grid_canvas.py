@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+그리드 캔버스 재사용 벤치마크
+탐지에 쓰는 1x10 / 1x4 레이아웃(셀 640x360)에서 그리드 하나를 만드는 시간과 새로 잡는 메모리를
+- legacy: 그리드마다 캔버스 np.zeros + 셀마다 리사이즈 결과 배열을 만든 뒤 복사 (기존 구현)
+- direct: 새 캔버스의 셀 영역(view)에 바로 리사이즈 (cv2.resize(dst=...))
+- pooled: 풀에서 빌린 캔버스를 재사용하면서 셀 영역에 바로 리사이즈
+로 비교합니다. 메모리는 tracemalloc 기준 그리드 하나를 만드는 동안의 최대 추가 할당량입니다.
+(합성 1280x720 프레임 사용)
+"""
+
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+import class_Media_Edit_251107 as ME
+
+
+def legacy_compose(selected_frames, MxN, gridSize, padSize):
+    """기존 MediaEdit._compose_MxN_grid"""
+    cell_width = (gridSize[0] - (MxN[1] - 1) * padSize[0]) // MxN[1]
+    cell_height = (gridSize[1] - (MxN[0] - 1) * padSize[1]) // MxN[0]
+    output_image = np.zeros((gridSize[1], gridSize[0], 3), dtype=np.uint8)
+    for idx, frame in enumerate(selected_frames):
+        row = idx // MxN[1]
+        col = idx % MxN[1]
+        start_x = col * (cell_width + padSize[0])
+        start_y = row * (cell_height + padSize[1])
+        resized_frame = cv2.resize(frame, (cell_width, cell_height))
+        output_image[start_y:start_y + cell_height, start_x:start_x + cell_width, :] = resized_frame
+    return output_image
+
+
+def measure(fn, repeat: int = 30):
+    """(ms/그리드, 그리드 하나를 만드는 동안의 최대 추가 할당 KiB)"""
+    fn()  # 풀 / 캐시 준비
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed_ms = (time.perf_counter() - start) * 1000.0 / repeat
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    image = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del image
+    return elapsed_ms, (peak - base) / 1024.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    media = ME.MediaEdit(use_capture_pool=False)
+
+    print(f"{'layout':>6} {'method':>7} {'ms/grid':>8} {'alloc(KiB)':>11}")
+    for M, N in [(1, 10), (1, 4)]:
+        MxN, padSize = (M, N), (0, 0)
+        gridSize = (int(1280 / 2) * N, int(720 / 2) * M)  # VideoAnalyzerAgent._build_search_windows와 같은 크기
+        frames = [rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8) for _ in range(M * N)]
+
+        expected = legacy_compose(frames, MxN, gridSize, padSize)
+        canvas = media.acquire_grid_canvas(MxN, gridSize, padSize)
+        assert np.array_equal(media._compose_MxN_grid(frames, MxN, gridSize, padSize), expected)
+        assert np.array_equal(media._compose_MxN_grid(frames, MxN, gridSize, padSize, canvas), expected)
+
+        def pooled():
+            out = media.acquire_grid_canvas(MxN, gridSize, padSize)
+            image = media._compose_MxN_grid(frames, MxN, gridSize, padSize, out)
+            media.release_grid_canvas(out)
+            return image
+
+        media.release_grid_canvas(canvas)
+        methods = {
+            "legacy": lambda: legacy_compose(frames, MxN, gridSize, padSize),
+            "direct": lambda: media._compose_MxN_grid(frames, MxN, gridSize, padSize),
+            "pooled": pooled,
+        }
+        for name, fn in methods.items():
+            ms, alloc_kib = measure(fn)
+            print(f"{f'{M}x{N}':>6} {name:>7} {ms:>8.2f} {alloc_kib:>11.1f}")
+    print(f"\n캔버스 풀 통계: {media.canvas_pool.get_stats()}")
+    print("세 방식의 그리드가 모두 동일")
+
+
+if __name__ == "__main__":
+    main()
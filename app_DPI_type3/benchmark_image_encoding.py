@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+이미지 입력 인코딩 마이크로벤치마크
+같은 그리드 이미지를 여러 모델(및 재시도)에 보낼 때, 요청 구성 과정에서 복사되는 바이트 수와 소요 시간을
+기존 방식(모델/호출마다 인코딩)과 공유 인코딩 캐시 방식으로 비교합니다. (API 호출 없음)
+
+복사 바이트 = 요청을 만들면서 새로 생성되는 중간 버퍼들의 크기 합 (SDK 전송 직렬화는 두 방식 공통이므로 제외)
+"""
+
+import io
+import json
+import time
+import base64
+import numpy as np
+import cv2
+from PIL import Image
+
+import class_MultimodalLLM_QA_251107 as mLLM
+
+
+def make_grid(M: int, N: int, gridSize=(640, 360)) -> np.ndarray:
+    """실제 프레임과 비슷하게 압축되도록 그라데이션 + 노이즈로 MxN 그리드 생성 (읽기 전용)"""
+    W, H = gridSize
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, W * N, dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 255, H * M, dtype=np.float32)[:, None, None]
+    grid = (0.5 * x + 0.5 * y + rng.normal(0, 12, (H * M, W * N, 3))).clip(0, 255).astype(np.uint8)
+    grid.flags.writeable = False
+    return grid
+
+
+def legacy_openai(grid):
+    """기존 OpenAI 경로: imencode -> b64encode -> decode -> f-string data URL -> 캐시 키용 JSON 직렬화"""
+    copied = 0
+    _, jpeg_image = cv2.imencode('.jpg', grid)
+    copied += jpeg_image.nbytes
+    b64 = base64.b64encode(jpeg_image)
+    copied += len(b64)
+    b64_str = b64.decode("utf-8")
+    copied += len(b64_str)
+    url = f"data:image/jpeg;base64,{b64_str}"
+    copied += len(url)
+    cache_payload = json.dumps({"url": url}).encode("utf-8")
+    copied += len(cache_payload)
+    return copied
+
+
+def legacy_gemini(grid):
+    """기존 Gemini 경로: BGR->RGB 변환 -> PIL 복사 -> 캐시 키용 tobytes -> SDK의 무손실 WebP 변환"""
+    copied = 0
+    image_rgb = cv2.cvtColor(grid, cv2.COLOR_BGR2RGB)
+    copied += image_rgb.nbytes
+    pil_image = Image.fromarray(image_rgb)
+    copied += image_rgb.nbytes
+    copied += len(pil_image.tobytes())
+    image_io = io.BytesIO()
+    pil_image.save(image_io, format="webp", lossless=True)
+    copied += 2 * image_io.tell()  # BytesIO 버퍼 + read()로 꺼낸 bytes
+    return copied
+
+
+def shared_openai(grid, cache):
+    """새 OpenAI 경로: 공유 캐시의 EncodedImage.data_url 사용 (캐시 키는 JPEG 해시)"""
+    before = cache.get_stats()["misses"]
+    encoded = cache.encode(grid)
+    url = encoded.data_url
+    mLLM.LLMResponseCache.make_key("model", {"url": url})
+    if cache.get_stats()["misses"] == before:
+        return 0  # 다른 모델/재시도가 이미 인코딩함
+    # imencode 버퍼 + tobytes + b64encode + prefix 결합 + str 디코딩
+    return len(encoded.data) * 2 + (len(url) - len(encoded.data_url_prefix)) + 2 * len(url)
+
+
+def shared_gemini(grid, cache, lossless=True):
+    """새 Gemini 경로: 공유 캐시의 무손실 WebP(기본값) 또는 JPEG 바이트를 inline_data로 그대로 사용"""
+    before = cache.get_stats()["misses"]
+    encoded = cache.encode(grid, lossless=lossless)
+    part = encoded.gemini_part
+    mLLM.LLMResponseCache.make_key("model", [part])
+    if cache.get_stats()["misses"] == before:
+        return 0
+    return len(encoded.data) * 2  # imencode 버퍼 + tobytes
+
+
+def run(label, fn, grids, num_models):
+    start = time.perf_counter()
+    total = 0
+    calls = 0
+    for grid in grids:
+        for _ in range(num_models):
+            total += fn(grid)
+            calls += 1
+    elapsed = (time.perf_counter() - start) * 1000 / calls
+    print(f"  {label:<28} {total / calls / 1024:>10.1f} KiB/call {elapsed:>8.2f} ms/call")
+
+
+def main():
+    num_models = 5
+    num_windows = 4
+    for M, N in [(1, 10), (1, 4)]:
+        grids = [make_grid(M, N) for _ in range(num_windows)]
+        print(f"\n=== {M}x{N} 그리드 ({grids[0].shape[1]}x{grids[0].shape[0]}), 구간 {num_windows}개 x 모델 {num_models}개 ===")
+        run("OpenAI  기존", legacy_openai, grids, num_models)
+        run("OpenAI  공유 인코딩", lambda g, c=mLLM.ImageEncodeCache(): shared_openai(g, c), grids, num_models)
+        run("Gemini  기존(무손실 WebP)", legacy_gemini, grids, num_models)
+        run("Gemini  공유 인코딩(무손실 WebP)", lambda g, c=mLLM.ImageEncodeCache(): shared_gemini(g, c), grids, num_models)
+        run("Gemini  공유 인코딩(JPEG, 선택)", lambda g, c=mLLM.ImageEncodeCache(): shared_gemini(g, c, False),
+            grids, num_models)
+
+
+if __name__ == "__main__":
+    main()
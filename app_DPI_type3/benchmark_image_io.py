@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+이미지 파일 입출력(cv2_imread / cv2_imwrite) 벤치마크 및 동시성 점검
+1. 한글 파일명 읽기/쓰기 (MediaEdit, multimodalLLM), 확장자가 없거나 알 수 없는 파일은 PNG로 저장
+2. 기존 방식(원본을 작업 폴더의 고정 이름 temporary_cv2_imread로 옮겼다가 되돌림)과
+   메모리 방식(np.fromfile + cv2.imdecode, cv2.imencode + tofile)의 호출당 소요 시간
+3. 동시성 점검: 여러 스레드 / 여러 프로세스가 같은 파일들을 동시에 읽고 같은 파일에 동시에 쓸 때
+   모든 읽기 결과가 정확하고, 원본 파일과 작업 폴더에 흔적이 남지 않는지 확인 (기존 방식은 실패 수를 함께 표시)
+"""
+
+import os
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import cv2
+
+import class_Media_Edit_251107 as ME
+import class_MultimodalLLM_QA_251107 as mLLM
+
+
+IMAGES = 8
+THREADS = 16
+PROCESSES = 4
+OPS_PER_WORKER = 100
+
+
+def legacy_imread(image_path):
+    """기존 MediaEdit.cv2_imread"""
+    image_path_temp = 'temporary_cv2_imread'
+    os.replace(image_path, image_path_temp)
+    image = cv2.imread(image_path_temp)
+    os.replace(image_path_temp, image_path)
+    return image
+
+
+def legacy_imwrite(output_file, output_image):
+    """기존 MediaEdit.cv2_imwrite"""
+    output_file_temp = 'temporary_cv2_imwrite.png'
+    cv2.imwrite(output_file_temp, output_image)
+    os.replace(output_file_temp, output_file)
+
+
+def make_image(seed: int, size=(320, 180)) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    image = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    image[:] = rng.integers(0, 256, 3, dtype=np.uint8)
+    image[::7] = rng.integers(0, 256, (size[0], 3), dtype=np.uint8)
+    return image
+
+
+def image_paths(data_dir: str):
+    return [os.path.join(data_dir, f"흡입기_그리드_{i}.png") for i in range(IMAGES)]
+
+
+def stress_worker(data_dir: str, worker_id: int, use_legacy: bool):
+    """
+    같은 이미지들을 읽고(정답과 비교), 자기 파일과 모든 작업이 함께 쓰는 파일에 번갈아 저장
+    Returns:
+        (성공한 작업 수, 실패 수)
+    """
+    media = ME.MediaEdit(use_capture_pool=False)
+    imread = legacy_imread if use_legacy else media.cv2_imread
+    imwrite = legacy_imwrite if use_legacy else media.cv2_imwrite
+    expected = [make_image(i) for i in range(IMAGES)]
+    paths = image_paths(data_dir)
+    own_path = os.path.join(data_dir, f"출력_{os.getpid()}_{worker_id}.png")
+    shared_path = os.path.join(data_dir, "출력_공유.png")
+    ok, failed = 0, 0
+    for op in range(OPS_PER_WORKER):
+        i = (worker_id + op) % IMAGES
+        try:
+            if op % 3 == 2:
+                imwrite(own_path if op % 2 else shared_path, expected[i])
+                image = imread(own_path) if op % 2 else expected[i]
+            else:
+                image = imread(paths[i])
+            if image is not None and np.array_equal(image, expected[i]):
+                ok += 1
+            else:
+                failed += 1
+        except Exception:
+            failed += 1
+    return ok, failed
+
+
+def check_clean(data_dir: str):
+    """원본 이미지가 그대로 있고, 임시 파일이 남지 않았는지 확인"""
+    for i, path in enumerate(image_paths(data_dir)):
+        assert os.path.exists(path), f"원본 이미지가 사라짐: {path}"
+        assert np.array_equal(ME.MediaEdit(use_capture_pool=False).cv2_imread(path), make_image(i))
+    leftovers = [name for name in os.listdir(data_dir) if name.endswith(".tmp") or name.startswith("temporary_cv2")]
+    assert not leftovers, f"임시 파일이 남음: {leftovers}"
+    shared = ME.MediaEdit(use_capture_pool=False).cv2_imread(os.path.join(data_dir, "출력_공유.png"))
+    assert any(np.array_equal(shared, make_image(i)) for i in range(IMAGES)), "함께 쓴 파일이 손상됨"
+
+
+def prepare(data_dir: str):
+    media = ME.MediaEdit(use_capture_pool=False)
+    for i, path in enumerate(image_paths(data_dir)):
+        assert media.cv2_imwrite(path, make_image(i))
+
+
+def run_threads(data_dir: str, use_legacy: bool):
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(stress_worker, [data_dir] * THREADS, range(THREADS), [use_legacy] * THREADS))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def run_processes(data_dir: str):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=PROCESSES, mp_context=context) as executor:
+        results = list(executor.map(stress_worker, [data_dir] * PROCESSES, range(PROCESSES), [False] * PROCESSES))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def main():
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)  # 기존 방식은 작업 폴더에 임시 파일을 만듦
+        try:
+            # 1. 한글 파일명 (MediaEdit / multimodalLLM)
+            media = ME.MediaEdit(use_capture_pool=False)
+            llm = mLLM.multimodalLLM("gpt-5-nano", api_key="benchmark")
+            image = make_image(0)
+            for name in ["한글_이미지.png", "한글_이미지.jpg"]:
+                path = os.path.join(temp_dir, "한글 폴더", name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                for owner in (media, llm):
+                    assert owner.cv2_imwrite(path, image)
+                    loaded = owner.cv2_imread(path)
+                    assert loaded is not None and loaded.shape == image.shape
+                    if name.endswith(".png"):
+                        assert np.array_equal(loaded, image)
+            assert cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED) is not None
+            assert media.cv2_imread(os.path.join(temp_dir, "없는_파일.png")) is None
+            # 확장자가 없거나 OpenCV가 모르는 확장자는 PNG로 저장 (기존 방식과 같음)
+            for name in ["확장자_없음", "알수없는_확장자.tmp", "점으로_끝남."]:
+                path = os.path.join(temp_dir, "한글 폴더", name)
+                for owner in (media, llm):
+                    assert owner.cv2_imwrite(path, image), f"저장 실패: {name}"
+                    assert np.array_equal(owner.cv2_imread(path), image)
+            print("한글 경로 읽기/쓰기 (PNG 무손실, JPEG, 확장자 없음/알 수 없음 -> PNG): MediaEdit / multimodalLLM 모두 정상\n")
+
+            # 2. 호출당 소요 시간
+            data_dir = os.path.join(temp_dir, "data")
+            os.makedirs(data_dir)
+            prepare(data_dir)
+            path = image_paths(data_dir)[0]
+            output_path = os.path.join(data_dir, "출력_시간.png")
+            repeats = 300
+            print(f"{'method':<8} {'read(ms)':>9} {'write(ms)':>10}")
+            for label, imread, imwrite in [("legacy", legacy_imread, legacy_imwrite),
+                                           ("memory", media.cv2_imread, media.cv2_imwrite)]:
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    imread(path)
+                read_ms = (time.perf_counter() - start) * 1000.0 / repeats
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    imwrite(output_path, image)
+                write_ms = (time.perf_counter() - start) * 1000.0 / repeats
+                print(f"{label:<8} {read_ms:>9.3f} {write_ms:>10.3f}")
+
+            # 3. 동시성 점검
+            print(f"\n동시성 점검 (작업마다 {OPS_PER_WORKER}회 읽기/쓰기)")
+            print(f"{'mode':<24} {'ok':>6} {'failed':>7}")
+            ok, failed = run_threads(data_dir, use_legacy=True)
+            print(f"{'legacy, ' + str(THREADS) + ' threads':<24} {ok:>6} {failed:>7}")
+            # 기존 방식이 옮겨 둔 채 끝난 원본을 복구한 뒤 새 방식 점검
+            for name in os.listdir(temp_dir):
+                if name.startswith("temporary_cv2"):
+                    os.remove(os.path.join(temp_dir, name))
+            prepare(data_dir)
+
+            ok, failed = run_threads(data_dir, use_legacy=False)
+            print(f"{'memory, ' + str(THREADS) + ' threads':<24} {ok:>6} {failed:>7}")
+            assert failed == 0, "메모리 방식의 스레드 동시 읽기/쓰기 실패"
+            ok, failed = run_processes(data_dir)
+            print(f"{'memory, ' + str(PROCESSES) + ' processes':<24} {ok:>6} {failed:>7}")
+            assert failed == 0, "메모리 방식의 프로세스 동시 읽기/쓰기 실패"
+            check_clean(data_dir)
+            assert not [name for name in os.listdir(temp_dir) if name.startswith("temporary_cv2")]
+            print("\n메모리 방식: 모든 읽기가 정확하고, 원본 파일과 작업 폴더에 흔적 없음")
+        finally:
+            os.chdir(original_cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+기준 시점 탐지 파이프라인 벤치마크
+inhalerIN -> faceONinhaler -> inhalerOUT 탐지를 순차로 실행할 때와 파이프라인 모드
+(이전 기준 시점의 후보가 나오면 다음 탐지를 미리 시작)로 실행할 때의 소요 시간, LLM 호출 수를 비교하고
+최종 결과(기준 시간, Q 답변)가 동일한지 확인합니다. (합성 비디오 + 지연 시간이 있는 고정 규칙 LLM, API 호출 없음)
+취소를 요청한 공유 질의를 memo가 다른 탐색에 내주지 않는지도 확인합니다.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import numpy as np
+import cv2
+
+import class_PromptBank_251107 as PB
+from agents.state import create_initial_state, apply_state_update
+from agents.video_processor_agent import VideoProcessorAgent, get_shared_frame_cache
+from agents.video_analyzer_agent import VideoAnalyzerAgent, WindowResponseMemo
+
+
+# 기준 시점별 정답 시간 (이 시간 이후 구간부터 YES)
+TRUE_TIMES = {"inhalerIN": 8.0, "faceONinhaler": 12.5, "inhalerOUT": 19.0}
+FPS = 10
+
+
+def make_video(path: str, seconds: float = 30.0, size=(160, 90)):
+    """프레임 번호를 왼쪽/오른쪽 밝기로 기록한 합성 비디오 생성 (압축 후에도 번호 복원 가능)"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, size)
+    half = size[0] // 2
+    for i in range(int(seconds * FPS)):
+        frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        frame[:, :half] = (i % 16) * 16 + 8
+        frame[:, half:] = (i // 16) * 12 + 6
+        writer.write(frame)
+    writer.release()
+
+
+class RuleBasedLLM:
+    """
+    구간 첫 프레임의 번호로 시간을 복원하여 TRUE_TIMES 이후면 YES로 답하는 테스트용 LLM (질의마다 latency초 지연)
+    통합 질의(기준 시점 접두어가 붙은 답변 형식)에는 질의에 포함된 기준 시점만 답함
+    """
+    provider = "benchmark"
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.call_count = 0
+        promptbank = PB.PromptBank()
+        self.questions = {
+            promptbank.search_reference_time[key]["action"]: key for key in TRUE_TIMES
+        }
+
+    @staticmethod
+    def _window_start(image_array):
+        cell_h = image_array.shape[0]
+        cell_w = 640  # 그리드 셀 하나의 폭 (int(1280/2))
+        low = image_array[cell_h // 4: cell_h * 3 // 4, cell_w // 8: cell_w * 3 // 8].mean()
+        high = image_array[cell_h // 4: cell_h * 3 // 4, cell_w * 5 // 8: cell_w * 7 // 8].mean()
+        return (int(low // 16) + 16 * int(high // 12)) / FPS
+
+    @staticmethod
+    def _answer_lines(reference_key, window_start, prefix=""):
+        answer = "YES" if window_start >= TRUE_TIMES[reference_key] - 1e-6 else "NO"
+        lines = [f"{prefix}Overall_Answer: {answer}"]
+        for i in range(1, 7):
+            lines.append(f"{prefix}Q{i}_Answer: {'YES' if (int(window_start * 2) + i) % 3 else 'NO'}")
+            lines.append(f"{prefix}Q{i}_Confidence: 0.{i}")
+        return lines
+
+    def _answer(self, user_prompt, image_array):
+        self.call_count += 1
+        window_start = self._window_start(image_array)
+        if "_Overall_Answer" in user_prompt:
+            lines = []
+            for reference_key in TRUE_TIMES:
+                if f"{reference_key}_Overall_Answer" in user_prompt:
+                    lines += self._answer_lines(reference_key, window_start, f"{reference_key}_")
+            return "\n".join(lines)
+        reference_key = next(key for question, key in self.questions.items() if question in user_prompt)
+        return "\n".join(self._answer_lines(reference_key, window_start))
+
+    def query_answer_chatGPT(self, system_prompt, user_prompt, image_array=None, **kwargs):
+        time.sleep(self.latency)
+        return self._answer(user_prompt, image_array)
+
+    async def aquery(self, system_prompt, user_prompt, image_array=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._answer(user_prompt, image_array)
+
+
+def run(video_path: str, search_strategy: str, speculative_windows: int, pipeline_detectors: bool,
+        use_async: bool = False):
+    """기준 시점 탐지를 한 번 수행하고 (기준 시간, Q 답변, LLM 호출 수, 소요 시간) 반환"""
+    get_shared_frame_cache().clear()
+    video_processor = VideoProcessorAgent()
+    state = create_initial_state(video_path=video_path, llm_models=["rule"])
+    state = apply_state_update(state, video_processor.process(state))
+    analyzer = VideoAnalyzerAgent(RuleBasedLLM(), video_processor, "rule_0", "rule",
+                                  speculative_windows=speculative_windows, search_strategy=search_strategy,
+                                  pipeline_detectors=pipeline_detectors)
+    start = time.perf_counter()
+    update = asyncio.run(analyzer.aprocess(state)) if use_async else analyzer.process(state)
+    elapsed = time.perf_counter() - start
+    assert "errors" not in update, update.get("errors")
+    result = update["model_results"]["rule_0"]
+    calls = result["metrics"]["totals"].get("window_queries", 0)
+    return result["reference_times"], result["q_answers_accumulated"], calls, elapsed
+
+
+async def check_memo_cancel_race():
+    """
+    취소를 요청한 직후(이벤트 루프가 돌기 전, cancelled()가 아직 False)에 같은 구간을 요청하면
+    취소될 질의 대신 새 질의를 받아야 함 (받으면 CancelledError가 실제 탐지로 전파됨)
+    """
+    async def query():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    memo = WindowResponseMemo()
+    speculative, _ = memo.acquire("q", 1.0, lambda: asyncio.ensure_future(query()))
+    assert memo.release("q", 1.0, speculative) and not speculative.cancelled()
+    actual, shared = memo.acquire("q", 1.0, lambda: asyncio.ensure_future(query()))
+    assert actual is not speculative and not shared, "취소를 요청한 질의를 다시 내줌"
+    assert await actual == "answer"
+    await asyncio.sleep(0)
+    assert speculative.cancelled()
+
+    # 함께 쓰는 탐색이 남아 있으면 취소하지 않음
+    first, _ = memo.acquire("q", 2.0, lambda: asyncio.ensure_future(query()))
+    second, shared = memo.acquire("q", 2.0, lambda: asyncio.ensure_future(query()))
+    assert second is first and shared and not memo.release("q", 2.0, first)
+    assert await second == "answer"
+
+
+def main():
+    asyncio.run(check_memo_cancel_race())
+    print("memo: 취소를 요청한 질의는 다른 탐색에 내주지 않음\n")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic.mp4")
+        make_video(video_path)
+
+        print(f"{'mode':<6} {'strategy':<15} {'ahead':>5} {'pipeline':>8} {'calls':>6} {'time(s)':>8}  reference_times")
+        for use_async in [False, True]:
+            for search_strategy in ["linear", "coarse_to_fine"]:
+                for speculative_windows in [1, 3]:
+                    baseline = None
+                    for pipeline_detectors in [False, True]:
+                        reference_times, q_answers, calls, elapsed = run(
+                            video_path, search_strategy, speculative_windows, pipeline_detectors, use_async
+                        )
+                        if baseline is None:
+                            baseline = (reference_times, q_answers)
+                        else:
+                            assert (reference_times, q_answers) == baseline, "파이프라인 모드의 결과가 순차 탐지와 다름"
+                        print(f"{'async' if use_async else 'sync':<6} {search_strategy:<15} {speculative_windows:>5} "
+                              f"{str(pipeline_detectors):>8} {calls:>6} {elapsed:>8.2f}  {reference_times}")
+        print("\n파이프라인 모드의 기준 시간 / Q 답변이 순차 탐지와 모두 동일")
+
+
+if __name__ == "__main__":
+    main()
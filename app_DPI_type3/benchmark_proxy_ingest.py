@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+저해상도 프록시 벤치마크
+1080p 합성 비디오에서 구간별 그리드(1x4, 셀 640x360)를 원본에서 추출할 때와
+프록시(640x360, 짧은 키프레임 간격)에서 추출할 때의 구간당 소요 시간을 비교하고,
+프록시 생성(한 번) 시간과 두 방식이 같은 프레임을 읽는지, 다 쓴 프록시 파일이 삭제되는지 확인합니다.
+재생 시간이 소수 둘째 자리로 나누어떨어지지 않는 비디오(1001프레임, 30fps)에서도 구간의 프레임 범위가 원본과 같은지 확인합니다.
+"""
+
+import os
+import time
+import tempfile
+import numpy as np
+import cv2
+
+from agents.video_processor_agent import VideoProcessorAgent
+
+
+FPS = 10
+CELL_W = 640
+MxN = (1, 4)
+
+
+def make_video(path: str, seconds: float = 25.0, size=(1920, 1080), fps: int = FPS, frame_count: int = None):
+    """
+    프레임 번호를 세 띠의 밝기(8진수 자리, 32 간격)로 기록한 합성 비디오 생성 (frame_count를 주면 seconds 대신 사용)
+    프록시로 한 번 더 압축해도 번호를 복원할 수 있도록 밝기 간격을 넓게 둠
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    band = size[0] // 3
+    for i in range(frame_count if frame_count is not None else int(seconds * fps)):
+        frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        for digit in range(3):
+            frame[:, digit * band:(digit + 1) * band] = ((i >> (3 * digit)) & 7) * 32 + 16
+        writer.write(frame)
+    writer.release()
+
+
+def decode_frame_number(frame) -> int:
+    """make_video가 세 띠의 밝기로 기록한 프레임 번호 복원"""
+    h, w = frame.shape[:2]
+    band = w // 3
+    number = 0
+    for digit in range(3):
+        value = frame[h // 4: h * 3 // 4, digit * band + band // 4: digit * band + band * 3 // 4].mean()
+        number += int(min(max(round((value - 16) / 32), 0), 7)) << (3 * digit)
+    return number
+
+
+def run(agent, video_path, windows, sequential):
+    """구간마다 그리드를 추출하고 (구간당 ms, 셀별 프레임 번호 목록) 반환"""
+    gridSize = (CELL_W * MxN[1], 360)
+    start = time.perf_counter()
+    if sequential:
+        grids = list(agent.iter_frames(video_path, windows, MxN[0], MxN[1], gridSize))
+    else:
+        grids = [agent.extract_frames(video_path, s, e, MxN[0], MxN[1], gridSize) for s, e in windows]
+    elapsed_ms = (time.perf_counter() - start) * 1000.0 / len(windows)
+    numbers = [[decode_frame_number(grid[0][:, i * CELL_W:(i + 1) * CELL_W]) for i in range(MxN[1])]
+               for grid in grids]
+    return elapsed_ms, numbers
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic_1080p.mp4")
+        make_video(video_path)
+        windows = [(t / 2, t / 2 + 2.0) for t in range(0, 46)]
+
+        original = VideoProcessorAgent(use_frame_cache=False)
+        proxied = VideoProcessorAgent(use_frame_cache=False, use_proxy=True, proxy_dir=os.path.join(temp_dir, "proxy"))
+
+        start = time.perf_counter()
+        proxy = proxied.ingest(video_path)
+        create_ms = (time.perf_counter() - start) * 1000.0
+        start = time.perf_counter()
+        proxied.ingest(video_path)
+        reuse_ms = (time.perf_counter() - start) * 1000.0
+        print(f"프록시: {proxy.path}")
+        print(f"프록시 생성 {create_ms:.0f} ms (한 번), 기존 프록시 재사용 확인 {reuse_ms:.1f} ms")
+        print(f"구간 {len(windows)}개, 그리드 {MxN[0]}x{MxN[1]}, {FPS} fps\n")
+
+        print(f"{'mode':<12} {'original(ms)':>13} {'proxy(ms)':>10} {'speedup':>8}")
+        for sequential in [False, True]:
+            original_ms, original_numbers = run(original, video_path, windows, sequential)
+            proxy_ms, proxy_numbers = run(proxied, video_path, windows, sequential)
+            assert proxy_numbers == original_numbers, "프록시에서 읽은 프레임이 원본과 다름"
+            print(f"{'sequential' if sequential else 'random':<12} {original_ms:>13.1f} {proxy_ms:>10.1f} "
+                  f"{original_ms / proxy_ms:>7.1f}x")
+        print("\n프록시와 원본에서 읽은 프레임 번호가 모두 동일")
+
+        # 재생 시간이 반올림되는 비디오: 1001프레임 / 30fps = 33.3666...초 (query_videoInfo는 33.37초)
+        odd_path = os.path.join(temp_dir, "synthetic_1001.mp4")
+        make_video(odd_path, size=(320, 180), fps=30, frame_count=1001)
+        odd_proxy = proxied.ingest(odd_path)
+        fps = original.video_edit.query_fps(odd_path)
+        odd_windows = [(t / 2, t / 2 + 0.5) for t in range(0, 66)]
+        mismatched = [(s, e) for s, e in odd_windows
+                      if odd_proxy.frame_range(s, e) != original.video_edit._time_to_frame_range('time', s, e, fps)]
+        assert not mismatched, f"프록시 프레임 범위가 원본과 다름: {mismatched[:3]}"
+        print(f"1001프레임 30fps 비디오: 구간 {len(odd_windows)}개의 프레임 범위가 원본과 동일 "
+              f"(예: 0.5~1.0초 -> {odd_proxy.frame_range(0.5, 1.0)})")
+        proxied.release_video(odd_path)
+
+        # 분석이 끝난 비디오의 프록시는 등록 해제 후 삭제, 등록 수 제한을 넘으면 오래된 프록시부터 삭제
+        proxied.release_video(video_path)
+        assert not os.path.exists(proxy.path) and proxied._get_proxy(video_path) is None
+        others = []
+        for i in range(proxied.max_proxies + 1):
+            others.append(os.path.join(temp_dir, f"other_{i}.mp4"))
+            make_video(others[-1], seconds=1.0, size=(640, 360))
+            proxied.ingest(others[-1])
+        assert proxied._get_proxy(others[0]) is None and not os.path.exists(proxied._proxy_path(others[0]))
+        for path in others[1:]:
+            proxied.release_video(path)
+        assert not os.listdir(os.path.dirname(proxy.path)), "프록시 파일이 남아 있음"
+        print(f"프록시 {proxied.max_proxies}개 제한: 오래된 프록시와 해제한 비디오의 프록시 파일 삭제")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+기준 시간 탐색 전략 벤치마크
+선형 탐색(linear)과 coarse-to-fine 탐색의 LLM 호출 수 및 탐지 시간을 비교하고 결과를 확인합니다.
+(합성 비디오 + 지연 시간이 있는 고정 규칙 LLM, API 호출 없음)
+- 기준 시간: 두 전략이 같아야 함
+- 누적 Q 답변: coarse-to-fine은 질의한 구간의 답변만 누적하므로 선형 탐색 답변의 부분집합
+  (같은 시작 시간의 답변은 같고, coarse 단계에서 건너뛴 구간의 답변만 빠짐)
+"""
+
+import os
+import time
+import tempfile
+
+from agents.state import create_initial_state, apply_state_update
+from agents.video_processor_agent import VideoProcessorAgent, get_shared_frame_cache
+from agents.video_analyzer_agent import VideoAnalyzerAgent
+from benchmark_pipeline_detectors import RuleBasedLLM, make_video
+
+
+def run_strategy(video_path, search_strategy, coarse_stride=4, speculative_windows=1):
+    """
+    합성 비디오에 대해 지정한 탐색 전략으로 기준 시점 탐지를 수행
+
+    Returns:
+        reference_times: 탐지된 기준 시간들
+        q_answers: 누적 Q 답변
+        call_count: LLM 호출 수
+        elapsed: 소요 시간 (초)
+    """
+    get_shared_frame_cache().clear()
+    video_processor = VideoProcessorAgent()
+    state = create_initial_state(video_path=video_path, llm_models=["rule"])
+    state = apply_state_update(state, video_processor.process(state))
+    analyzer = VideoAnalyzerAgent(RuleBasedLLM(), video_processor, f"rule_{search_strategy}", "rule",
+                                  speculative_windows=speculative_windows, search_strategy=search_strategy,
+                                  coarse_stride=coarse_stride)
+    start = time.perf_counter()
+    update = analyzer.process(state)
+    elapsed = time.perf_counter() - start
+    assert "errors" not in update, update.get("errors")
+    result = update["model_results"][analyzer.model_id]
+    calls = result["metrics"]["totals"].get("window_queries", 0)
+    return result["reference_times"], result["q_answers_accumulated"], calls, elapsed
+
+
+def compare_q_answers(linear, coarse):
+    """
+    coarse의 Q 답변({기준 시점: {Q: [(시작 시간, 답변, 신뢰도), ...]}})이 linear 답변의 부분집합인지 확인하고
+    (같은 답변 수, 빠진 답변 수) 반환
+    """
+    matched, missing = 0, 0
+    assert set(coarse) == set(linear)
+    for reference_key, linear_q in linear.items():
+        assert set(coarse[reference_key]) <= set(linear_q)
+        for q_key, linear_answers in linear_q.items():
+            coarse_answers = set(coarse[reference_key].get(q_key, []))
+            assert coarse_answers <= set(linear_answers), f"{reference_key} {q_key}: 선형 탐색에 없는 답변이 있음"
+            matched += len(coarse_answers)
+            missing += len(linear_answers) - len(coarse_answers)
+    return matched, missing
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic.mp4")
+        make_video(video_path)
+
+        print(f"{'strategy':<16} {'ahead':>5} {'calls':>6} {'time(s)':>8} {'Q same':>7} {'Q missing':>10}  reference_times")
+        for speculative_windows in [1, 3]:
+            linear_times, linear_q, linear_calls, linear_elapsed = run_strategy(
+                video_path, "linear", speculative_windows=speculative_windows
+            )
+            print(f"{'linear':<16} {speculative_windows:>5} {linear_calls:>6} {linear_elapsed:>8.2f} "
+                  f"{'-':>7} {'-':>10}  {linear_times}")
+            for coarse_stride in [2, 4]:
+                times, q_answers, calls, elapsed = run_strategy(
+                    video_path, "coarse_to_fine", coarse_stride, speculative_windows
+                )
+                assert times == linear_times, "coarse-to-fine의 기준 시간이 선형 탐색과 다름"
+                matched, missing = compare_q_answers(linear_q, q_answers)
+                print(f"{'coarse(x' + str(coarse_stride) + ')':<16} {speculative_windows:>5} {calls:>6} {elapsed:>8.2f} "
+                      f"{matched:>7} {missing:>10}  {times}")
+        print("\n기준 시간은 모든 전략에서 동일, coarse-to-fine의 Q 답변은 선형 탐색 답변의 부분집합"
+              "\n(건너뛴 구간의 답변이 빠지므로 행동 단계 분석에 쓰이는 표본은 줄어듦)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+LangGraph 상태 병합 벤치마크
+Analyzer 노드 수를 늘려가며 워크플로우를 실행하고,
+- agent_logs가 중복 없이 노드별로 한 번씩만 기록되는지
+- 각 노드가 reducer에 넘기는 변경분 크기가 노드 수와 무관하게 일정한지
+를 확인합니다. (합성 비디오 + 고정 응답 LLM 사용, API 호출 없음)
+"""
+
+import os
+import time
+import tempfile
+from collections import Counter
+import numpy as np
+import cv2
+
+from agents.state import create_initial_state
+from graph_workflow import create_workflow
+
+
+class FixedAnswerLLM:
+    """모든 질의에 YES로 답하는 테스트용 LLM"""
+    provider = "benchmark"
+
+    def query_answer_chatGPT(self, system_prompt, user_prompt, image_array=None, **kwargs):
+        answers = "\n".join(f"Q{i}_Answer: YES\nQ{i}_Confidence: 0.9" for i in range(1, 7))
+        return f"Overall_Answer: YES\n{answers}"
+
+
+def make_video(path: str, seconds: float = 10.0, fps: int = 10, size=(320, 180)):
+    """프레임 번호가 그려진 합성 비디오 생성"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(int(seconds * fps)):
+        frame = np.full((size[1], size[0], 3), (i * 7) % 256, dtype=np.uint8)
+        cv2.putText(frame, str(i), (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def measure_delta(fn, sizes):
+    """노드 함수가 반환한 변경분의 크기(리스트/딕셔너리 항목 수)를 기록하는 래퍼"""
+    def wrapper(state):
+        update = fn(state)
+        sizes.append(sum(len(value) for value in update.values() if isinstance(value, (list, dict))))
+        return update
+    return wrapper
+
+
+def run(video_path: str, num_analyzers: int):
+    llm_models = [f"model-{i}" for i in range(num_analyzers)]
+    workflow = create_workflow([FixedAnswerLLM() for _ in llm_models], llm_models, show_visualization=False)
+    workflow.reporter._create_visualization = lambda state: None  # HTML 파일 생성 생략
+
+    analyzer_delta_sizes = []
+    for analyzer in workflow.video_analyzers:
+        analyzer.process = measure_delta(analyzer.process, analyzer_delta_sizes)
+
+    start = time.perf_counter()
+    final_state = workflow.app.invoke(create_initial_state(video_path=video_path, llm_models=llm_models))
+    elapsed = time.perf_counter() - start
+
+    logs = final_state["agent_logs"]
+    counts = Counter((log["agent"], log["action"]) for log in logs)
+    duplicated = {key: count for key, count in counts.items() if count > 1}
+    expected_logs = 2 + 4 * num_analyzers + 2  # processor 2 + analyzer 4개씩 + reporter 2
+
+    assert final_state["status"] == "completed", final_state["errors"]
+    assert not duplicated, f"중복된 로그: {duplicated}"
+    assert len(logs) == expected_logs, f"로그 수 {len(logs)} != 예상 {expected_logs}"
+    assert len(final_state["model_results"]) == num_analyzers
+    assert len(set(analyzer_delta_sizes)) == 1, f"노드별 변경분 크기가 다름: {analyzer_delta_sizes}"
+    return len(logs), analyzer_delta_sizes[0], elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "synthetic.mp4")
+        make_video(video_path)
+
+        print(f"{'analyzers':>9} {'logs':>6} {'delta/node':>10} {'time(s)':>8} {'ms/node':>8}")
+        delta_sizes = {}  # {노드 수: 노드별 변경분 크기}
+        for num_analyzers in [1, 2, 5, 10, 20, 25]:
+            num_logs, delta_size, elapsed = run(video_path, num_analyzers)
+            delta_sizes[num_analyzers] = delta_size
+            print(f"{num_analyzers:>9} {num_logs:>6} {delta_size:>10} {elapsed:>8.2f} {elapsed * 1000 / num_analyzers:>8.1f}")
+        assert len(set(delta_sizes.values())) == 1, f"노드 수에 따라 변경분 크기가 달라짐: {delta_sizes}"
+        print("\n로그 중복 없음, 노드별 변경분 크기 일정")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,802 @@
 import cv2
 import os
+import json
+import hashlib
+import threading
+import time
+import weakref
 import numpy as np
+from collections import OrderedDict
 from pathlib import Path
+import stage_metrics
 
-class MediaEdit:
-    def __init__(self):
-        pass
+class FrameIndex:
+    """
+    비디오의 프레임별 표시 시각(PTS)과 키프레임 위치 색인
+    - 컨테이너의 패킷만 훑어서(디코딩 없이) 비디오마다 한 번 만들고, 지정한 캐시 폴더에 사이드카 파일(.frameindex.json)로 저장
+    - 가변 프레임 레이트(VFR) 영상에서도 시간 -> 프레임 번호를 PTS 기준으로 정확히 계산
+    - 탐색 시 목표 프레임 이전의 가장 가까운 키프레임으로 이동한 뒤 앞으로 디코딩 (키프레임을 모르면 일반 탐색)
+    """
+    
+    SIDECAR_SUFFIX = ".frameindex.json"
+    VERSION = 2
+    TOLERANCE_MS = 0.01  # 부동소수점 오차 허용 (예: 300.00000000000006ms)
+    
+    def __init__(self, pts_ms, keyframes, nominal_fps):
+        """
+        Args:
+            pts_ms (list): 표시 순서대로 정렬한 프레임별 PTS (ms, 첫 프레임 기준)
+            keyframes (list): 키프레임의 프레임 번호 (오름차순, 알 수 없으면 None 또는 빈 목록)
+            nominal_fps (float): 컨테이너에 기록된 FPS (탐색 위치 계산에 사용)
+        """
+        self.pts_ms = np.asarray(pts_ms, dtype=np.float64)
+        # 키프레임을 모르면 None (0번만 두면 모든 탐색이 처음부터 디코딩하게 됨)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64) if keyframes is not None and len(keyframes) else None
+        self.nominal_fps = nominal_fps
+        if len(self.pts_ms) > 1:
+            self.frame_duration_ms = float(self.pts_ms[-1] - self.pts_ms[-2])
+        else:
+            self.frame_duration_ms = 1000.0 / nominal_fps if nominal_fps else 0.0
+    
+    @property
+    def frame_count(self):
+        return len(self.pts_ms)
+    
+    @property
+    def duration(self):
+        """재생 시간 (초, 마지막 프레임의 표시 시간 포함)"""
+        if self.frame_count == 0:
+            return 0.0
+        return float(self.pts_ms[-1] + self.frame_duration_ms) / 1000.0
+    
+    def frame_at_ms(self, time_ms):
+        """time_ms(ms)에 화면에 표시되고 있는 프레임 번호 (마지막 프레임 이후는 마지막 간격으로 연장)"""
+        if self.frame_count == 0:
+            return 0
+        if self.frame_duration_ms > 0 and time_ms + self.TOLERANCE_MS >= self.pts_ms[-1] + self.frame_duration_ms:
+            return self.frame_count - 1 + int((time_ms - self.pts_ms[-1] + self.TOLERANCE_MS) / self.frame_duration_ms)
+        index = int(np.searchsorted(self.pts_ms, time_ms + self.TOLERANCE_MS, side="right")) - 1
+        return max(index, 0)
+    
+    def frame_at(self, seconds):
+        """seconds(초)에 표시되고 있는 프레임 번호"""
+        return self.frame_at_ms(seconds * 1000.0)
+    
+    def keyframe_before(self, frame_index):
+        """frame_index 이하인 가장 가까운 키프레임 번호 (keyframes가 None이 아닐 때만 사용)"""
+        position = int(np.searchsorted(self.keyframes, frame_index, side="right")) - 1
+        return int(self.keyframes[max(position, 0)])
+    
+    def nominal_position(self, frame_index):
+        """OpenCV CAP_PROP_POS_FRAMES로 frame_index의 PTS에 도달하기 위한 (명목 FPS 기준) 프레임 번호"""
+        if not self.nominal_fps or frame_index >= self.frame_count:
+            return frame_index
+        return int(round(self.pts_ms[frame_index] * self.nominal_fps / 1000.0))
+    
+    @classmethod
+    def build(cls, video_path):
+        """
+        비디오를 한 번 훑어 색인을 만듭니다. 가능하면 디코딩 없이 패킷만 읽고(raw 모드),
+        지원되지 않으면 grab()으로 디코딩하며 PTS를 읽습니다. (이 경우 키프레임은 알 수 없어 keyframes=None)
+        비디오를 열 수 없으면 None을 반환합니다.
+        """
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            return None
+        try:
+            nominal_fps = capture.get(cv2.CAP_PROP_FPS)
+            raw_mode = capture.set(cv2.CAP_PROP_FORMAT, -1)
+            pts_ms, key_flags = [], []
+            while capture.grab():
+                pts_ms.append(capture.get(cv2.CAP_PROP_POS_MSEC))
+                key_flags.append(bool(capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)) if raw_mode else False)
+        finally:
+            capture.release()
+        
+        # 패킷은 디코딩 순서이므로 표시 순서(PTS)로 정렬
+        pts_ms = np.asarray(pts_ms, dtype=np.float64)
+        order = np.argsort(pts_ms, kind="stable")
+        pts_ms = np.round(pts_ms[order] - (pts_ms[order[0]] if len(order) else 0.0), 3)
+        keyframes = np.flatnonzero(np.asarray(key_flags, dtype=bool)[order]) if len(order) else []
+        keyframes = [int(k) for k in keyframes] if len(keyframes) else None
+        return cls(pts_ms.tolist(), keyframes, nominal_fps)
+    
+    @classmethod
+    def sidecar_path(cls, video_path, cache_dir):
+        """cache_dir 안의 사이드카 파일 경로 (같은 이름의 다른 폴더 비디오와 겹치지 않도록 절대 경로 해시를 붙임)"""
+        digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+        return os.path.join(cache_dir, f"{os.path.basename(video_path)}.{digest}{cls.SIDECAR_SUFFIX}")
+    
+    @staticmethod
+    def _video_signature(video_path):
+        stat = os.stat(video_path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    def save(self, video_path, cache_dir):
+        """cache_dir에 사이드카 파일로 저장 (비디오 크기 / 수정 시각을 함께 기록). 저장할 수 없으면 False"""
+        size, mtime_ns = self._video_signature(video_path)
+        data = {
+            "version": self.VERSION,
+            "video_size": size,
+            "video_mtime_ns": mtime_ns,
+            "nominal_fps": self.nominal_fps,
+            "pts_ms": self.pts_ms.tolist(),
+            "keyframes": self.keyframes.tolist() if self.keyframes is not None else None,
+        }
+        sidecar_path = self.sidecar_path(video_path, cache_dir)
+        temp_path = f"{sidecar_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, sidecar_path)  # 동시에 저장해도 완성된 파일만 보이도록
+            return True
+        except OSError as e:
+            print(f"프레임 색인을 저장할 수 없습니다: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+    
+    @classmethod
+    def load(cls, video_path, cache_dir):
+        """cache_dir의 사이드카 파일에서 읽기. 없거나 비디오가 바뀌었으면 None"""
+        try:
+            with open(cls.sidecar_path(video_path, cache_dir), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            size, mtime_ns = cls._video_signature(video_path)
+        except (OSError, ValueError):
+            return None
+        if (data.get("version"), data.get("video_size"), data.get("video_mtime_ns")) != (cls.VERSION, size, mtime_ns):
+            return None
+        return cls(data["pts_ms"], data["keyframes"], data["nominal_fps"])
     
+    @classmethod
+    def load_or_build(cls, video_path, cache_dir=None):
+        """
+        cache_dir의 사이드카 파일이 유효하면 읽고, 아니면 새로 만들어 cache_dir에 저장한 뒤 반환
+        cache_dir가 None이면 파일을 읽거나 쓰지 않고 새로 만들기만 함
+        """
+        index = cls.load(video_path, cache_dir) if cache_dir is not None else None
+        if index is None:
+            index = cls.build(video_path)
+            if index is not None and index.frame_count > 0 and cache_dir is not None:
+                index.save(video_path, cache_dir)
+        return index
+
 
-    def _open_video(self, video_path):
-        """비디오 파일을 열고, 비디오 캡처 객체를 반환합니다."""
+class FrameStore:
+    """
+    디코딩된 프레임 저장소 (frames x H x W x 3 uint8 .npy 파일을 메모리 맵으로 공유)
+    - 비디오를 한 번 디코딩해 그리드 셀 크기로 줄인 프레임을 .npy 파일에 쓰고, 완성되면 메타데이터(.npy.json)를 기록
+    - frame_numbers를 주면 그 프레임(분석 구간이 샘플링하는 프레임)만 저장하고, 나머지는 저장하지 않음
+    - 여러 프로세스가 같은 파일을 메모리 맵(np.load(mmap_mode='r'))으로 열면 OS 페이지 캐시를 공유하므로
+      analyzer 프로세스 수만큼 디코딩/메모리가 늘지 않음
+    - 프레임은 복사 없는 읽기 전용 view로 반환
+    """
+    
+    META_SUFFIX = ".json"
+    VERSION = 2
+    
+    def __init__(self, path, frames, video_path, fps, frame_numbers=None):
+        """
+        Args:
+            path (str): .npy 파일 경로
+            frames (array): (저장한 프레임 수, H, W, 3) uint8 메모리 맵
+            video_path (str): 원본 비디오 경로 (시간 -> 프레임 번호 변환 기준)
+            fps (float): 원본 비디오의 FPS
+            frame_numbers (list): frames 각 행의 원본 프레임 번호 (오름차순, None이면 0번부터 모든 프레임)
+        """
+        self.path = path
+        self.frames = frames
+        self.video_path = video_path
+        self.fps = fps
+        self.frame_numbers = np.asarray(frame_numbers, dtype=np.int64) if frame_numbers is not None else None
+    
+    @property
+    def frame_count(self):
+        """저장한 프레임 수"""
+        return len(self.frames) if self.frames is not None else 0
+    
+    @property
+    def frame_size(self):
+        """프레임 크기 (너비, 높이)"""
+        return self.frames.shape[2], self.frames.shape[1]
+    
+    def _positions(self, frame_indices):
+        """원본 프레임 번호들의 저장 위치 (하나라도 저장소에 없으면 None)"""
+        frame_indices = np.asarray(frame_indices, dtype=np.int64)
+        if self.frames is None or len(frame_indices) == 0:
+            return None
+        if self.frame_numbers is None:
+            positions = frame_indices
+            found = (positions >= 0) & (positions < self.frame_count)
+        else:
+            positions = np.minimum(np.searchsorted(self.frame_numbers, frame_indices), max(self.frame_count - 1, 0))
+            found = self.frame_numbers[positions] == frame_indices
+        return positions if found.all() else None
+    
+    def has_frames(self, frame_indices):
+        """frame_indices(원본 프레임 번호)가 모두 저장되어 있는지 여부"""
+        return self._positions(frame_indices) is not None
+    
+    def read_frames(self, frame_indices):
+        """frame_indices(원본 프레임 번호)의 프레임 view들을 순서대로 반환합니다. 저장소에 없는 프레임이 있으면 빈 목록을 반환합니다."""
+        positions = self._positions(frame_indices)
+        if positions is None:
+            return []
+        return [self.frames[position] for position in positions]
+    
+    def close(self):
+        """메모리 맵을 닫습니다. (이 저장소에서 읽은 view가 아직 남아 있으면 그 view가 사라질 때 닫힘)"""
+        frames, self.frames = self.frames, None
+        mmap = getattr(frames, "_mmap", None)
+        del frames
+        if mmap is not None:
+            try:
+                mmap.close()
+            except BufferError:
+                pass
+    
+    @classmethod
+    def meta_path(cls, path):
+        return path + cls.META_SUFFIX
+    
+    @classmethod
+    def build(cls, video_path, path, frame_size, interpolation=cv2.INTER_LINEAR, source_path=None, frame_count=None,
+              frame_numbers=None):
+        """
+        source_path(None이면 video_path)를 처음부터 디코딩해 frame_size로 줄인 프레임을 path에 저장하고 연 저장소를 반환합니다. (실패 시 None)
+        source_path는 원본과 프레임 번호가 같은 비디오(프록시)여야 합니다.
+        frame_numbers(오름차순)를 주면 그 프레임만 retrieve()해서 저장하고, 나머지는 grab()만 하고 건너뜁니다.
+        """
+        capture = cv2.VideoCapture(source_path or video_path)
+        if not capture.isOpened():
+            print("비디오를 열 수 없습니다.")
+            return None
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        if frame_count is None:
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_numbers is not None:
+            frame_numbers = [int(n) for n in frame_numbers if 0 <= n < frame_count]
+            frame_count = len(frame_numbers)
+        if frame_count <= 0:
+            capture.release()
+            return None
+        
+        store_dir = os.path.dirname(path)
+        if store_dir and not os.path.exists(store_dir):
+            os.makedirs(store_dir, exist_ok=True)
+        # 완성된 파일만 보이도록 임시 파일에 쓴 뒤 교체 (동시에 만들어도 안전)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        width, height = frame_size
+        written = 0
+        source_index = 0  # 다음 grab()으로 얻을 원본 프레임 번호
+        try:
+            frames = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.uint8, shape=(frame_count, height, width, 3))
+            while written < frame_count:
+                target = frame_numbers[written] if frame_numbers is not None else source_index
+                while source_index < target and capture.grab():
+                    source_index += 1
+                success, frame = capture.read() if source_index == target else (False, None)
+                if not success:
+                    break
+                source_index += 1
+                cell = frames[written]
+                if frame.shape[:2] == (height, width):
+                    cell[:] = frame
+                else:
+                    resized_frame = cv2.resize(frame, (width, height), dst=cell, interpolation=interpolation)
+                    if resized_frame is not cell:
+                        cell[:] = resized_frame
+                written += 1
+            frames.flush()
+            del frames  # 교체 전에 메모리 맵을 닫음
+            if written == 0:
+                os.remove(temp_path)
+                return None
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"프레임 저장소를 만들 수 없습니다: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        finally:
+            capture.release()
+        
+        size, mtime_ns = FrameIndex._video_signature(video_path)
+        meta = {
+            "version": cls.VERSION,
+            "video_path": os.path.abspath(video_path),
+            "video_size": size,
+            "video_mtime_ns": mtime_ns,
+            "fps": fps,
+            "frame_count": written,
+            "frame_numbers": frame_numbers[:written] if frame_numbers is not None else None,
+        }
+        meta_path = cls.meta_path(path)
+        temp_meta_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(temp_meta_path, meta_path)
+        except OSError as e:
+            print(f"프레임 저장소 정보를 저장할 수 없습니다: {e}")
+            if os.path.exists(temp_meta_path):
+                os.remove(temp_meta_path)
+            return None
+        return cls.load(path)
+    
+    @classmethod
+    def load(cls, path):
+        """저장소를 메모리 맵으로 엽니다. 없거나 원본 비디오가 바뀌었으면 None"""
+        try:
+            with open(cls.meta_path(path), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            size, mtime_ns = FrameIndex._video_signature(meta["video_path"])
+            if (meta.get("version"), meta.get("video_size"), meta.get("video_mtime_ns")) != (cls.VERSION, size, mtime_ns):
+                return None
+            frames = np.load(path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(path, frames[:meta["frame_count"]], meta["video_path"], meta["fps"], meta.get("frame_numbers"))
+    
+    @classmethod
+    def load_or_build(cls, video_path, path, frame_size, interpolation=cv2.INTER_LINEAR, source_path=None, frame_count=None,
+                      frame_numbers=None):
+        """같은 원본/프레임 크기/저장 프레임으로 만든 저장소가 있으면 열고, 아니면 새로 만들어 반환"""
+        store = cls.load(path)
+        if store is not None and store.frame_size == tuple(frame_size) \
+                and store.video_path == os.path.abspath(video_path):
+            if frame_numbers is not None:
+                reusable = store.frame_numbers is not None and np.array_equal(store.frame_numbers, frame_numbers)
+            else:
+                reusable = store.frame_numbers is None and (frame_count is None or store.frame_count == frame_count)
+            if reusable:
+                return store
+        if store is not None:
+            store.close()  # 교체 전에 기존 메모리 맵을 닫음
+        return cls.build(video_path, path, frame_size, interpolation, source_path, frame_count, frame_numbers)
+
+
+class SequentialFrameDecoder:
+    """
+    비디오를 앞에서 뒤로 한 번만 디코딩하면서 요청된 프레임 번호만 꺼내는 디코더
+    - 건너뛰는 프레임은 grab()만 하고 retrieve()하지 않음 (색변환/복사 비용 없음)
+    - 직전 요청에서 읽은 프레임은 보관하여 겹치는 구간 요청 시 재사용
+    - 뒤로 가거나 너무 멀리 건너뛰어야 할 때만 탐색
+      (frame_index의 키프레임을 알면 이전 키프레임으로 이동한 뒤 PTS로 실제 위치를 확인, 아니면 CAP_PROP_POS_FRAMES)
+    """
+    
+    def __init__(self, video_path, max_skip_frames=300, frame_index=None, capture=None):
+        """
+        Args:
+            video_path (str): 비디오 파일 경로
+            max_skip_frames (int): 이 값보다 멀리 앞으로 건너뛰면 grab() 대신 탐색(seek) 사용
+            frame_index (FrameIndex): 비디오의 프레임 색인 (None이면 명목 FPS 기준으로 탐색)
+            capture (cv2.VideoCapture): 이미 연 캡처를 사용할 때 (위치를 알 수 없으므로 첫 요청에서 탐색, release()에서 닫지 않음)
+        """
+        self._owns_capture = capture is None
+        self.capture = cv2.VideoCapture(video_path) if capture is None else capture
+        if not self.capture.isOpened():
+            print("비디오를 열 수 없습니다.")
+            self.capture = None
+            self.fps = None
+        else:
+            self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.max_skip_frames = max_skip_frames
+        self.frame_index = frame_index
+        self.next_index = 0 if capture is None else None  # 다음 grab()으로 얻게 될 프레임 번호 (None이면 모름)
+        self._grabbed_index = None  # 탐색 후 grab()만 하고 아직 retrieve()하지 않은 프레임 번호
+        self._retained = {}  # {frame_index: frame} 직전 요청에서 읽은 프레임
+    
+    def is_opened(self):
+        return self.capture is not None
+    
+    def _seek(self, frame_index):
+        self._grabbed_index = None
+        if self.frame_index is None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self.next_index = frame_index
+            return
+        if self.frame_index.keyframes is None:
+            # 키프레임을 모르면 일반 탐색 (위치는 PTS를 명목 FPS로 환산)
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index.nominal_position(frame_index))
+            self.next_index = frame_index
+            return
+        
+        # 이전 키프레임으로 이동하고, 실제로 도착한 프레임을 PTS로 확인 (목표를 지나쳤으면 더 앞의 키프레임으로)
+        keyframe = self.frame_index.keyframe_before(frame_index)
+        while True:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index.nominal_position(keyframe))
+            if not self.capture.grab():
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                self.next_index = frame_index
+                return
+            landed = self.frame_index.frame_at_ms(self.capture.get(cv2.CAP_PROP_POS_MSEC))
+            if landed <= frame_index or keyframe == 0:
+                break
+            keyframe = self.frame_index.keyframe_before(keyframe - 1)
+        self.next_index = landed + 1
+        self._grabbed_index = landed
+    
+    def read_frame(self, frame_index):
+        """frame_index 번째 프레임을 반환합니다. 읽을 수 없으면 None을 반환합니다."""
+        if frame_index in self._retained:
+            return self._retained[frame_index]
+        
+        if self.next_index is None or frame_index < self.next_index - (self._grabbed_index is not None) \
+                or frame_index - self.next_index > self.max_skip_frames:
+            self._seek(frame_index)
+        
+        if self._grabbed_index != frame_index:
+            # 필요 없는 프레임은 디코딩만 하고 건너뜀
+            while self.next_index < frame_index:
+                if not self.capture.grab():
+                    return None
+                self.next_index += 1
+            
+            if not self.capture.grab():
+                return None
+            self.next_index += 1
+        self._grabbed_index = None
+        success, frame = self.capture.retrieve()
+        if not success:
+            return None
+        return frame
+    
+    def read_frames(self, frame_indices):
+        """frame_indices의 프레임들을 순서대로 반환합니다. 중간에 실패하면 그 전까지의 프레임만 반환합니다."""
+        frames = []
+        retained = {}
+        for frame_index in frame_indices:
+            frame = self.read_frame(frame_index)
+            if frame is None:
+                print(f"프레임 {frame_index}을 읽을 수 없습니다.")
+                break
+            retained[frame_index] = frame
+            frames.append(frame)
+        self._retained = retained
+        return frames
+    
+    def release(self):
+        if self.capture is not None and self._owns_capture:
+            self.capture.release()
+        self.capture = None
+        self._retained = {}
+
+
+class VideoCapturePool:
+    """
+    열린 cv2.VideoCapture를 (비디오 경로, 스레드) 단위로 재사용하는 핸들 풀
+    - 같은 스레드가 같은 비디오를 다시 열면 컨테이너 open/probe 없이 기존 캡처를 돌려줌
+    - idle_timeout 동안 사용되지 않은 캡처는 닫음
+    - 열린 캡처 수가 max_open을 넘으면 가장 오래 쉬고 있던 캡처부터 닫음
+    """
+    
+    def __init__(self, max_open=16, idle_timeout=30.0):
+        """
+        Args:
+            max_open (int): 동시에 열어 둘 최대 캡처 수 (사용 중인 캡처 포함)
+            idle_timeout (float): 사용되지 않은 캡처를 닫기까지의 시간 (초)
+        """
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._idle = OrderedDict()  # {(path, thread_id): (capture, last_used)} 반납된 캡처 (오래된 순)
+        self._in_use = {}  # {id(capture): (path, thread_id) 또는 None(풀에 반납하지 않는 캡처)}
+        self._lock = threading.Lock()
+    
+    def acquire(self, video_path):
+        """
+        캡처를 빌려 줍니다. 열 수 없으면 None을 반환합니다.
+        Returns:
+            cv2.VideoCapture: 캡처 객체
+            bool: 풀에서 재사용한 캡처이면 True (재생 위치가 처음이 아닐 수 있음)
+        """
+        key = (os.path.abspath(video_path), threading.get_ident())
+        expired = []
+        with self._lock:
+            expired = self._pop_expired()
+            entry = self._idle.pop(key, None)
+            if entry is not None:
+                capture = entry[0]
+                self._in_use[id(capture)] = key
+        self._release_all(expired)
+        if entry is not None:
+            return capture, True
+        
         capture = cv2.VideoCapture(video_path)
         if not capture.isOpened():
+            return None, False
+        
+        with self._lock:
+            # 같은 키의 캡처를 이미 빌려 간 경우(중첩 호출)에는 풀에 넣지 않음
+            pooled = key not in self._in_use.values()
+            self._in_use[id(capture)] = key if pooled else None
+            evicted = self._pop_over_limit()
+        self._release_all(evicted)
+        return capture, False
+    
+    def release(self, capture):
+        """빌려 간 캡처를 풀에 반납합니다. 풀에 속하지 않은 캡처는 닫습니다."""
+        if capture is None:
+            return
+        with self._lock:
+            key = self._in_use.pop(id(capture), None)
+            if key is not None and key not in self._idle:
+                self._idle[key] = (capture, time.monotonic())
+                capture = None
+            evicted = self._pop_over_limit()
+        if capture is not None:
+            capture.release()
+        self._release_all(evicted)
+    
+    def close_all(self):
+        """반납된 캡처를 모두 닫습니다."""
+        with self._lock:
+            captures = [capture for capture, _ in self._idle.values()]
+            self._idle.clear()
+        self._release_all(captures)
+    
+    def get_stats(self):
+        """풀 상태 반환"""
+        with self._lock:
+            return {"idle": len(self._idle), "in_use": len(self._in_use), "max_open": self.max_open}
+    
+    def _pop_expired(self):
+        now = time.monotonic()
+        expired_keys = [key for key, (_, last_used) in self._idle.items() if now - last_used > self.idle_timeout]
+        return [self._idle.pop(key)[0] for key in expired_keys]
+    
+    def _pop_over_limit(self):
+        evicted = []
+        while self._idle and len(self._idle) + len(self._in_use) > self.max_open:
+            _, (capture, _) = self._idle.popitem(last=False)
+            evicted.append(capture)
+        return evicted
+    
+    @staticmethod
+    def _release_all(captures):
+        for capture in captures:
+            capture.release()
+
+
+class GridCanvasPool:
+    """
+    MxN 그리드 캔버스를 재사용하는 버퍼 풀 (thread-safe)
+    - 레이아웃(그리드 크기, MxN, 간격)별로 반납된 캔버스를 보관하고 acquire() 시 다시 꺼내 줌
+    - 같은 레이아웃이면 셀 영역은 매번 전부 덮어쓰고 간격 영역은 0으로 남아 있으므로 다시 지울 필요 없음
+    - release()로 반납한 캔버스는 더 이상 사용하면 안 됨
+    """
+    
+    def __init__(self, max_per_layout=4):
+        """
+        Args:
+            max_per_layout (int): 레이아웃별로 보관할 최대 캔버스 수 (넘으면 반납된 캔버스를 버림)
+        """
+        self.max_per_layout = max_per_layout
+        self.allocations = 0
+        self.reuses = 0
+        self._free = {}  # {layout: [canvas, ...]}
+        self._layouts = {}  # {id(canvas): (weakref(canvas), layout)} 풀에서 할당한 캔버스
+        self._lock = threading.Lock()
+    
+    def acquire(self, MxN, gridSize, padSize):
+        """레이아웃에 맞는 캔버스 (높이, 너비, 3) uint8 반환 (없으면 새로 할당)"""
+        layout = (tuple(MxN), tuple(gridSize), tuple(padSize))
+        with self._lock:
+            free = self._free.get(layout)
+            if free:
+                self.reuses += 1
+                canvas = free.pop()
+            else:
+                self.allocations += 1
+                canvas = None
+        if canvas is None:
+            canvas = np.zeros((gridSize[1], gridSize[0], 3), dtype=np.uint8)
+            with self._lock:
+                self._layouts[id(canvas)] = (weakref.ref(canvas, self._forget(id(canvas))), layout)
+        return canvas
+    
+    def _forget(self, canvas_id):
+        """반납되지 않고 버려진 캔버스의 기록을 지우는 weakref 콜백"""
+        def callback(_):
+            with self._lock:
+                self._layouts.pop(canvas_id, None)
+        return callback
+    
+    def release(self, canvas):
+        """acquire()로 받은 캔버스 반납 (풀에서 받지 않은 배열은 무시)"""
+        with self._lock:
+            entry = self._layouts.get(id(canvas))
+            if entry is None or entry[0]() is not canvas:
+                return
+            free = self._free.setdefault(entry[1], [])
+            if any(item is canvas for item in free):
+                return  # 이미 반납됨
+            if len(free) < self.max_per_layout:
+                free.append(canvas)
+    
+    def get_stats(self):
+        """풀 통계 반환"""
+        with self._lock:
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "free": sum(len(free) for free in self._free.values()),
+            }
+
+
+class MediaEdit:
+    def __init__(self, use_capture_pool=True, max_open=16, idle_timeout=30.0,
+                 interpolation=cv2.INTER_LINEAR, max_canvases_per_layout=4,
+                 use_frame_index=False, frame_index_dir=None):
+        """
+        Args:
+            use_capture_pool (bool): True이면 열린 VideoCapture를 (경로, 스레드) 단위로 재사용
+            max_open (int): 핸들 풀이 동시에 열어 둘 최대 캡처 수
+            idle_timeout (float): 사용되지 않은 캡처를 닫기까지의 시간 (초)
+            interpolation (int): 그리드 셀 리사이즈 보간법 (예: cv2.INTER_LINEAR, 축소 화질 우선이면 cv2.INTER_AREA)
+            max_canvases_per_layout (int): 그리드 캔버스 풀이 레이아웃별로 보관할 최대 캔버스 수
+            use_frame_index (bool): True이면 프레임 색인(FrameIndex)으로 시간 -> 프레임 변환 및 키프레임 탐색
+                (비디오마다 처음 한 번 전체 패킷을 훑으므로 선택 사항)
+            frame_index_dir (str): 프레임 색인 사이드카 파일을 저장하여 다음 실행에서 재사용할 캐시 폴더
+                (None이면 메모리에만 보관, 비디오 폴더에는 쓰지 않음)
+        """
+        self.capture_pool = VideoCapturePool(max_open, idle_timeout) if use_capture_pool else None
+        self.interpolation = interpolation
+        self.canvas_pool = GridCanvasPool(max_canvases_per_layout)
+        self.use_frame_index = use_frame_index
+        self.frame_index_dir = frame_index_dir
+        self._frame_indices = {}  # {(경로, 크기, mtime): FrameIndex}
+        self._frame_index_lock = threading.Lock()
+    
+
+    def _open_video(self, video_path, rewind=True):
+        """
+        비디오 파일을 열고, 비디오 캡처 객체를 반환합니다. 사용 후 _close_video()로 반납합니다.
+        rewind가 True이면 풀에서 재사용한 캡처의 재생 위치를 처음으로 되돌립니다.
+        """
+        if self.capture_pool is None:
+            capture = cv2.VideoCapture(video_path)
+            if not capture.isOpened():
+                print("비디오를 열 수 없습니다.")
+                return None
+            return capture
+        
+        capture, reused = self.capture_pool.acquire(video_path)
+        if capture is None:
             print("비디오를 열 수 없습니다.")
             return None
+        if reused and rewind:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
         return capture
+
+
+    def _close_video(self, capture):
+        """_open_video()로 연 캡처를 핸들 풀에 반납합니다. (풀을 사용하지 않으면 닫습니다.)"""
+        if self.capture_pool is None:
+            capture.release()
+        else:
+            self.capture_pool.release(capture)
+
+
+    def get_frame_index(self, video_path):
+        """
+        비디오의 프레임 색인을 반환합니다. (메모리 -> 캐시 폴더의 사이드카 파일 -> 새로 생성 순서로 찾음)
+        색인을 사용하지 않거나 만들 수 없으면 None을 반환합니다.
+        """
+        if not self.use_frame_index:
+            return None
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        with self._frame_index_lock:
+            index = self._frame_indices.get(key)
+        if index is None:
+            index = FrameIndex.load_or_build(video_path, self.frame_index_dir)
+            if index is None or index.frame_count == 0:
+                return None
+            with self._frame_index_lock:
+                index = self._frame_indices.setdefault(key, index)
+        return index
+
+
+    def close(self):
+        """핸들 풀에 남아 있는 캡처를 모두 닫습니다."""
+        if self.capture_pool is not None:
+            self.capture_pool.close_all()
     
     
-    # 파일명에 한글 포함되었을 때
-    def cv2_imread(self, image_path):  
-        image_path_temp = 'temporary_cv2_imread'
-        os.replace(image_path, image_path_temp)
-        image = cv2.imread(image_path_temp)  # 파일에 한글명 포함되어 있을 때 처리 못 함
-        os.replace(image_path_temp, image_path)
-        return image
+    # 파일명에 한글 포함되었을 때 (cv2.imread()는 한글 경로를 처리 못 하므로 바이트로 읽어 메모리에서 디코딩)
+    def cv2_imread(self, image_path, flags=cv2.IMREAD_COLOR):
+        """이미지 파일을 읽어 배열로 반환합니다. 읽을 수 없으면 None을 반환합니다. (원본 파일을 옮기지 않으므로 동시에 읽어도 안전)"""
+        try:
+            buffer = np.fromfile(image_path, dtype=np.uint8)
+        except OSError:
+            return None
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, flags)
  
 
-    # 파일명에 한글 포함되었을 때
+    # 파일명에 한글 포함되었을 때 (cv2.imwrite()는 한글 경로에 저장 못 하므로 메모리에서 인코딩한 뒤 바이트로 씀)
     def cv2_imwrite(self, output_file, output_image):
-        output_file_temp = 'temporary_cv2_imwrite.png'
-        cv2.imwrite(output_file_temp, output_image)  # 중요: cv2.imwrite()에서는 파일명에 한글 있으면 파일로 저장안됨
-        os.replace(output_file_temp, output_file)
+        """
+        이미지를 확장자 형식(알 수 없는 확장자는 PNG)으로 저장합니다. 저장하지 못하면 False를 반환합니다.
+        실행마다 다른 임시 파일에 쓴 뒤 교체하므로 여러 스레드/프로세스가 동시에 저장해도 완성된 파일만 보입니다.
+        """
+        ext = os.path.splitext(output_file)[1].lower()
+        success, buffer = False, None
+        if ext:
+            try:
+                success, buffer = cv2.imencode(ext, output_image)
+            except cv2.error:
+                success = False
+        if not success:
+            # 확장자가 없거나 OpenCV가 모르는 확장자(.tmp, .v2 등)는 이전처럼 PNG로 저장
+            try:
+                success, buffer = cv2.imencode('.png', output_image)
+            except cv2.error as e:
+                print(f"이미지를 인코딩할 수 없습니다: {output_file} ({e})")
+                return False
+        if not success:
+            print(f"이미지를 인코딩할 수 없습니다: {output_file}")
+            return False
+        temp_path = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            buffer.tofile(temp_path)
+            os.replace(temp_path, output_file)
+        except OSError as e:
+            print(f"이미지를 저장할 수 없습니다: {output_file} ({e})")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        return True
     
 
     def query_videoInfo(self, video_path):
         """비디오 파일의 실행 시간, 프레임 수 및 해상도를 계산하여 반환합니다."""
         video_name = os.path.splitext(os.path.basename(video_path))[0]  # 파일명
-        capture = self._open_video(video_path)
+        capture = self._open_video(video_path, rewind=False)
         if capture is None:
             return None, None, None, None, None, None
         
         fps = capture.get(cv2.CAP_PROP_FPS)  # 프레임 속도 (FPS)
-        total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))  # 전체 프레임 수
-        play_time = round(total_frames / fps, 2)  # 총 실행 시간 (초)
+        frame_index = self.get_frame_index(video_path)
+        if frame_index is not None:
+            # 프레임 색인이 있으면 실제 PTS 기준 (가변 프레임 레이트 영상에서도 정확)
+            total_frames = frame_index.frame_count
+            play_time = round(frame_index.duration, 2)
+        else:
+            total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))  # 전체 프레임 수
+            play_time = round(total_frames / fps, 2)  # 총 실행 시간 (초)
         
         # 해상도 정보 추가
         video_width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
         video_height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-        capture.release()
+        self._close_video(capture)
         file_size = os.path.getsize(video_path)  # 파일 크기 (바이트 단위)
 
         return video_name, play_time, total_frames, video_width, video_height, file_size
 
 
+    def query_fps(self, video_path):
+        """
+        비디오의 FPS(CAP_PROP_FPS)를 반환합니다. 비디오를 열 수 없으면 None을 반환합니다.
+        extract_frames_to_MxN_image의 'time' 옵션이 시간 -> 프레임 번호 변환에 쓰는 값과 같습니다.
+        (query_videoInfo의 play_time은 소수 둘째 자리로 반올림되므로 프레임 수 / play_time으로 계산하면 안 됨)
+        """
+        capture = self._open_video(video_path, rewind=False)
+        if capture is None:
+            return None
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        self._close_video(capture)
+        return fps
+
+
     def query_imageInfo(self, image_path):
         """비디오 또는 이미지 파일의 실행 시간, 프레임 수, 해상도 및 파일 크기를 계산하여 반환합니다."""
         
@@ -98,7 +841,7 @@ class MediaEdit:
             count += 1
 
         out.release()
-        capture.release()
+        self._close_video(capture)
 
         # 총 재생 시간 계산
         play_time = round(total_frames / fps, 2)
@@ -109,8 +852,84 @@ class MediaEdit:
         
         return output_file, play_time, total_frames
 
+    def _time_to_frame_range(self, option, start, end, fps, frame_index=None):
+        """
+        option('time' 또는 'frame')에 따라 시작/종료 프레임 번호를 계산합니다. 잘못된 옵션이면 (None, None)을 반환합니다.
+        frame_index가 있으면 시간을 PTS 기준으로 변환하고, 없으면 명목 FPS로 변환합니다.
+        """
+        if option == 'time':
+            if frame_index is not None:
+                return frame_index.frame_at(start), frame_index.frame_at(end)
+            return int(start * fps), int(end * fps)
+        elif option == 'frame':
+            return start, end
+        print("잘못된 옵션입니다. 'time' 또는 'frame'을 선택하세요.")
+        return None, None
+
+
+    def _MxN_frame_indices(self, start_frame, end_frame, MxN):
+        """MxN 그리드에 들어갈 프레임 번호 목록을 계산합니다."""
+        num_frames = MxN[0] * MxN[1]
+        frame_interval = max((end_frame - start_frame) // num_frames, 1)
+        return [start_frame + i * frame_interval for i in range(num_frames)]
+
+
+    def acquire_grid_canvas(self, MxN, gridSize=(1920, 1080), padSize=(10, 10)):
+        """
+        그리드 캔버스를 풀에서 빌립니다. extract_frames_to_MxN_image(..., out=canvas)에 넘겨 재사용하고,
+        결과를 다 쓴 뒤 release_grid_canvas()로 반납합니다. (반납 전까지 다른 곳에서 쓰지 않음)
+        """
+        return self.canvas_pool.acquire(MxN, gridSize, padSize)
+
+
+    def release_grid_canvas(self, canvas):
+        """acquire_grid_canvas()로 빌린 캔버스를 반납합니다."""
+        self.canvas_pool.release(canvas)
+
+
+    def _compose_MxN_grid(self, selected_frames, MxN, gridSize, padSize, out=None):
+        """
+        선택된 프레임들을 MxN 그리드 이미지 하나로 합칩니다. 셀 크기가 유효하지 않으면 None을 반환합니다.
+        각 프레임은 캔버스의 셀 영역(view)에 바로 리사이즈하므로 셀마다 중간 배열을 만들지 않습니다.
+        out이 주어지면 그 캔버스(같은 레이아웃으로 쓰던 것이면 간격 영역은 0이어야 함)에 씁니다.
+        """
+        cell_width = (gridSize[0] - (MxN[1] - 1) * padSize[0]) // MxN[1]
+        cell_height = (gridSize[1] - (MxN[0] - 1) * padSize[1]) // MxN[0]
+        
+        # 셀 크기 유효성 검사
+        if cell_width <= 0 or cell_height <= 0:
+            print(f"셀 크기가 유효하지 않습니다: {cell_width}x{cell_height}")
+            return None
+
+        output_image = out if out is not None else np.zeros((gridSize[1], gridSize[0], 3), dtype=np.uint8)
+
+        for idx, frame in enumerate(selected_frames):
+            row = idx // MxN[1]
+            col = idx % MxN[1]
+            start_x = col * (cell_width + padSize[0])
+            start_y = row * (cell_height + padSize[1])
+            cell = output_image[start_y:start_y + cell_height, start_x:start_x + cell_width, :]
+            
+            if frame is None:
+                print(f"프레임 {idx}가 None입니다.")
+                cell[:] = 0  # 재사용 캔버스에 이전 구간의 셀이 남지 않도록 비움
+                continue
+            
+            try:
+                resized_frame = cv2.resize(frame, (cell_width, cell_height), dst=cell, interpolation=self.interpolation)
+                if resized_frame is not cell:
+                    # 형식이 달라 dst를 쓰지 못하고 새로 할당된 경우 (예: 흑백 프레임)
+                    cell[:] = resized_frame
+            except Exception as e:
+                print(f"프레임 {idx} 리사이즈 중 오류 발생: {e}")
+                cell[:] = 0
+                continue
+
+        return output_image
+
+
     # 핵심 함수
-    def extract_frames_to_MxN_image(self, option, start, end, MxN, video_path, output_dir=None, gridSize=(1920, 1080), padSize=(10, 10)):
+    def extract_frames_to_MxN_image(self, option, start, end, MxN, video_path, output_dir=None, gridSize=(1920, 1080), padSize=(10, 10), out=None):
         """
         비디오의 지정된 구간에서 MxN 개의 프레임을 추출하여 지정된 크기의 그리드에 맞추어 하나의 PNG 이미지로 저장합니다.
         output_dir가 존재하면 출력 파일 경로를 반환하며, None이면 이미지 배열을 반환합니다.
@@ -123,101 +942,282 @@ class MediaEdit:
             output_dir (str): 출력 파일 경로 (기본값: None)
             gridSize (tuple): 그리드의 크기 (기본값: (1920, 1080))
             padSize (tuple): 그리드 간격 (기본값: (10, 10))
+            out (array): 그리드를 쓸 캔버스 (acquire_grid_canvas()로 빌린 것, None이면 새로 할당)
         Returns:
             str/array: output_dir가 존재하면 출력 파일 경로, None이면 이미지 배열을 반환
             int: 그리드의 너비
             int: 그리드의 높이
         """
         
-        capture = self._open_video(video_path)
+        capture = self._open_video(video_path, rewind=False)  # 프레임마다 위치를 직접 지정하므로 되감을 필요 없음
         if capture is None:
             return None, gridSize[0], gridSize[1]
 
         fps = capture.get(cv2.CAP_PROP_FPS)
         #total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_index = self.get_frame_index(video_path)
 
-        if option == 'time':
-            start_frame = int(start * fps)
-            end_frame = int(end * fps)
-        elif option == 'frame':
-            start_frame = start
-            end_frame = end
-        else:
-            print("잘못된 옵션입니다. 'time' 또는 'frame'을 선택하세요.")
-            capture.release()
+        start_frame, end_frame = self._time_to_frame_range(option, start, end, fps, frame_index)
+        if start_frame is None:
+            self._close_video(capture)
             return None, gridSize[0], gridSize[1]
         
         #print("비디오 처리를 시작합니다.")
-        num_frames = MxN[0] * MxN[1]
-        frame_interval = max((end_frame - start_frame) // num_frames, 1)
+        frame_indices = self._MxN_frame_indices(start_frame, end_frame, MxN)
+        num_frames = len(frame_indices)
         
         selected_frames = []
-        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-        for i in range(num_frames):
-            capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame + i * frame_interval)
-            success, frame = capture.read()
-            if not success:
-                print(f"프레임 {start_frame + i * frame_interval}을 읽을 수 없습니다.")
-                break
-            if frame is None:
-                print(f"프레임 {start_frame + i * frame_interval}이 None입니다.")
-                break
-            selected_frames.append(frame)
+        with stage_metrics.timed("decode_ms"):
+            if frame_index is not None:
+                # 첫 프레임 이전 키프레임으로 한 번 탐색한 뒤 앞으로 디코딩
+                decoder = SequentialFrameDecoder(video_path, frame_index=frame_index, capture=capture)
+                selected_frames = decoder.read_frames(frame_indices)
+                decoder.release()
+            else:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+                for frame_number in frame_indices:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                    success, frame = capture.read()
+                    if not success:
+                        print(f"프레임 {frame_number}을 읽을 수 없습니다.")
+                        break
+                    if frame is None:
+                        print(f"프레임 {frame_number}이 None입니다.")
+                        break
+                    selected_frames.append(frame)
         
         if len(selected_frames) != num_frames:
             print(f"선택한 프레임 수가 기대한 것보다 적습니다. (기대: {num_frames}, 실제: {len(selected_frames)})")
-            capture.release()
+            self._close_video(capture)
             return None, gridSize[0], gridSize[1]
         
         # 프레임 유효성 검사
         if not selected_frames or selected_frames[0] is None:
             print("유효한 프레임이 없습니다.")
-            capture.release()
+            self._close_video(capture)
             return None, gridSize[0], gridSize[1]
         
-        #frame_height, frame_width = selected_frames[0].shape[:2]
-        cell_width = (gridSize[0] - (MxN[1] - 1) * padSize[0]) // MxN[1]
-        cell_height = (gridSize[1] - (MxN[0] - 1) * padSize[1]) // MxN[0]
-        
-        # 셀 크기 유효성 검사
-        if cell_width <= 0 or cell_height <= 0:
-            print(f"셀 크기가 유효하지 않습니다: {cell_width}x{cell_height}")
-            capture.release()
+        # 파일로만 저장하는 경우에는 풀의 캔버스를 빌려 쓰고 저장 후 반납
+        pooled = out is None and output_dir is not None
+        if pooled:
+            out = self.acquire_grid_canvas(MxN, gridSize, padSize)
+        with stage_metrics.timed("resize_ms"):
+            output_image = self._compose_MxN_grid(selected_frames, MxN, gridSize, padSize, out)
+        if output_image is None:
+            self._close_video(capture)
             return None, gridSize[0], gridSize[1]
 
-        output_image = np.zeros((gridSize[1], gridSize[0], 3), dtype=np.uint8)
-
-        for idx, frame in enumerate(selected_frames):
-            if frame is None:
-                print(f"프레임 {idx}가 None입니다.")
-                continue
-                
-            row = idx // MxN[1]
-            col = idx % MxN[1]
-            start_x = col * (cell_width + padSize[0])
-            start_y = row * (cell_height + padSize[1])
-            
-            try:
-                resized_frame = cv2.resize(frame, (cell_width, cell_height))
-                output_image[start_y:start_y + cell_height, start_x:start_x + cell_width, :] = resized_frame
-            except Exception as e:
-                print(f"프레임 {idx} 리사이즈 중 오류 발생: {e}")
-                continue
-
         if output_dir is not None: # 출력 파일을 생성하고 경로를 반환
             video_name = os.path.splitext(os.path.basename(video_path))[0]
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
             output_file = os.path.join(output_dir, f"{video_name}_{start}-{end}{option}_{MxN[0]}x{MxN[1]}grid.png")
             self.cv2_imwrite(output_file, output_image)
+            if pooled:
+                self.release_grid_canvas(output_image)
             print(f"{output_file} 파일이 생성되었습니다. 크기: {gridSize[0]}x{gridSize[1]} px")
-            capture.release()
+            self._close_video(capture)
             return output_file, gridSize[0], gridSize[1]
         else: # 출력 파일을 생성하지 않고 이미지 배열만 반환
-            capture.release()
+            self._close_video(capture)
             return output_image, gridSize[0], gridSize[1]
 
+
+    def iter_frames_to_MxN_images(self, option, windows, MxN, video_path, gridSize=(1920, 1080), padSize=(10, 10), reuse_canvas=False):
+        """
+        여러 구간(windows)의 MxN 그리드 이미지를 비디오 한 번의 순차 디코딩으로 생성합니다.
+        구간마다 CAP_PROP_POS_FRAMES로 탐색(seek)하지 않고 앞에서 뒤로 grab()하면서 필요한 프레임만 retrieve()합니다.
+        제너레이터이므로 호출 측에서 중간에 멈추면(break) 그 이후 구간은 디코딩하지 않습니다.
+        Args:
+            option (str): 'time' 또는 'frame' 중 하나
+            windows (list): [(start, end), ...] 구간 목록 (시작 시점 오름차순 권장)
+            MxN (tuple): 프레임을 배열할 행과 열의 수
+            video_path (str): 비디오 파일 경로
+            gridSize (tuple): 그리드의 크기 (기본값: (1920, 1080))
+            padSize (tuple): 그리드 간격 (기본값: (10, 10))
+            reuse_canvas (bool): True이면 모든 구간에 같은 캔버스를 재사용 (다음 구간을 요청하기 전에 이전 이미지를 다 써야 함)
+        Yields:
+            array: 구간별 그리드 이미지 배열 (실패 시 None)
+            int: 그리드의 너비
+            int: 그리드의 높이
+        """
+        decoder = self.open_sequential_decoder(video_path)
+        canvas = self.acquire_grid_canvas(MxN, gridSize, padSize) if reuse_canvas else None
+        try:
+            for start, end in windows:
+                yield self.extract_frames_to_MxN_image_sequential(decoder, option, start, end, MxN, gridSize, padSize, canvas)
+        finally:
+            decoder.release()
+            if canvas is not None:
+                self.release_grid_canvas(canvas)
+
+
+    def open_sequential_decoder(self, video_path, max_skip_frames=300):
+        """순차 디코더(SequentialFrameDecoder)를 엽니다. 사용 후 release()를 호출해야 합니다."""
+        return SequentialFrameDecoder(video_path, max_skip_frames, self.get_frame_index(video_path))
+
+
+    def extract_frames_to_MxN_image_sequential(self, decoder, option, start, end, MxN, gridSize=(1920, 1080), padSize=(10, 10), out=None):
+        """
+        extract_frames_to_MxN_image와 같은 그리드를 순차 디코더로 생성합니다. (이미지 배열만 반환)
+        같은 decoder로 시작 시점 오름차순으로 호출하면 비디오를 한 번만 디코딩합니다.
+        out이 주어지면 그 캔버스에 그리드를 씁니다. (None이면 새로 할당)
+        Returns:
+            array: 그리드 이미지 배열 (실패 시 None)
+            int: 그리드의 너비
+            int: 그리드의 높이
+        """
+        if not decoder.is_opened():
+            return None, gridSize[0], gridSize[1]
+        
+        start_frame, end_frame = self._time_to_frame_range(option, start, end, decoder.fps, decoder.frame_index)
+        if start_frame is None:
+            return None, gridSize[0], gridSize[1]
+        
+        frame_indices = self._MxN_frame_indices(start_frame, end_frame, MxN)
+        with stage_metrics.timed("decode_ms"):
+            selected_frames = decoder.read_frames(frame_indices)
+        if len(selected_frames) != len(frame_indices):
+            print(f"선택한 프레임 수가 기대한 것보다 적습니다. (기대: {len(frame_indices)}, 실제: {len(selected_frames)})")
+            return None, gridSize[0], gridSize[1]
+        
+        with stage_metrics.timed("resize_ms"):
+            output_image = self._compose_MxN_grid(selected_frames, MxN, gridSize, padSize, out)
+        return output_image, gridSize[0], gridSize[1]
+
+
+    def create_frame_store(self, video_path, store_path, frame_size=(640, 360), source_path=None, sample_layouts=None):
+        """
+        비디오를 한 번 디코딩해 frame_size로 줄인 프레임을 메모리 맵 저장소(FrameStore)로 만듭니다. (유효한 저장소가 있으면 재사용)
+        frame_size를 그리드 셀 크기와 같게 두면 저장소에서 만든 그리드가 디코딩해서 만든 그리드와 같습니다.
+        Args:
+            video_path (str): 원본 비디오 경로
+            store_path (str): 저장할 .npy 파일 경로 (프레임 수 x 높이 x 너비 x 3)
+            frame_size (tuple): 저장할 프레임 크기 (너비, 높이)
+            source_path (str): 디코딩할 비디오 (원본과 프레임 번호가 같은 프록시, None이면 원본)
+            sample_layouts (list): [(구간 길이(초), MxN), ...] 0초부터 구간 길이 간격으로 놓인 구간들의 그리드가 쓰는 프레임만 저장
+                (None이면 모든 프레임)
+        Returns:
+            FrameStore: 저장소 (실패 시 None)
+        """
+        frame_index = self.get_frame_index(video_path)
+        frame_count = frame_index.frame_count if frame_index is not None else None
+        frame_numbers = None
+        if sample_layouts is not None:
+            frame_numbers = self.sample_frame_numbers(video_path, sample_layouts, source_path)
+            if frame_numbers is None:
+                return None
+        with stage_metrics.timed("decode_ms"):
+            return FrameStore.load_or_build(video_path, store_path, frame_size, self.interpolation, source_path, frame_count,
+                                            frame_numbers)
+
+
+    def sample_frame_numbers(self, video_path, sample_layouts, source_path=None):
+        """
+        0초부터 구간 길이 간격으로 놓인 구간들(마지막 구간은 재생 시간 안)의 MxN 그리드가 쓰는 원본 프레임 번호 (오름차순)
+        extract_frames_to_MxN_image의 'time' 옵션과 같은 방식으로 계산합니다. 비디오를 열 수 없으면 None을 반환합니다.
+        Args:
+            video_path (str): 원본 비디오 경로
+            sample_layouts (list): [(구간 길이(초), MxN), ...]
+            source_path (str): 저장소를 만들 비디오 (FPS 기준, None이면 원본)
+        """
+        fps = self.query_fps(source_path or video_path)
+        if fps is None:
+            return None
+        play_time = self.query_videoInfo(video_path)[1]
+        if play_time is None:
+            return None
+        frame_index = self.get_frame_index(video_path)
+        
+        frame_numbers = set()
+        for segment_time, MxN in sample_layouts:
+            start = 0.0
+            while start <= play_time - segment_time:
+                start_frame, end_frame = self._time_to_frame_range('time', start, start + segment_time, fps, frame_index)
+                frame_numbers.update(self._MxN_frame_indices(start_frame, end_frame, MxN))
+                start += segment_time
+        return sorted(frame_numbers)
+
+
+    def extract_frames_to_MxN_image_from_store(self, store, option, start, end, MxN, gridSize=(1920, 1080), padSize=(10, 10), out=None):
+        """
+        extract_frames_to_MxN_image와 같은 그리드를 프레임 저장소(FrameStore)에서 생성합니다. (이미지 배열만 반환)
+        프레임은 메모리 맵의 view로 읽으므로 디코딩하지 않고, 시간은 원본 비디오의 프레임 색인 기준으로 변환합니다.
+        Returns:
+            array: 그리드 이미지 배열 (저장소에 없는 프레임이 있으면 None, 이 경우 호출한 쪽에서 디코딩)
+            int: 그리드의 너비
+            int: 그리드의 높이
+        """
+        start_frame, end_frame = self._time_to_frame_range(option, start, end, store.fps, self.get_frame_index(store.video_path))
+        if start_frame is None:
+            return None, gridSize[0], gridSize[1]
+        
+        frame_indices = self._MxN_frame_indices(start_frame, end_frame, MxN)
+        selected_frames = store.read_frames(frame_indices)
+        if not selected_frames:
+            return None, gridSize[0], gridSize[1]
+        
+        with stage_metrics.timed("resize_ms"):
+            output_image = self._compose_MxN_grid(selected_frames, MxN, gridSize, padSize, out)
+        return output_image, gridSize[0], gridSize[1]
+
     
+    def create_proxy(self, video_path, proxy_path, max_size=(640, 360), key_interval=12):
+        """
+        분석용 저해상도 프록시 비디오를 만듭니다. (프레임 수와 순서는 원본과 같고, 해상도만 줄임)
+        가로/세로를 각각 max_size 이하로 줄이므로(원본이 더 작으면 유지) 그리드 셀 크기와 맞추면 셀 리사이즈가 거의 없어지고,
+        키프레임 간격(key_interval)을 짧게 하여 구간 탐색 시 디코딩할 프레임 수를 줄입니다.
+        Args:
+            video_path (str): 원본 비디오 경로
+            proxy_path (str): 저장할 프록시 경로 (.mp4)
+            max_size (tuple): 프록시 최대 크기 (너비, 높이)
+            key_interval (int): 키프레임 간격 (OpenCV가 지원하지 않으면 코덱 기본값)
+        Returns:
+            str: 프록시 경로 (실패 시 None)
+            int: 기록한 프레임 수
+        """
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            print("비디오를 열 수 없습니다.")
+            return None, 0
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        size = (min(width, max_size[0]), min(height, max_size[1]))
+        
+        proxy_dir = os.path.dirname(proxy_path)
+        if proxy_dir and not os.path.exists(proxy_dir):
+            os.makedirs(proxy_dir, exist_ok=True)
+        # 완성된 파일만 보이도록 임시 파일에 쓴 뒤 교체 (동시에 만들어도 안전)
+        temp_path = f"{os.path.splitext(proxy_path)[0]}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+        params = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, key_interval] if hasattr(cv2, "VIDEOWRITER_PROP_KEY_INTERVAL") else []
+        writer = cv2.VideoWriter(temp_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, size, params)
+        if not writer.isOpened():
+            print("프록시 비디오를 만들 수 없습니다.")
+            capture.release()
+            return None, 0
+        
+        frame_count = 0
+        try:
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                if (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+                frame_count += 1
+        finally:
+            writer.release()
+            capture.release()
+        
+        if frame_count == 0:
+            os.remove(temp_path)
+            return None, 0
+        os.replace(temp_path, proxy_path)
+        return proxy_path, frame_count
+
+
     def trim_video_segment(self, option, start, end, video_path, output_dir):
         """비디오를 주어진 시작과 종료 지점에서 잘라 output_dir에 저장합니다. 생성된 비디오 파일의 경로와 재생 시간, 총 프레임 수를 반환합니다."""
         if not os.path.exists(output_dir):
@@ -245,7 +1245,7 @@ class MediaEdit:
         else:
             print("잘못된 옵션입니다. 'time' 또는 'frame'을 선택하세요.")
             out.release()
-            capture.release()
+            self._close_video(capture)
             return None
 
         total_frames = 0
@@ -257,7 +1257,7 @@ class MediaEdit:
             count += 1
 
         out.release()
-        capture.release()
+        self._close_video(capture)
 
         # 자른 비디오의 재생 시간 계산
         play_time = round(total_frames / fps, 2)
@@ -304,7 +1304,7 @@ class MediaEdit:
                 else:
                     print("잘못된 옵션입니다. 'time' 또는 'frame'을 선택하세요.")
                     out.release()
-                    capture.release()
+                    self._close_video(capture)
                     return None, None, None
                 
                 out.write(frame)
@@ -320,7 +1320,7 @@ class MediaEdit:
             out.release()
             print('.', end='')
 
-        capture.release()
+        self._close_video(capture)
         num_videos = part_count  # 생성된 비디오 세그먼트의 수
         print(f"\n{video_name} 비디오가 {option}({interval}) 간격으로 {output_dir}에 저장되었습니다.")
         print(f"비디오 수: {num_videos}, 첫번째 비디오 재생 시간: {firstSegment_play_time} 초, 첫번째 비디오 총 프레임 수: {firstSegment_total_frames} 프레임")
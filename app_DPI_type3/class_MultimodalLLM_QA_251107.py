@@ -1,8 +1,414 @@
+import asyncio
 import base64
+import hashlib
+import json
 import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
 import cv2
+import numpy as np
 from PIL import Image
 import io
+import stage_metrics
+
+
+class LLMResponseCache:
+    """
+    LLM 응답 디스크 캐시 (SQLite)
+    - 키: hash(모델, system_prompt, user_prompt, 인코딩된 이미지 바이트, 생성 파라미터)
+    - 전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 응답부터 삭제
+    - 여러 스레드/프로세스에서 같은 파일을 공유할 수 있음 (WAL 모드)
+    """
+    
+    def __init__(self, db_path: str = "llm_response_cache.sqlite", max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            db_path: SQLite 파일 경로
+            max_bytes: 캐시에 보관할 응답의 최대 총 크기 (바이트)
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self._conn.commit()
+    
+    @staticmethod
+    def make_key(model: str, payload) -> str:
+        """
+        캐시 키 생성
+        Args:
+            model: 모델 이름
+            payload: 요청 내용 (str, bytes, PIL Image, EncodedImage의 data URL 및 이들을 담은 dict/list)
+        """
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        LLMResponseCache._update_digest(digest, payload)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _update_digest(digest, part):
+        """요청 내용을 재귀적으로 해시 (이미지 데이터는 문자열로 복사하지 않고 바이트/인코딩 해시를 그대로 사용)"""
+        digest.update(b"\x00")
+        if isinstance(part, JpegDataURL):
+            digest.update(part.sha256.encode("ascii"))
+        elif isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        elif isinstance(part, Image.Image):
+            digest.update(f"{part.mode}{part.size}".encode("utf-8"))
+            digest.update(part.tobytes())
+        elif isinstance(part, dict):
+            digest.update(b"{")
+            for key in sorted(part, key=str):
+                digest.update(str(key).encode("utf-8"))
+                LLMResponseCache._update_digest(digest, part[key])
+            digest.update(b"}")
+        elif isinstance(part, (list, tuple)):
+            digest.update(b"[")
+            for item in part:
+                LLMResponseCache._update_digest(digest, item)
+            digest.update(b"]")
+        else:
+            digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    
+    def get(self, key: str):
+        """캐시된 응답 반환 (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key: str, model: str, response: str):
+        """응답 저장 후 크기 예산을 넘으면 오래된 응답부터 삭제"""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # 오래 사용되지 않은 순서로 초과분만큼 삭제
+                excess = total - self.max_bytes
+                freed = 0
+                evict_keys = []
+                for old_key, old_size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    if freed >= excess:
+                        break
+                    evict_keys.append((old_key,))
+                    freed += old_size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", evict_keys)
+            self._conn.commit()
+    
+    def get_stats(self) -> dict:
+        """캐시 통계 반환 (hit/miss는 이 인스턴스 기준)"""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ProviderRateLimiter:
+    """
+    provider/모델별 호출 속도 제한기 (토큰 버킷)
+    - 분당 요청 수(rpm)와 분당 토큰 수(tpm) 두 개의 버킷을 함께 사용
+    - 한도 초과(429) 응답을 받으면 속도를 절반으로 줄이고, 성공이 이어지면 설정 한도까지 천천히 회복
+    - 같은 (provider, 모델)을 쓰는 모든 multimodalLLM 인스턴스가 하나의 limiter를 공유
+    """
+    
+    # provider 기본 한도 (계정 tier에 맞게 조정), 모델별로 다르면 MODEL_LIMITS에 지정
+    DEFAULT_LIMITS = {
+        "openai": {"rpm": 500, "tpm": 200_000},
+        "google": {"rpm": 150, "tpm": 1_000_000},
+    }
+    MODEL_LIMITS = {}  # 예: {"gemini-2.5-pro": {"rpm": 60, "tpm": 500_000}}
+    BURST_SECONDS = 10.0     # 버킷 용량 = 이 시간 동안 허용되는 양 (순간 몰림 제한)
+    MIN_RATE_SCALE = 0.05    # 한도 초과가 반복될 때 줄일 수 있는 최저 속도 비율
+    RECOVERY_STEP = 0.02     # 성공 1회당 회복하는 속도 비율
+    
+    _shared = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, rpm: float, tpm: float):
+        """
+        Args:
+            rpm: 분당 최대 요청 수
+            tpm: 분당 최대 토큰 수 (입력 + 출력)
+        """
+        self.max_rpm = rpm
+        self.max_tpm = tpm
+        self.rate_scale = 1.0
+        self.rate_limited_count = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._request_bucket = self._request_capacity()
+        self._token_bucket = self._token_capacity()
+        self._last_refill = time.monotonic()
+    
+    @classmethod
+    def get_shared(cls, provider: str, model_name: str) -> "ProviderRateLimiter":
+        """(provider, 모델)별 공유 limiter 반환"""
+        with cls._shared_lock:
+            key = (provider, model_name)
+            if key not in cls._shared:
+                limits = cls.MODEL_LIMITS.get(model_name) or cls.DEFAULT_LIMITS.get(provider, {"rpm": 60, "tpm": 100_000})
+                cls._shared[key] = cls(limits["rpm"], limits["tpm"])
+            return cls._shared[key]
+    
+    def _request_capacity(self):
+        return max(1.0, self.max_rpm / 60.0 * self.BURST_SECONDS)
+    
+    def _token_capacity(self):
+        return max(1.0, self.max_tpm / 60.0 * self.BURST_SECONDS)
+    
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_bucket = min(self._request_capacity(), self._request_bucket + elapsed * self.max_rpm * self.rate_scale / 60.0)
+        self._token_bucket = min(self._token_capacity(), self._token_bucket + elapsed * self.max_tpm * self.rate_scale / 60.0)
+    
+    def _reserve(self, tokens: float) -> float:
+        """버킷에서 요청 1건과 tokens만큼을 차감. 성공하면 0, 부족하면 기다려야 할 시간(초)을 반환"""
+        # 버킷 용량보다 큰 요청은 용량만큼만 요구 (영원히 대기하지 않도록)
+        tokens = min(tokens, self._token_capacity())
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._request_bucket >= 1.0 and self._token_bucket >= tokens:
+                self._request_bucket -= 1.0
+                self._token_bucket -= tokens
+                return 0.0
+            request_wait = (1.0 - self._request_bucket) * 60.0 / (self.max_rpm * self.rate_scale)
+            token_wait = (tokens - self._token_bucket) * 60.0 / (self.max_tpm * self.rate_scale)
+            return max(request_wait, token_wait, 0.01)
+    
+    def acquire(self, tokens: float = 0):
+        """요청 1건과 예상 토큰 수만큼의 여유가 생길 때까지 대기"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return
+            self.wait_seconds += wait
+            time.sleep(wait)
+    
+    async def aacquire(self, tokens: float = 0):
+        """acquire()의 비동기 버전 (이벤트 루프를 막지 않고 대기)"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return
+            self.wait_seconds += wait
+            await asyncio.sleep(wait)
+    
+    def record_usage(self, estimated_tokens: float, actual_tokens):
+        """실제 사용 토큰 수를 알게 되면 예상치와의 차이만큼 토큰 버킷을 보정"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._token_bucket = min(self._token_capacity(), self._token_bucket + estimated_tokens - actual_tokens)
+    
+    def on_success(self):
+        with self._lock:
+            self.rate_scale = min(1.0, self.rate_scale + self.RECOVERY_STEP)
+    
+    def on_rate_limited(self):
+        """한도 초과 응답: 속도를 절반으로 줄이고 남은 요청 여유분을 비움"""
+        with self._lock:
+            self.rate_limited_count += 1
+            self.rate_scale = max(self.MIN_RATE_SCALE, self.rate_scale * 0.5)
+            self._request_bucket = min(self._request_bucket, 0.0)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_rpm": self.max_rpm,
+                "max_tpm": self.max_tpm,
+                "rate_scale": round(self.rate_scale, 3),
+                "rate_limited_count": self.rate_limited_count,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+class JpegDataURL(str):
+    """OpenAI image_url용 base64 data URL 문자열 (응답 캐시 키에는 문자열 대신 인코딩 바이트 해시를 사용)"""
+    sha256 = None
+
+
+class EncodedImage:
+    """
+    한 번 인코딩한 이미지 (모든 모델/재시도에서 같은 바이트를 재사용)
+    - data: 인코딩된 바이트 (JPEG, 또는 Gemini 기본값인 무손실 WebP), Gemini에는 inline_data로 그대로 전송
+    - data_url: OpenAI용 base64 data URL (처음 사용할 때 한 번만 생성)
+    """
+    
+    def __init__(self, data: bytes, width: int, height: int, mime_type: str = "image/jpeg"):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.mime_type = mime_type
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self._data_url = None
+    
+    @property
+    def data_url_prefix(self) -> bytes:
+        return f"data:{self.mime_type};base64,".encode("ascii")
+    
+    @property
+    def data_url(self) -> JpegDataURL:
+        if self._data_url is None:
+            data_url = JpegDataURL(self.data_url_prefix + base64.b64encode(self.data), "ascii")
+            data_url.sha256 = self.sha256
+            self._data_url = data_url
+        return self._data_url
+    
+    @property
+    def gemini_part(self) -> dict:
+        """Gemini contents에 넣을 inline 이미지 (PIL 변환 없이 인코딩된 바이트 전달)"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+class ImageEncodeCache:
+    """
+    이미지 배열 -> JPEG/무손실 WebP(EncodedImage) 인코딩 캐시 (프로세스 전역 공유, thread-safe)
+    - FrameGridCache가 공유하는 읽기 전용 그리드 배열은 모델이 여러 개여도 한 번만 인코딩
+    - 배열이 해제되면 해당 항목도 함께 삭제되고, 바이트 예산을 넘으면 오래된 항목부터 제거
+    - 쓰기 가능한 배열은 내용이 바뀔 수 있으므로 캐시하지 않고 매번 인코딩
+    """
+    
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 보관할 인코딩 바이트의 최대 총 크기
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {(id(array), quality, max_side, lossless): EncodedImage}
+        self._keys_by_array = {}       # {id(array): [key, ...]}
+        self._inflight = {}            # {key: threading.Event}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def encode_array(image_array, quality: int = 95, max_side: int = None, lossless: bool = False):
+        """
+        BGR 이미지 배열을 JPEG로 인코딩 (max_side를 넘으면 비율을 유지하며 축소)
+        lossless=True이면 무손실 WebP로 인코딩 (quality는 사용하지 않음, 디코딩하면 원본 픽셀과 같음)
+        Returns:
+            EncodedImage (실패 시 None)
+        """
+        with stage_metrics.timed("encode_ms"):
+            height, width = image_array.shape[:2]
+            if max_side is not None and max(height, width) > max_side:
+                scale = max_side / max(height, width)
+                width, height = max(1, round(width * scale)), max(1, round(height * scale))
+                image_array = cv2.resize(image_array, (width, height), interpolation=cv2.INTER_AREA)
+            if lossless:
+                # WebP 품질이 100을 넘으면 무손실 압축
+                success, buffer = cv2.imencode('.webp', image_array, [cv2.IMWRITE_WEBP_QUALITY, 101])
+                mime_type = "image/webp"
+            else:
+                success, buffer = cv2.imencode('.jpg', image_array, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+                mime_type = "image/jpeg"
+            if not success:
+                return None
+            return EncodedImage(buffer.tobytes(), width, height, mime_type)
+    
+    def encode(self, image_array, quality: int = 95, max_side: int = None, lossless: bool = False):
+        """캐시를 거쳐 인코딩 (읽기 전용 배열만 캐시)"""
+        if image_array.flags.writeable:
+            return self.encode_array(image_array, quality, max_side, lossless)
+        
+        key = (id(image_array), int(quality), max_side, bool(lossless))
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                event = self._inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self.misses += 1
+                    break
+            # 다른 모델이 같은 그리드를 인코딩 중이면 완료를 기다린 뒤 다시 조회
+            event.wait()
+        
+        try:
+            encoded = self.encode_array(image_array, quality, max_side, lossless)
+            if encoded is not None:
+                self._put(key, image_array, encoded)
+            return encoded
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+    
+    def _put(self, key, image_array, encoded):
+        nbytes = len(encoded.data)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            array_id = key[0]
+            if array_id not in self._keys_by_array:
+                self._keys_by_array[array_id] = []
+                # 배열이 해제되면 (id가 재사용되기 전에) 해당 항목 삭제
+                weakref.finalize(image_array, self._forget_array, array_id)
+            self._keys_by_array[array_id].append(key)
+            self._entries[key] = encoded
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                old_key, old_encoded = self._entries.popitem(last=False)
+                self.current_bytes -= len(old_encoded.data)
+                self._keys_by_array.get(old_key[0], []).remove(old_key)
+    
+    def _forget_array(self, array_id):
+        with self._lock:
+            for key in self._keys_by_array.pop(array_id, []):
+                encoded = self._entries.pop(key, None)
+                if encoded is not None:
+                    self.current_bytes -= len(encoded.data)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 프로세스 전역 공유 인코딩 캐시 (모든 multimodalLLM 인스턴스가 공유)
+_shared_image_encode_cache = ImageEncodeCache()
+
+
+def get_shared_image_encode_cache() -> ImageEncodeCache:
+    return _shared_image_encode_cache
+
 
 class multimodalLLM:
     """ multimodalLLM에 관한 모음집 - OpenAI GPT 및 Google Gemini 지원"""
@@ -24,8 +430,36 @@ class multimodalLLM:
         "gemini-3-pro-preview": {"context_window": 1_000_000, "max_output_tokens": 8_192, "supports_vision": True, "supports_video": True, "provider": "google"},  # 공식 수치 부재 → Pro와 동일 가정
     }
     
-    def __init__(self, llm_name: str = "gpt-5-nano", api_key: str = None):
+    # 비동기 클라이언트 설정: (이벤트 루프, api_key)별 AsyncOpenAI 공유, 연결 풀 최대 크기
+    ASYNC_MAX_CONNECTIONS = 200
+    _async_clients = weakref.WeakKeyDictionary()  # {event_loop: {api_key: AsyncOpenAI}}
+    _async_clients_lock = threading.Lock()
+    
+    # 한도 초과(429)/서버 오류(5xx)/연결 오류 재시도 설정 (지수 백오프 + jitter)
+    MAX_RETRIES = 5
+    RETRY_BASE_DELAY = 1.0
+    RETRY_MAX_DELAY = 60.0
+    IMAGE_TOKEN_ESTIMATE = 1_000  # 이미지 1장당 예상 입력 토큰 수 (속도 제한용 추정치)
+    
+    def __init__(self, llm_name: str = "gpt-5-nano", api_key: str = None, response_cache: LLMResponseCache = None,
+                 jpeg_quality: int = 95, max_image_side: int = None, gemini_lossless: bool = True):
+        """
+        Args:
+            llm_name: 모델 이름
+            api_key: provider API 키
+            response_cache: LLM 응답 디스크 캐시 (None이면 캐시 사용 안 함)
+            jpeg_quality: 이미지 입력의 JPEG 인코딩 품질 (0~100)
+            max_image_side: 이미지 입력의 최대 가로/세로 길이 (넘으면 축소, None이면 원본 크기)
+            gemini_lossless: Gemini 이미지 입력을 무손실 WebP로 보낼지 여부 (기본값, 이전의 PIL 입력과 같은 픽셀)
+                False이면 OpenAI와 같은 JPEG(jpeg_quality)로 보냄 (요청 크기는 줄지만 모델이 보는 이미지가 달라지므로
+                정확도 비교 후에 사용)
+        """
         self.llm_name = llm_name
+        self.api_key = api_key
+        self.response_cache = response_cache
+        self.jpeg_quality = jpeg_quality
+        self.max_image_side = max_image_side
+        self.gemini_lossless = gemini_lossless
         
         # 모델 유효성 검사
         if llm_name not in self.SUPPORTED_MODELS:
@@ -38,7 +472,7 @@ class multimodalLLM:
         
         if self.provider == "openai":  # OpenAI 모델들
             from openai import OpenAI
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, max_retries=0)
         elif self.provider == "google":  # Google Gemini 모델들
             import google.generativeai as genai
             genai.configure(api_key=api_key)
@@ -47,20 +481,51 @@ class multimodalLLM:
             pass
 
 
-    # 파일명에 한글 포함되었을 때
-    def cv2_imread(self, image_path):  
-        image_path_temp = 'temporary_cv2_imread'
-        os.replace(image_path, image_path_temp)
-        image = cv2.imread(image_path_temp)  # cv2.imread()는 한글 파일명을 처리 못함
-        os.replace(image_path_temp, image_path)
-        return image
+    # 파일명에 한글 포함되었을 때 (cv2.imread()는 한글 경로를 처리 못 하므로 바이트로 읽어 메모리에서 디코딩)
+    def cv2_imread(self, image_path, flags=cv2.IMREAD_COLOR):
+        """이미지 파일을 읽어 배열로 반환합니다. 읽을 수 없으면 None을 반환합니다. (원본 파일을 옮기지 않으므로 동시에 읽어도 안전)"""
+        try:
+            buffer = np.fromfile(image_path, dtype=np.uint8)
+        except OSError:
+            return None
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, flags)
  
 
-    # 파일명에 한글 포함되었을 때
+    # 파일명에 한글 포함되었을 때 (cv2.imwrite()는 한글 경로에 저장 못 하므로 메모리에서 인코딩한 뒤 바이트로 씀)
     def cv2_imwrite(self, output_file, output_image):
-        output_file_temp = 'temporary_cv2_imwrite.png'
-        cv2.imwrite(output_file_temp, output_image)  # cv2.imwrite()는 한글 파일명을 처리 못함
-        os.replace(output_file_temp, output_file)
+        """
+        이미지를 확장자 형식(알 수 없는 확장자는 PNG)으로 저장합니다. 저장하지 못하면 False를 반환합니다.
+        실행마다 다른 임시 파일에 쓴 뒤 교체하므로 여러 스레드/프로세스가 동시에 저장해도 완성된 파일만 보입니다.
+        """
+        ext = os.path.splitext(output_file)[1].lower()
+        success, buffer = False, None
+        if ext:
+            try:
+                success, buffer = cv2.imencode(ext, output_image)
+            except cv2.error:
+                success = False
+        if not success:
+            # 확장자가 없거나 OpenCV가 모르는 확장자(.tmp, .v2 등)는 이전처럼 PNG로 저장
+            try:
+                success, buffer = cv2.imencode('.png', output_image)
+            except cv2.error as e:
+                print(f"이미지를 인코딩할 수 없습니다: {output_file} ({e})")
+                return False
+        if not success:
+            print(f"이미지를 인코딩할 수 없습니다: {output_file}")
+            return False
+        temp_path = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            buffer.tofile(temp_path)
+            os.replace(temp_path, output_file)
+        except OSError as e:
+            print(f"이미지를 저장할 수 없습니다: {output_file} ({e})")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        return True
 
 
     def query_answer_chatGPT(self, system_prompt, user_prompt, image_path=None, image_array=None, extract_video=10, max_output_tokens=None, temperature=0.0, seed=1):
@@ -68,6 +533,341 @@ class multimodalLLM:
         if self.provider == "google":
             return self._query_gemini(system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature)
         
+        api_params, error = self._build_openai_request(system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature, seed)
+        if error is not None:
+            return error
+        
+        cache_key, cached = self._lookup_cache(api_params)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self._call_with_retry(
+                lambda: self.client.chat.completions.create(**api_params),
+                self._estimate_tokens(api_params["messages"], api_params)
+            )
+            answer = response.choices[0].message.content
+            self._store_cache(cache_key, answer)
+            return answer
+            
+        except Exception as e:
+            return self._format_openai_error(e)
+
+
+    async def aquery(self, system_prompt, user_prompt, image_path=None, image_array=None, extract_video=10, max_output_tokens=None, temperature=0.0, seed=1):
+        """
+        query_answer_chatGPT의 비동기 버전 (AsyncOpenAI / Gemini async 클라이언트 사용)
+        provider별 HTTP 연결 풀을 공유하므로 하나의 이벤트 루프에서 많은 요청을 동시에 보낼 수 있습니다.
+        """
+        # 이미지 인코딩은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드에서 수행
+        if self.provider == "google":
+            contents, generation_config, error = await asyncio.to_thread(
+                self._build_gemini_request, system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature
+            )
+            if error is not None:
+                return error
+            cache_key, cached = await asyncio.to_thread(self._lookup_cache, contents + [generation_config])
+            if cached is not None:
+                return cached
+            try:
+                # google.generativeai는 프로세스 전역 async 클라이언트(gRPC 채널)를 공유함
+                response = await self._acall_with_retry(
+                    lambda: self.client.generate_content_async(contents, generation_config=generation_config),
+                    self._estimate_tokens(contents, generation_config)
+                )
+                await asyncio.to_thread(self._store_cache, cache_key, response.text)
+                return response.text
+            except Exception as e:
+                return self._format_gemini_error(e)
+        
+        api_params, error = await asyncio.to_thread(
+            self._build_openai_request, system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature, seed
+        )
+        if error is not None:
+            return error
+        
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, api_params)
+        if cached is not None:
+            return cached
+
+        try:
+            client = self._get_async_openai_client()
+            response = await self._acall_with_retry(
+                lambda: client.chat.completions.create(**api_params),
+                self._estimate_tokens(api_params["messages"], api_params)
+            )
+            answer = response.choices[0].message.content
+            await asyncio.to_thread(self._store_cache, cache_key, answer)
+            return answer
+            
+        except Exception as e:
+            return self._format_openai_error(e)
+
+
+    def _lookup_cache(self, payload):
+        """응답 캐시 조회. (캐시 키, 캐시된 응답 또는 None)을 반환합니다. 캐시를 사용하지 않으면 (None, None)."""
+        if self.response_cache is None:
+            return None, None
+        cache_key = LLMResponseCache.make_key(self.llm_name, payload)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            stage_metrics.record("response_cache_hits", 1)
+        return cache_key, cached
+
+
+    def _store_cache(self, cache_key, answer):
+        """정상 응답만 캐시에 저장합니다."""
+        if self.response_cache is None or cache_key is None or not isinstance(answer, str):
+            return
+        self.response_cache.put(cache_key, self.llm_name, answer)
+
+
+    @staticmethod
+    def _sample_video_frames(video_path, extract_video):
+        """
+        비디오에서 extract_video 프레임 간격으로 샘플링한 프레임만 순서대로 디코딩하는 스트리밍 샘플러
+        (건너뛰는 프레임은 grab()만 하므로 디코딩/메모리 비용이 샘플 수에 비례)
+        
+        Returns:
+            generator: (프레임 번호, BGR 프레임)을 순서대로 반환 (비디오를 열 수 없으면 None)
+            function: 지금까지 읽은 전체 프레임 수를 반환하는 함수 (generator 소진 후 호출)
+        """
+        video = cv2.VideoCapture(video_path)
+        if not video.isOpened():
+            video.release()
+            return None, None
+        
+        step = max(1, int(extract_video))
+        frame_index = [0]
+        
+        def _iter_frames():
+            try:
+                while True:
+                    if not video.grab():
+                        break
+                    if frame_index[0] % step == 0:
+                        success, frame = video.retrieve()
+                        if success:
+                            yield frame_index[0], frame
+                    frame_index[0] += 1
+            finally:
+                video.release()
+        
+        return _iter_frames(), lambda: frame_index[0]
+
+
+    def _encode_image(self, image_array, lossless: bool = False):
+        """이미지 배열을 설정된 품질/크기로 JPEG(lossless=True이면 무손실 WebP) 인코딩 (공유 캐시 사용, 실패 시 None)"""
+        return get_shared_image_encode_cache().encode(image_array, self.jpeg_quality, self.max_image_side, lossless)
+
+
+    def _get_rate_limiter(self) -> ProviderRateLimiter:
+        return ProviderRateLimiter.get_shared(self.provider, self.llm_name)
+
+
+    def _call_with_retry(self, call, estimated_tokens):
+        """
+        속도 제한을 지키며 call()을 수행하고, 재시도 가능한 오류는 지수 백오프로 재시도합니다.
+        재시도를 모두 소진하면 마지막 예외를 그대로 올립니다.
+        """
+        limiter = self._get_rate_limiter()
+        attempt = 0
+        while True:
+            with stage_metrics.timed("rate_limit_wait_ms"):
+                limiter.acquire(estimated_tokens)
+            stage_metrics.record("api_calls", 1)
+            try:
+                with stage_metrics.timed("api_ms"):
+                    response = call()
+            except Exception as e:
+                delay = self._handle_retryable_error(e, attempt, limiter)
+                if delay is None:
+                    raise
+                stage_metrics.record("retries", 1)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            limiter.on_success()
+            limiter.record_usage(estimated_tokens, self._response_tokens(response))
+            self._record_token_usage(response)
+            return response
+
+
+    async def _acall_with_retry(self, call, estimated_tokens):
+        """_call_with_retry()의 비동기 버전 (call()은 awaitable을 반환)"""
+        limiter = self._get_rate_limiter()
+        attempt = 0
+        while True:
+            with stage_metrics.timed("rate_limit_wait_ms"):
+                await limiter.aacquire(estimated_tokens)
+            stage_metrics.record("api_calls", 1)
+            try:
+                with stage_metrics.timed("api_ms"):
+                    response = await call()
+            except Exception as e:
+                delay = self._handle_retryable_error(e, attempt, limiter)
+                if delay is None:
+                    raise
+                stage_metrics.record("retries", 1)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            limiter.on_success()
+            limiter.record_usage(estimated_tokens, self._response_tokens(response))
+            self._record_token_usage(response)
+            return response
+
+
+    def _handle_retryable_error(self, e, attempt, limiter):
+        """재시도할 오류면 대기 시간(초)을, 아니면 None을 반환합니다."""
+        retryable, rate_limited = self._classify_error(e)
+        if rate_limited:
+            limiter.on_rate_limited()
+        if not retryable or attempt >= self.MAX_RETRIES:
+            return None
+        
+        # 서버가 Retry-After를 알려주면 우선 사용, 아니면 지수 백오프 (절반 + 무작위 jitter)
+        delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                delay = min(self.RETRY_MAX_DELAY, max(delay, float(headers.get("retry-after"))))
+            except (TypeError, ValueError):
+                pass
+        print(f"{self.llm_name} 호출 재시도 {attempt + 1}/{self.MAX_RETRIES}: {delay:.1f}초 후 ({type(e).__name__})")
+        return delay
+
+
+    # 재시도할 예외 타입 이름 (MRO에서 찾으므로 하위 클래스도 포함, provider SDK를 import하지 않고 비교)
+    _RATE_LIMIT_ERROR_TYPES = frozenset({
+        "RateLimitError",        # openai
+        "ResourceExhausted",     # google.api_core (429)
+        "TooManyRequests",       # google.api_core (429)
+    })
+    _TRANSIENT_ERROR_TYPES = frozenset({
+        "APIConnectionError", "APITimeoutError", "InternalServerError",     # openai (InternalServerError는 google.api_core도 같은 이름)
+        "ServiceUnavailable", "DeadlineExceeded",                           # google.api_core
+        "TimeoutException", "NetworkError", "RemoteProtocolError",          # httpx (SDK 전송 계층)
+    })
+    # 상태 코드도 예외 타입도 없을 때만 보는 일시적 오류 문구 (숫자만으로는 판단하지 않음)
+    _RATE_LIMIT_PHRASES = ("rate limit exceeded", "rate_limit_exceeded", "resource exhausted", "resource_exhausted")
+    _TRANSIENT_PHRASES = ("temporarily unavailable", "service unavailable", "overloaded", "timed out",
+                          "deadline exceeded", "connection reset", "connection aborted")
+
+    @classmethod
+    def _classify_error(cls, e):
+        """
+        예외를 분류합니다. HTTP 상태 코드 -> 예외 타입 -> 알려진 일시적 오류 문구 순서로 판단합니다.
+        Returns:
+            bool: 재시도 가능 여부 (429, 408/409, 5xx, 연결/타임아웃 오류)
+            bool: 호출 한도 초과 여부
+        """
+        status = getattr(e, "status_code", None)
+        if status is None and isinstance(getattr(e, "code", None), int):
+            status = e.code  # google.api_core 예외는 HTTP 상태 코드를 code로 가짐
+        if isinstance(status, int):
+            return status in (408, 409, 429) or status >= 500, status == 429
+        
+        type_names = {klass.__name__ for klass in type(e).__mro__}
+        if type_names & cls._RATE_LIMIT_ERROR_TYPES:
+            return True, True
+        if isinstance(e, (TimeoutError, ConnectionError)) or type_names & cls._TRANSIENT_ERROR_TYPES:
+            return True, False
+        
+        error_msg = str(e).lower()
+        if any(phrase in error_msg for phrase in cls._RATE_LIMIT_PHRASES):
+            return True, True
+        if any(phrase in error_msg for phrase in cls._TRANSIENT_PHRASES):
+            return True, False
+        return False, False
+
+
+    def _estimate_tokens(self, contents, generation_config):
+        """속도 제한용 요청 토큰 수 추정 (텍스트 4글자당 1토큰 + 이미지당 고정값 + 최대 출력 토큰)"""
+        text_chars = 0
+        num_images = 0
+        
+        def _visit(part):
+            nonlocal text_chars, num_images
+            if isinstance(part, str):
+                text_chars += len(part)
+            elif isinstance(part, Image.Image):
+                num_images += 1
+            elif isinstance(part, dict):
+                if part.get("type") == "image_url" or "mime_type" in part:
+                    num_images += 1
+                elif part.get("type") == "text":
+                    text_chars += len(part.get("text", ""))
+                elif "content" in part:
+                    _visit(part["content"])
+            elif isinstance(part, list):
+                for item in part:
+                    _visit(item)
+        
+        _visit(contents)
+        max_output = 0
+        for key in ("max_tokens", "max_completion_tokens", "max_output_tokens"):
+            if generation_config.get(key):
+                max_output = generation_config[key]
+                break
+        # 출력은 보통 한도보다 훨씬 짧으므로 일부만 반영 (실제 사용량으로 나중에 보정)
+        return text_chars // 4 + num_images * self.IMAGE_TOKEN_ESTIMATE + min(max_output, 1_024)
+
+
+    @staticmethod
+    def _response_tokens(response):
+        """응답의 실제 총 토큰 수 (알 수 없으면 None)"""
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None) is not None:
+            return usage.total_tokens
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if usage_metadata is not None and getattr(usage_metadata, "total_token_count", None) is not None:
+            return usage_metadata.total_token_count
+        return None
+
+
+    @staticmethod
+    def _record_token_usage(response):
+        """응답의 입력/출력 토큰 수를 현재 계측 기록기에 더함 (OpenAI usage / Gemini usage_metadata)"""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_tokens", None)
+            completion_tokens = getattr(usage, "completion_tokens", None)
+        else:
+            usage = getattr(response, "usage_metadata", None)
+            prompt_tokens = getattr(usage, "prompt_token_count", None)
+            completion_tokens = getattr(usage, "candidates_token_count", None)
+        stage_metrics.record("prompt_tokens", prompt_tokens or 0)
+        stage_metrics.record("completion_tokens", completion_tokens or 0)
+
+
+    def _get_async_openai_client(self):
+        """
+        (이벤트 루프, api_key)별로 공유되는 AsyncOpenAI 클라이언트 반환
+        httpx 연결 풀은 이벤트 루프에 묶이므로 루프마다 하나씩 생성합니다. (루프가 사라지면 함께 정리됨)
+        """
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        import httpx
+        
+        loop = asyncio.get_running_loop()
+        with multimodalLLM._async_clients_lock:
+            loop_clients = multimodalLLM._async_clients.setdefault(loop, {})
+            client = loop_clients.get(self.api_key)
+            if client is None:
+                limits = httpx.Limits(max_connections=self.ASYNC_MAX_CONNECTIONS, max_keepalive_connections=self.ASYNC_MAX_CONNECTIONS)
+                client = AsyncOpenAI(api_key=self.api_key, max_retries=0, http_client=DefaultAsyncHttpxClient(limits=limits))
+                loop_clients[self.api_key] = client
+            return client
+
+
+    def _build_openai_request(self, system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature, seed):
+        """
+        OpenAI chat.completions 요청 매개변수를 구성합니다.
+        Returns:
+            dict: API 호출 매개변수 (오류 시 None)
+            str: 오류 메시지 (정상이면 None)
+        """
         # max_output_tokens 기본값 및 상한 클램프
         if max_output_tokens is None:
             max_output_tokens = self.model_config["max_output_tokens"]
@@ -92,31 +892,27 @@ class multimodalLLM:
                 # 이미지 배열 유효성 검사
                 if image_array is None or not hasattr(image_array, 'size') or image_array.size == 0:
                     print("이미지 배열이 비어있거나 None입니다.")
-                    return "Image Error: The image array is empty or None."
+                    return None, "Image Error: The image array is empty or None."
 
                 # 이미지 배열 형태 검사 (H x W x 3)
                 if len(image_array.shape) != 3 or image_array.shape[2] != 3:
                     print(f"이미지 배열 형태가 올바르지 않습니다: {image_array.shape}")
-                    return "Image Error: Invalid image array format."
+                    return None, "Image Error: Invalid image array format."
 
-                # 이미지 배열을 JPEG로 변환
-                success, jpeg_image = cv2.imencode('.jpg', image_array)
-                if not success:
+                # 이미지 배열을 JPEG로 변환 (같은 그리드는 모든 모델이 인코딩 결과를 공유)
+                encoded = self._encode_image(image_array)
+                if encoded is None:
                     print("이미지 배열을 JPEG로 변환하는 데 실패했습니다.")
-                    return "Image Error: Failed to encode image to JPEG format."
+                    return None, "Image Error: Failed to encode image to JPEG format."
 
-                # Base64 인코딩 + MIME 헤더 추가
-                b64_str = base64.b64encode(jpeg_image).decode("utf-8")
-                b64_with_header = f"data:image/jpeg;base64,{b64_str}"
-
-                # GPT-4o 입력 포맷 구성
+                # GPT-4o 입력 포맷 구성 (Base64 data URL)
                 user_prompt2 = [
                     {"type": "text", "text": user_prompt},
-                    {"type": "image_url", "image_url": {"url": b64_with_header}}
+                    {"type": "image_url", "image_url": {"url": encoded.data_url}}
                 ]
             except Exception as e:
                 print(f"이미지 배열 처리 중 오류 발생: {e}")
-                return f"Image Error: Error processing image array: {str(e)}"
+                return None, f"Image Error: Error processing image array: {str(e)}"
                 
         elif image_path:  # image_path로 파일형태로 제공된 경우
             try:
@@ -128,57 +924,44 @@ class multimodalLLM:
                     image = self.cv2_imread(image_path)
                     if image is None:
                         print(f"이미지를 읽어들이는 데 실패했습니다: {image_path}")
-                        return f"Image Error: Failed to read image file: {image_path}"
+                        return None, f"Image Error: Failed to read image file: {image_path}"
                     
                     # 모든 이미지를 JPEG로 변환 (GPT-4o 안정성 확보)
-                    success, jpeg_image = cv2.imencode('.jpg', image)
-                    if not success:
+                    encoded = self._encode_image(image)
+                    if encoded is None:
                         print("이미지를 JPEG로 변환하는 데 실패했습니다.")
-                        return "Image Error: Failed to encode image to JPEG format."
-                    
-                    # Base64 인코딩 + MIME 헤더 추가
-                    b64_str = base64.b64encode(jpeg_image).decode("utf-8")
-                    b64_with_header = f"data:image/jpeg;base64,{b64_str}"
+                        return None, "Image Error: Failed to encode image to JPEG format."
                     
-                    # GPT-4o 입력 포맷 구성
+                    # GPT-4o 입력 포맷 구성 (Base64 data URL)
                     user_prompt2 = [
                         {"type": "text", "text": user_prompt},
-                        {"type": "image_url", "image_url": {"url": b64_with_header}}
+                        {"type": "image_url", "image_url": {"url": encoded.data_url}}
                     ]
 
                 # video 파일일 때, multiple JPEG으로 변환 후 base64 encoding(필요시, 일정 간격 추출)으로 보낸다.
                 elif ext.lower() in ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.webm', '.mpeg']:  # .mp4 동작체크 완료
                     if not supports_video:
                         print(f"경고: {self.llm_name} 모델은 비디오 입력을 지원하지 않습니다.")
-                        return f"Video Error: {self.llm_name} model does not support video input."
-                    video = cv2.VideoCapture(image_path)
-                    if not video.isOpened():
+                        return None, f"Video Error: {self.llm_name} model does not support video input."
+                    # extract_video 프레임마다 하나씩만 디코딩/인코딩 (나머지 프레임은 grab()으로 건너뜀)
+                    sampled_frames, total_frames = self._sample_video_frames(image_path, extract_video)
+                    if sampled_frames is None:
                         print(f"비디오 파일을 열 수 없습니다: {image_path}")
-                        return f"Image Error: Failed to open video file: {image_path}"
+                        return None, f"Image Error: Failed to open video file: {image_path}"
                     
-                    base64Frames = []
-                    frame_count = 0
-                    while video.isOpened():
-                        success, frame = video.read()
-                        if not success:
-                            break
-                        success, buffer = cv2.imencode(".jpg", frame)
-                        if not success:
+                    extract_base64Frames = []
+                    for frame_count, frame in sampled_frames:
+                        encoded = ImageEncodeCache.encode_array(frame, self.jpeg_quality, self.max_image_side)
+                        if encoded is None:
                             print(f"프레임 {frame_count}을 JPEG로 변환하는 데 실패했습니다.")
                             continue
-                        # base64 인코딩 + 접두어
-                        b64_str = base64.b64encode(buffer).decode("utf-8")
-                        base64Frames.append(f"data:image/jpeg;base64,{b64_str}")
-                        frame_count += 1
-                    video.release()
+                        extract_base64Frames.append(encoded.data_url)
                     
-                    if not base64Frames:
+                    if not extract_base64Frames:
                         print("비디오에서 프레임을 추출할 수 없습니다.")
-                        return "Image Error: Failed to extract frames from video."
+                        return None, "Image Error: Failed to extract frames from video."
                     
-                    # 일정 간격 추출 (예: extract_video=10 → 10프레임마다)
-                    extract_base64Frames = base64Frames[0::extract_video]
-                    print(f"video: input frames {len(base64Frames)} --> extracted frames {len(extract_base64Frames)}")
+                    print(f"video: input frames {total_frames()} --> extracted frames {len(extract_base64Frames)}")
                     
                     # GPT-4o 입력 메시지 구성
                     user_prompt2 = [
@@ -188,67 +971,93 @@ class multimodalLLM:
                 
                 else:
                     print(f"Unknown media file format: {ext}")
-                    return f"Image Error: Unknown media file format: {ext}"
+                    return None, f"Image Error: Unknown media file format: {ext}"
             except Exception as e:
                 print(f"이미지 파일 처리 중 오류 발생: {e}")
-                return f"Image Error: Error processing image file: {str(e)}"
+                return None, f"Image Error: Error processing image file: {str(e)}"
         else:  # text input only
             user_prompt2 = user_prompt
 
-        try:
-            # API 호출 매개변수 구성 (공통)
-            api_params = {
-                "model": self.llm_name,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt2}
-                ]
-            }
+        # API 호출 매개변수 구성 (공통)
+        api_params = {
+            "model": self.llm_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt2}
+            ]
+        }
 
-            # 모델별 토큰 파라미터 호환 처리
-            # 기본값: max_tokens (gpt-4o 계열 등 일반 모델은 max_tokens가 출력 제한임)
-            api_params["max_tokens"] = max_output_tokens
-            if self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5"):
-                # gpt-5는 max_completion_tokens를 사용, temperature/seed 미지원
-                api_params.pop("max_tokens", None)
-                api_params["max_completion_tokens"] = max_output_tokens
-            elif self.llm_name.startswith("o1"):
-                # o1 계열은 max_output_tokens 사용, temperature/seed 미지원
-                api_params.pop("max_tokens", None)
-                api_params["max_output_tokens"] = max_output_tokens
-
-            # temperature 설정: gpt-5/o1은 미지원이므로 제외, 그 외 모델만 설정
-            if not (self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5") or self.llm_name.startswith("o1")):
-                api_params["temperature"] = temperature
-
-            # seed 설정: gpt-5/o1은 제외
-            if not (self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5") or self.llm_name.startswith("o1")):
-                api_params["seed"] = seed
-
-            # GPT-5의 경우 향상된 추론을 위한 추가 설정 (향후 지원 시 확장 포인트)
-            if self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5"):
-                pass
+        # 모델별 토큰 파라미터 호환 처리
+        # 기본값: max_tokens (gpt-4o 계열 등 일반 모델은 max_tokens가 출력 제한임)
+        api_params["max_tokens"] = max_output_tokens
+        if self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5"):
+            # gpt-5는 max_completion_tokens를 사용, temperature/seed 미지원
+            api_params.pop("max_tokens", None)
+            api_params["max_completion_tokens"] = max_output_tokens
+        elif self.llm_name.startswith("o1"):
+            # o1 계열은 max_output_tokens 사용, temperature/seed 미지원
+            api_params.pop("max_tokens", None)
+            api_params["max_output_tokens"] = max_output_tokens
 
-            response = self.client.chat.completions.create(**api_params)
-            answer = response.choices[0].message.content
-            return answer
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"{self.llm_name} API 호출 중 오류 발생: {error_msg}")
-            
-            # 구체적인 오류 메시지 제공
-            if "context_length_exceeded" in error_msg.lower():
-                return f"API Error: 입력이 {self.llm_name}의 최대 입력 토큰 제한(Context Window: {self.model_config['context_window']})을 초과했습니다."
-            elif "rate_limit" in error_msg.lower():
-                return f"API Error: API 호출 한도 초과. 잠시 후 다시 시도해주세요."
-            elif "model_not_found" in error_msg.lower():
-                return f"API Error: {self.llm_name} 모델을 찾을 수 없습니다. 모델명을 확인해주세요."
-            else:
-                return f"API Error: {error_msg}"
+        # temperature 설정: gpt-5/o1은 미지원이므로 제외, 그 외 모델만 설정
+        if not (self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5") or self.llm_name.startswith("o1")):
+            api_params["temperature"] = temperature
+
+        # seed 설정: gpt-5/o1은 제외
+        if not (self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5") or self.llm_name.startswith("o1")):
+            api_params["seed"] = seed
+
+        # GPT-5의 경우 향상된 추론을 위한 추가 설정 (향후 지원 시 확장 포인트)
+        if self.llm_name == "gpt-5" or self.llm_name.startswith("gpt-5"):
+            pass
+
+        return api_params, None
+
+    def _format_openai_error(self, e):
+        """OpenAI API 예외를 오류 메시지 문자열로 변환합니다."""
+        error_msg = str(e)
+        print(f"{self.llm_name} API 호출 중 오류 발생: {error_msg}")
+        
+        # 구체적인 오류 메시지 제공
+        if "context_length_exceeded" in error_msg.lower():
+            return f"API Error: 입력이 {self.llm_name}의 최대 입력 토큰 제한(Context Window: {self.model_config['context_window']})을 초과했습니다."
+        elif "rate_limit" in error_msg.lower():
+            return f"API Error: API 호출 한도 초과. 잠시 후 다시 시도해주세요."
+        elif "model_not_found" in error_msg.lower():
+            return f"API Error: {self.llm_name} 모델을 찾을 수 없습니다. 모델명을 확인해주세요."
+        else:
+            return f"API Error: {error_msg}"
 
     def _query_gemini(self, system_prompt, user_prompt, image_path=None, image_array=None, extract_video=10, max_output_tokens=None, temperature=0.0):
         """Google Gemini 모델 전용 쿼리 메서드"""
+        contents, generation_config, error = self._build_gemini_request(system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature)
+        if error is not None:
+            return error
+        
+        cache_key, cached = self._lookup_cache(contents + [generation_config])
+        if cached is not None:
+            return cached
+        
+        try:
+            response = self._call_with_retry(
+                lambda: self.client.generate_content(contents, generation_config=generation_config),
+                self._estimate_tokens(contents, generation_config)
+            )
+            
+            self._store_cache(cache_key, response.text)
+            return response.text
+            
+        except Exception as e:
+            return self._format_gemini_error(e)
+    
+    def _build_gemini_request(self, system_prompt, user_prompt, image_path, image_array, extract_video, max_output_tokens, temperature):
+        """
+        Gemini generate_content 요청 내용을 구성합니다.
+        Returns:
+            list: contents (프롬프트 + inline 이미지들(기본 무손실 WebP), 오류 시 None)
+            dict: generation_config (오류 시 None)
+            str: 오류 메시지 (정상이면 None)
+        """
         # max_output_tokens 설정
         if max_output_tokens is None:
             max_output_tokens = self.model_config["max_output_tokens"]
@@ -266,116 +1075,106 @@ class multimodalLLM:
             image_array = None
             image_path = None
         
-        try:
-            # 프롬프트 구성 (Gemini는 system_prompt를 user_prompt에 통합)
-            combined_prompt = f"{system_prompt}\n\n{user_prompt}"
-            contents = [combined_prompt]
-            
-            # 이미지/비디오 처리
-            if image_array is not None:
-                # numpy array를 PIL Image로 변환
-                try:
-                    if image_array is None or not hasattr(image_array, 'size') or image_array.size == 0:
-                        print("이미지 배열이 비어있거나 None입니다.")
-                        return "Image Error: The image array is empty or None."
-                    
-                    if len(image_array.shape) != 3 or image_array.shape[2] != 3:
-                        print(f"이미지 배열 형태가 올바르지 않습니다: {image_array.shape}")
-                        return "Image Error: Invalid image array format."
+        # 프롬프트 구성 (Gemini는 system_prompt를 user_prompt에 통합)
+        combined_prompt = f"{system_prompt}\n\n{user_prompt}"
+        contents = [combined_prompt]
+        
+        # 이미지/비디오 처리
+        if image_array is not None:
+            # numpy array를 PIL Image로 변환
+            try:
+                if image_array is None or not hasattr(image_array, 'size') or image_array.size == 0:
+                    print("이미지 배열이 비어있거나 None입니다.")
+                    return None, None, "Image Error: The image array is empty or None."
+                
+                if len(image_array.shape) != 3 or image_array.shape[2] != 3:
+                    print(f"이미지 배열 형태가 올바르지 않습니다: {image_array.shape}")
+                    return None, None, "Image Error: Invalid image array format."
+                
+                # 인코딩된 바이트를 그대로 전달 (BGR->RGB 변환/PIL 복사 없이 모든 모델이 인코딩 결과를 공유)
+                encoded = self._encode_image(image_array, self.gemini_lossless)
+                if encoded is None:
+                    print("이미지 배열을 인코딩하는 데 실패했습니다.")
+                    return None, None, "Image Error: Failed to encode image array."
+                contents.append(encoded.gemini_part)
+                
+            except Exception as e:
+                print(f"이미지 배열 처리 중 오류 발생: {e}")
+                return None, None, f"Image Error: Error processing image array: {str(e)}"
+                
+        elif image_path:
+            try:
+                _, ext = os.path.splitext(image_path)
+                ext = ext.lower()
+                
+                # 이미지 파일 처리
+                if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']:
+                    image = self.cv2_imread(image_path)
+                    if image is None:
+                        print(f"이미지를 읽어들이는 데 실패했습니다: {image_path}")
+                        return None, None, f"Image Error: Failed to read image file: {image_path}"
                     
-                    # BGR -> RGB 변환 (OpenCV는 BGR 사용)
-                    image_rgb = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(image_rgb)
-                    contents.append(pil_image)
+                    encoded = self._encode_image(image, self.gemini_lossless)
+                    if encoded is None:
+                        print("이미지를 인코딩하는 데 실패했습니다.")
+                        return None, None, "Image Error: Failed to encode image."
+                    contents.append(encoded.gemini_part)
+                
+                # 비디오 파일 처리
+                elif ext in ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.webm', '.mpeg']:
+                    if not supports_video:
+                        print(f"경고: {self.llm_name} 모델은 비디오 입력을 지원하지 않습니다.")
+                        return None, None, f"Video Error: {self.llm_name} model does not support video input."
                     
-                except Exception as e:
-                    print(f"이미지 배열 처리 중 오류 발생: {e}")
-                    return f"Image Error: Error processing image array: {str(e)}"
+                    # extract_video 프레임마다 하나씩만 디코딩/인코딩 (나머지 프레임은 grab()으로 건너뜀)
+                    sampled_frames, total_frames = self._sample_video_frames(image_path, extract_video)
+                    if sampled_frames is None:
+                        print(f"비디오 파일을 열 수 없습니다: {image_path}")
+                        return None, None, f"Image Error: Failed to open video file: {image_path}"
                     
-            elif image_path:
-                try:
-                    _, ext = os.path.splitext(image_path)
-                    ext = ext.lower()
+                    num_extracted = 0
+                    for frame_count, frame in sampled_frames:
+                        encoded = ImageEncodeCache.encode_array(frame, self.jpeg_quality, self.max_image_side,
+                                                                self.gemini_lossless)
+                        if encoded is None:
+                            print(f"프레임 {frame_count}을 인코딩하는 데 실패했습니다.")
+                            continue
+                        contents.append(encoded.gemini_part)
+                        num_extracted += 1
                     
-                    # 이미지 파일 처리
-                    if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']:
-                        image = self.cv2_imread(image_path)
-                        if image is None:
-                            print(f"이미지를 읽어들이는 데 실패했습니다: {image_path}")
-                            return f"Image Error: Failed to read image file: {image_path}"
-                        
-                        # BGR -> RGB 변환
-                        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                        pil_image = Image.fromarray(image_rgb)
-                        contents.append(pil_image)
+                    if num_extracted == 0:
+                        print("비디오에서 프레임을 추출할 수 없습니다.")
+                        return None, None, "Image Error: Failed to extract frames from video."
                     
-                    # 비디오 파일 처리
-                    elif ext in ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.webm', '.mpeg']:
-                        if not supports_video:
-                            print(f"경고: {self.llm_name} 모델은 비디오 입력을 지원하지 않습니다.")
-                            return f"Video Error: {self.llm_name} model does not support video input."
-                        
-                        video = cv2.VideoCapture(image_path)
-                        if not video.isOpened():
-                            print(f"비디오 파일을 열 수 없습니다: {image_path}")
-                            return f"Image Error: Failed to open video file: {image_path}"
-                        
-                        frames = []
-                        frame_count = 0
-                        while video.isOpened():
-                            success, frame = video.read()
-                            if not success:
-                                break
-                            frames.append(frame)
-                            frame_count += 1
-                        video.release()
-                        
-                        if not frames:
-                            print("비디오에서 프레임을 추출할 수 없습니다.")
-                            return "Image Error: Failed to extract frames from video."
-                        
-                        # 일정 간격 추출
-                        extract_frames = frames[0::extract_video]
-                        print(f"video: input frames {len(frames)} --> extracted frames {len(extract_frames)}")
-                        
-                        # 프레임들을 PIL Image로 변환
-                        for frame in extract_frames:
-                            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                            pil_image = Image.fromarray(frame_rgb)
-                            contents.append(pil_image)
+                    print(f"video: input frames {total_frames()} --> extracted frames {num_extracted}")
+                
+                else:
+                    print(f"Unknown media file format: {ext}")
+                    return None, None, f"Image Error: Unknown media file format: {ext}"
                     
-                    else:
-                        print(f"Unknown media file format: {ext}")
-                        return f"Image Error: Unknown media file format: {ext}"
-                        
-                except Exception as e:
-                    print(f"이미지 파일 처리 중 오류 발생: {e}")
-                    return f"Image Error: Error processing image file: {str(e)}"
-            
-            # Gemini API 호출
-            generation_config = {
-                "max_output_tokens": max_output_tokens,
-                "temperature": temperature,
-            }
-            
-            response = self.client.generate_content(
-                contents,
-                generation_config=generation_config
-            )
-            
-            return response.text
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"{self.llm_name} API 호출 중 오류 발생: {error_msg}")
+            except Exception as e:
+                print(f"이미지 파일 처리 중 오류 발생: {e}")
+                return None, None, f"Image Error: Error processing image file: {str(e)}"
             
-            # 구체적인 오류 메시지 제공
-            if "quota" in error_msg.lower() or "rate" in error_msg.lower():
-                return f"API Error: API 호출 한도 초과. 잠시 후 다시 시도해주세요."
-            elif "invalid" in error_msg.lower() and "api" in error_msg.lower():
-                return f"API Error: API 키가 유효하지 않습니다."
-            else:
-                return f"API Error: {error_msg}"
+        generation_config = {
+            "max_output_tokens": max_output_tokens,
+            "temperature": temperature,
+        }
+        
+        return contents, generation_config, None
+    
+    def _format_gemini_error(self, e):
+        """Gemini API 예외를 오류 메시지 문자열로 변환합니다."""
+        error_msg = str(e)
+        print(f"{self.llm_name} API 호출 중 오류 발생: {error_msg}")
+        
+        # 구체적인 오류 메시지 제공
+        if "quota" in error_msg.lower() or "rate" in error_msg.lower():
+            return f"API Error: API 호출 한도 초과. 잠시 후 다시 시도해주세요."
+        elif "invalid" in error_msg.lower() and "api" in error_msg.lower():
+            return f"API Error: API 키가 유효하지 않습니다."
+        else:
+            return f"API Error: {error_msg}"
     
     def get_model_info(self):
         """현재 설정된 모델의 정보를 반환합니다."""
@@ -409,10 +1208,11 @@ class multimodalLLM:
             if api_key is None:
                 print(f"경고: provider가 {old_provider}에서 {self.provider}로 변경되었습니다. API 키를 제공해야 합니다.")
                 return False
+            self.api_key = api_key
             
             if self.provider == "openai":
                 from openai import OpenAI
-                self.client = OpenAI(api_key=api_key)
+                self.client = OpenAI(api_key=api_key, max_retries=0)
             elif self.provider == "google":
                 import google.generativeai as genai
                 genai.configure(api_key=api_key)
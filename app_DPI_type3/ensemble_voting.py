@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+앙상블 투표 (여러 모델의 행동 단계 판정 합치기)
+모델별 promptbank_data의 check_action_step_DPI_type3를 모델 × 행동 × 시간 배열(VoteTable)로 모아
+평균 / 다수결 / confidence 평균을 NumPy 배열 연산으로 계산합니다.
+
+같은 모델이 같은 행동 / 시간에 여러 번 답한 경우(중복 기록)는 답변 수만큼 투표한 것으로 봅니다.
+
+투표 방식 (vote(table, strategy)로 선택)
+- majority: score 평균이 0.5 이상이면 YES (기본)
+- confidence_weighted: 답변마다 자신의 confidence를 가중치로 사용
+- reliability: 라벨이 있는 실행에서 학습한 모델별 정확도(learn_reliability)의 log-odds를 가중치로 사용
+
+quorum_members(table)는 투표 방식이 아닌 보고용 통계로, 모델을 앙상블 순서대로 더해 갈 때 다수결 결과가
+확정되는 모델 수를 계산합니다. (모든 모델이 답한 뒤에 계산하므로 호출을 줄이지는 않음, 앙상블 크기를 정할 때 참고용)
+"""
+
+import json
+import numpy as np
+
+
+DEFAULT_CONFIDENCE = 0.5  # confidence가 기록되지 않은 답변에 사용하는 값
+VOTING_STRATEGIES = ("majority", "confidence_weighted", "reliability")
+
+
+class VoteTable:
+    """
+    모델 × 행동 × 시간 투표 배열
+
+    Attributes:
+        model_ids: 모델 ID 목록 (축 0)
+        model_names: 모델 이름 목록 (reliability 가중치 조회에 사용)
+        action_keys: 행동 키 목록 (축 1)
+        times: 모든 행동에 등장한 시간의 합집합 (오름차순, 축 2)
+        counts: (모델, 행동, 시간)별 답변 수 (0이면 답변 없음)
+        score_sums: (모델, 행동, 시간)별 score(YES=1) 합
+        confidence_sums: (모델, 행동, 시간)별 confidence 합 (없으면 DEFAULT_CONFIDENCE로 채움)
+        descriptions: 행동 키별 action 설명 (처음 나온 모델 기준)
+    """
+
+    def __init__(self, model_ids, action_keys, times, counts, score_sums, confidence_sums, descriptions,
+                 model_names=None):
+        self.model_ids = model_ids
+        self.model_names = model_names or list(model_ids)
+        self.action_keys = action_keys
+        self.times = times
+        self.counts = counts
+        self.score_sums = score_sums
+        self.confidence_sums = confidence_sums
+        self.descriptions = descriptions
+
+    @classmethod
+    def from_model_results(cls, model_results: dict, section: str = "check_action_step_DPI_type3") -> "VoteTable":
+        """
+        state["model_results"]에서 투표 배열 생성
+
+        Args:
+            model_results: {model_id: {"promptbank_data": {section: {action_key: {...}}}}}
+            section: 사용할 PromptBank 섹션
+        """
+        model_ids = list(model_results.keys())
+        model_names = [result.get("model_name") or model_id for model_id, result in model_results.items()]
+        action_index = {}
+        descriptions = {}
+        # (모델, 행동) 구간별 길이와 평탄화한 값들 (배열 변환은 마지막에 한 번만)
+        segment_models, segment_actions, segment_lengths = [], [], []
+        times, scores = [], []
+        confidence_segments, confidence_lengths, confidence_times, confidence_values = [], [], [], []
+
+        for m, result in enumerate(model_results.values()):
+            check_action = (result.get("promptbank_data") or {}).get(section, {})
+            for action_key, action_data in check_action.items():
+                a = action_index.setdefault(action_key, len(action_index))
+                if not descriptions.get(action_key):
+                    descriptions[action_key] = action_data.get("action", "")
+                action_times = action_data.get("time", [])
+                n = len(action_times)
+                if n == 0:
+                    continue
+                action_scores = action_data.get("score", [])[:n]
+                segment_models.append(m)
+                segment_actions.append(a)
+                segment_lengths.append(n)
+                times.extend(action_times)
+                scores.extend(action_scores)
+                if len(action_scores) < n:
+                    scores.extend([0] * (n - len(action_scores)))  # score가 time보다 짧으면 나머지는 0으로 봄
+                pairs = action_data.get("confidence_score", [])
+                if pairs:
+                    pair_times, pair_values = zip(*pairs)
+                    confidence_segments.append((m, a))
+                    confidence_lengths.append(len(pairs))
+                    confidence_times.extend(pair_times)
+                    confidence_values.extend(pair_values)
+
+        shape_ma = (len(model_ids), len(action_index))
+        if not times:
+            empty = np.zeros(shape_ma + (0,))
+            return cls(model_ids, list(action_index), np.zeros(0), empty.astype(int), empty, empty, descriptions,
+                       model_names)
+
+        unique_times, time_idx = np.unique(np.asarray(times, dtype=float), return_inverse=True)
+        shape = shape_ma + (len(unique_times),)
+        flat = np.ravel_multi_index((
+            np.repeat(segment_models, segment_lengths), np.repeat(segment_actions, segment_lengths), time_idx
+        ), shape)
+        size = int(np.prod(shape))
+        counts = np.bincount(flat, minlength=size).reshape(shape)
+        score_sums = np.bincount(flat, weights=np.asarray(scores, dtype=float), minlength=size).reshape(shape)
+
+        # (모델, 행동, 시간)별 confidence (같은 시간이 여러 번 기록되었으면 마지막 값, 없으면 DEFAULT_CONFIDENCE)
+        confidence = np.full(shape, DEFAULT_CONFIDENCE)
+        if confidence_times:
+            confidence_times = np.asarray(confidence_times, dtype=float)
+            conf_idx = np.minimum(np.searchsorted(unique_times, confidence_times), len(unique_times) - 1)
+            known = unique_times[conf_idx] == confidence_times
+            conf_models, conf_actions = np.repeat(np.asarray(confidence_segments).reshape(-1, 2), confidence_lengths, axis=0).T
+            confidence[conf_models[known], conf_actions[known], conf_idx[known]] = np.asarray(confidence_values, dtype=float)[known]
+        confidence_sums = confidence * counts
+        return cls(model_ids, list(action_index), unique_times, counts, score_sums, confidence_sums, descriptions,
+                   model_names)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """(모델, 행동, 시간)별 답변 존재 여부"""
+        return self.counts > 0
+
+    @property
+    def answered(self) -> np.ndarray:
+        """(행동, 시간)별로 한 모델이라도 답했는지 여부"""
+        return self.counts.sum(axis=0) > 0
+
+    def mean_score(self) -> np.ndarray:
+        """(행동, 시간)별 score 평균 (답변 없는 칸은 0)"""
+        return _safe_divide(self.score_sums.sum(axis=0), self.counts.sum(axis=0), 0.0)
+
+    def mean_confidence(self) -> np.ndarray:
+        """(행동, 시간)별 confidence 평균 (답변 없는 칸은 DEFAULT_CONFIDENCE)"""
+        return _safe_divide(self.confidence_sums.sum(axis=0), self.counts.sum(axis=0), DEFAULT_CONFIDENCE)
+
+    def model_confidences(self) -> np.ndarray:
+        """(모델, 행동, 시간)별 그 모델의 confidence (답변 없는 칸은 0)"""
+        return _safe_divide(self.confidence_sums, self.counts, 0.0)
+
+    def label_array(self, labels: dict) -> np.ndarray:
+        """
+        정답 라벨을 (행동, 시간) 배열로 변환 (라벨 없는 칸은 -1)
+
+        Args:
+            labels: check_action_step_DPI_type3 형식 {action_key: {"time": [...], "score": [...]}}
+        """
+        label = np.full((len(self.action_keys), len(self.times)), -1, dtype=int)
+        if len(self.times) == 0:
+            return label
+        for a, action_key in enumerate(self.action_keys):
+            data = labels.get(action_key)
+            if not data:
+                continue
+            label_times = np.asarray(data.get("time", []), dtype=float)
+            label_scores = np.asarray(data.get("score", [])[:len(label_times)], dtype=int)
+            label_times = label_times[:len(label_scores)]
+            idx = np.minimum(np.searchsorted(self.times, label_times), len(self.times) - 1)
+            known = self.times[idx] == label_times
+            label[a, idx[known]] = label_scores[known]
+        return label
+
+    def to_promptbank(self, votes: np.ndarray, confidence: np.ndarray) -> dict:
+        """
+        (행동, 시간) 배열을 check_action_step_DPI_type3 형식으로 변환 (답변 없는 시간은 제외)
+
+        Args:
+            votes: (행동, 시간)별 최종 score (0/1)
+            confidence: (행동, 시간)별 confidence
+        """
+        answered = self.answered
+        result = {}
+        for a, action_key in enumerate(self.action_keys):
+            columns = answered[a]
+            times = self.times[columns].tolist()
+            result[action_key] = {
+                "action": self.descriptions.get(action_key) or "",
+                "time": times,
+                "score": votes[a, columns].astype(int).tolist(),
+                "confidence_score": list(zip(times, np.round(confidence[a, columns], 2).tolist())),
+            }
+        return result
+
+
+def majority_vote(table: VoteTable) -> dict:
+    """score 평균이 0.5 이상이면 1 (기본 방식), confidence는 단순 평균"""
+    votes = table.mean_score() >= 0.5
+    return table.to_promptbank(votes, table.mean_confidence())
+
+
+def confidence_weighted_vote(table: VoteTable) -> dict:
+    """
+    답변마다 confidence를 가중치로 사용한 가중 평균이 0.5 이상이면 1
+    (confidence가 모두 0인 칸은 단순 평균 사용)
+    """
+    yes_weight = (table.model_confidences() * table.score_sums).sum(axis=0)
+    total_weight = table.confidence_sums.sum(axis=0)
+    votes = np.where(total_weight > 0, yes_weight >= 0.5 * total_weight, table.mean_score() >= 0.5)
+    return table.to_promptbank(votes, table.mean_confidence())
+
+
+def reliability_weights(table: VoteTable, reliability: dict) -> np.ndarray:
+    """
+    모델별 정확도를 투표 가중치 log(p / (1 - p))로 변환 (독립 투표자의 최적 가중 다수결)
+    정확도 0.5 이하(우연 수준)인 모델은 가중치 0, 학습 기록이 없는 모델은 아는 모델의 평균 가중치 사용
+    """
+    known = np.array([name in reliability for name in table.model_names], dtype=bool)
+    accuracy = np.array([reliability.get(name, 0.5) for name in table.model_names], dtype=float)
+    accuracy = np.clip(accuracy, 0.5, 0.99)
+    weights = np.log(accuracy / (1.0 - accuracy))
+    default = weights[known].mean() if known.any() else 1.0
+    return np.where(known, weights, default)
+
+
+def reliability_vote(table: VoteTable, reliability: dict) -> dict:
+    """
+    모델별 reliability 가중치로 가중 다수결 (가중치 합이 0인 칸은 단순 평균 사용)
+
+    Args:
+        reliability: {모델 이름: 정확도} (learn_reliability() 결과)
+    """
+    weights = reliability_weights(table, reliability)[:, None, None]
+    margin = (weights * (2 * table.score_sums - table.counts)).sum(axis=0)
+    total_weight = (weights * table.counts).sum(axis=0)
+    votes = np.where(total_weight > 0, margin >= 0, table.mean_score() >= 0.5)
+    return table.to_promptbank(votes, table.mean_confidence())
+
+
+def quorum_members(table: VoteTable) -> np.ndarray:
+    """
+    모델을 앙상블 순서(축 0)대로 하나씩 더할 때 다수결 결과가 확정되는 모델 수 (행동, 시간별, 답변 없는 칸은 0)
+    남은 모델이 모두 반대로 답해도 결과가 바뀌지 않으면 확정으로 봄
+    모든 모델의 답변으로 계산하는 보고용 사후 통계 (투표 방식이 아니며, 분석 중에 남은 모델을 멈추지 않음)
+    """
+    total = table.counts.sum(axis=0)
+    yes_so_far = np.cumsum(table.score_sums, axis=0)
+    answered_so_far = np.cumsum(table.counts, axis=0)
+    decided = (yes_so_far >= 0.5 * total) | (yes_so_far + (total - answered_so_far) < 0.5 * total)
+    members = decided.argmax(axis=0) + 1
+    return np.where(total > 0, members, 0)
+
+
+def vote(table: VoteTable, strategy: str = "majority", reliability: dict = None) -> tuple:
+    """
+    선택한 방식으로 투표
+
+    Args:
+        table: 투표 배열
+        strategy: VOTING_STRATEGIES 중 하나
+        reliability: strategy="reliability"일 때 사용할 {모델 이름: 정확도}
+
+    Returns:
+        (check_action_step_DPI_type3 형식 결과, 투표 요약 딕셔너리)
+    """
+    summary = {"strategy": strategy, "ensemble_size": len(table.model_ids)}
+    if strategy == "majority":
+        return majority_vote(table), summary
+    if strategy == "confidence_weighted":
+        return confidence_weighted_vote(table), summary
+    if strategy == "reliability":
+        if not reliability:
+            raise ValueError("reliability 투표에는 모델별 정확도(reliability)가 필요합니다.")
+        weights = reliability_weights(table, reliability)
+        summary["weights"] = {
+            model_id: round(float(w), 3) for model_id, w in zip(table.model_ids, weights)
+        }
+        return reliability_vote(table, reliability), summary
+    raise ValueError(f"알 수 없는 투표 방식: {strategy} (가능: {', '.join(VOTING_STRATEGIES)})")
+
+
+def learn_reliability(labelled_runs, prior: float = 1.0) -> dict:
+    """
+    라벨이 있는 실행들에서 모델 이름별 정확도 학습
+
+    Args:
+        labelled_runs: (model_results, labels) 목록
+            model_results: state["model_results"]
+            labels: check_action_step_DPI_type3 형식 정답 {action_key: {"time": [...], "score": [...]}}
+        prior: 라플라스 평활화 값 (표본이 적은 모델의 정확도를 0.5 쪽으로 당김)
+
+    Returns:
+        {모델 이름: 정확도}
+    """
+    correct = {}
+    total = {}
+    for model_results, labels in labelled_runs:
+        table = VoteTable.from_model_results(model_results)
+        label = table.label_array(labels)
+        prediction = _safe_divide(table.score_sums, table.counts, 0.0) >= 0.5
+        scored = table.mask & (label >= 0)
+        hits = (scored & (prediction == (label == 1))).sum(axis=(1, 2))
+        samples = scored.sum(axis=(1, 2))
+        for name, hit, n in zip(table.model_names, hits, samples):
+            correct[name] = correct.get(name, 0) + int(hit)
+            total[name] = total.get(name, 0) + int(n)
+    return {
+        name: round((correct[name] + prior) / (total[name] + 2 * prior), 4) for name in total
+    }
+
+
+def save_reliability(reliability: dict, output_path: str):
+    """학습한 모델별 정확도를 JSON 파일로 저장"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(reliability, f, ensure_ascii=False, indent=2)
+
+
+def load_reliability(path: str) -> dict:
+    """save_reliability()로 저장한 모델별 정확도 읽기"""
+    with open(path, "r", encoding="utf-8") as f:
+        return {name: float(value) for name, value in json.load(f).items()}
+
+
+def average_reference_times(model_results: dict) -> tuple:
+    """
+    모델별 기준 시간 평균
+
+    Returns:
+        (reference_times_avg, search_reference_time_avg)
+    """
+    reference_values = {}
+    for result in model_results.values():
+        for key, value in result.get("reference_times", {}).items():
+            reference_values.setdefault(key, []).append(value)
+    reference_times_avg = {
+        key: round(float(np.mean(values)), 1) for key, values in reference_values.items()
+    }
+
+    search_values = {}
+    actions = {}
+    for result in model_results.values():
+        search_ref = (result.get("promptbank_data") or {}).get("search_reference_time", {})
+        for key, data in search_ref.items():
+            search_values.setdefault(key, []).append(data.get("reference_time", 0))
+            if key not in actions:
+                actions[key] = data.get("action", "")
+    search_reference_time_avg = {
+        key: {"action": actions[key] or "", "reference_time": round(float(np.mean(values)), 1)}
+        for key, values in search_values.items()
+    }
+    return reference_times_avg, search_reference_time_avg
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray, fill: float) -> np.ndarray:
+    out = np.full(np.broadcast(numerator, denominator).shape, fill, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
@@ -6,7 +6,10 @@ LangGraph Workflow 정의
 Multi-Agent 워크플로우를 구성합니다. (동적 모델 지원)
 """
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
+import tracing
 from agents.state import VideoAnalysisState
 from agents.video_processor_agent import VideoProcessorAgent
 from agents.video_analyzer_agent import VideoAnalyzerAgent
@@ -20,17 +23,62 @@ class InhalerAnalysisWorkflow:
     워크플로우:
     1. VideoProcessor: 비디오 메타데이터 추출
     2. VideoAnalyzer (병렬):
-       - 리스트로 지정된 모델 개수만큼 병렬 실행
+       - 앙상블 모델마다 작업을 Send로 분배하여 하나의 analyzer 노드에서 실행
+       - 동시에 실행되는 analyzer 수는 max_analyzer_workers로 제한
     3. Reporter: 결과 취합 및 평균값 시각화
+    
+    한 번 생성(컴파일)한 워크플로우를 여러 비디오에 재사용할 수 있습니다.
+    Agent들은 실행별 상태를 갖지 않으므로 run()/arun()을 여러 스레드/태스크에서 동시에 호출해도 됩니다.
     """
     
-    def __init__(self, mllm_instances: list, llm_models: list):
+    def __init__(self, mllm_instances: list, llm_models: list, speculative_windows: int = 1,
+                 search_strategy: str = "linear", show_visualization: bool = True,
+                 max_analyzer_workers: int = 8, pipeline_detectors: bool = False, combined_query: bool = False,
+                 voting_strategy: str = "majority", model_reliability: dict = None, use_proxy: bool = False,
+                 use_frame_store: bool = False, use_frame_index: bool = False, frame_index_dir: str = None):
         """
         워크플로우 초기화
         
         Args:
             mllm_instances: Multimodal LLM 인스턴스 리스트
             llm_models: 사용할 LLM 모델 이름 리스트 (예: ["gpt-4o", "gpt-4o-mini", ...])
+            speculative_windows: 기준 시간 탐색 시 미리 동시에 질의할 구간 수 (1이면 순차 탐색)
+            search_strategy: 기준 시간 탐색 전략 ("linear" 또는 "coarse_to_fine")
+            show_visualization: 결과 시각화를 브라우저에서도 표시할지 여부 (배치 실행 시 False)
+            max_analyzer_workers: 동시에 실행할 analyzer 작업 수 상한 (나머지 모델은 대기 후 실행)
+            pipeline_detectors: 이전 기준 시점의 후보가 나오면 다음 기준 시점 탐지를 미리 시작할지 여부
+            combined_query: 구간 길이가 같은 기준 시점 질의를 구간마다 한 번의 LLM 호출로 묻는 통합 질의 모드 여부
+            voting_strategy: 앙상블 투표 방식 ("majority", "confidence_weighted", "reliability")
+            model_reliability: reliability 투표에 사용할 {모델 이름: 정확도}
+            use_proxy: 비디오마다 저해상도 프록시를 한 번 만들고 프레임 추출에 사용할지 여부
+            use_frame_store: 비디오마다 프레임을 한 번 디코딩해 메모리 맵 저장소에 쓰고 analyzer가 공유할지 여부
+            use_frame_index: 프레임 색인(PTS/키프레임)으로 시간 -> 프레임 변환 및 탐색할지 여부
+            frame_index_dir: 프레임 색인을 저장해 다음 실행에서 재사용할 캐시 폴더 (None이면 메모리에만 보관)
+        """
+        self.speculative_windows = speculative_windows
+        self.search_strategy = search_strategy
+        self.pipeline_detectors = pipeline_detectors
+        self.combined_query = combined_query
+        self.max_analyzer_workers = max(1, max_analyzer_workers)
+        
+        # Agent 초기화
+        self.video_processor = VideoProcessorAgent(use_proxy=use_proxy, use_frame_store=use_frame_store,
+                                                   use_frame_index=use_frame_index, frame_index_dir=frame_index_dir)
+        self.set_models(mllm_instances, llm_models)
+        self.reporter = ReporterAgent(show_visualization=show_visualization, voting_strategy=voting_strategy,
+                                      model_reliability=model_reliability)
+        
+        # 워크플로우 그래프 생성 (모델 수와 무관하게 노드 3개)
+        self.workflow = self._create_workflow()
+        self.app = self.workflow.compile()
+    
+    def set_models(self, mllm_instances: list, llm_models: list):
+        """
+        앙상블 모델 구성 변경 (그래프를 다시 컴파일하지 않음)
+        
+        Args:
+            mllm_instances: Multimodal LLM 인스턴스 리스트
+            llm_models: 사용할 LLM 모델 이름 리스트
         """
         if len(mllm_instances) != len(llm_models):
             raise ValueError("mllm_instances와 llm_models의 개수가 일치해야 합니다.")
@@ -38,26 +86,21 @@ class InhalerAnalysisWorkflow:
         self.mllm_instances = mllm_instances
         self.llm_models = llm_models
         
-        # Agent 초기화
-        self.video_processor = VideoProcessorAgent()
-        
         # 동적으로 VideoAnalyzerAgent 생성
         self.video_analyzers = []
         self.analyzer_nodes = {}
         for idx, (mllm, model_name) in enumerate(zip(mllm_instances, llm_models)):
             model_id = f"{model_name}_{idx}"
-            analyzer = VideoAnalyzerAgent(mllm, self.video_processor, model_id, model_name)
+            analyzer = VideoAnalyzerAgent(mllm, self.video_processor, model_id, model_name,
+                                          speculative_windows=self.speculative_windows,
+                                          search_strategy=self.search_strategy,
+                                          pipeline_detectors=self.pipeline_detectors,
+                                          combined_query=self.combined_query)
             self.video_analyzers.append(analyzer)
             self.analyzer_nodes[model_id] = analyzer
-        
-        self.reporter = ReporterAgent()
-        
-        # 워크플로우 그래프 생성
-        self.workflow = self._create_workflow()
-        self.app = self.workflow.compile()
     
     def _create_workflow(self):
-        """LangGraph 워크플로우 생성 (병렬 처리, 동적 노드)"""
+        """LangGraph 워크플로우 생성 (Send 기반 동적 분배)"""
         
         # StateGraph 생성
         workflow = StateGraph(VideoAnalysisState)
@@ -65,10 +108,8 @@ class InhalerAnalysisWorkflow:
         # 1. VideoProcessor 노드 추가
         workflow.add_node("video_processor", self._video_processor_node)
         
-        # 2. 동적으로 VideoAnalyzer 노드들 추가
-        for model_id, analyzer in self.analyzer_nodes.items():
-            node_name = f"video_analyzer_{model_id}"
-            workflow.add_node(node_name, self._create_analyzer_node(analyzer, model_id))
+        # 2. VideoAnalyzer 노드 (모든 앙상블 모델이 공유하는 작업 노드)
+        workflow.add_node("video_analyzer", self._create_analyzer_node())
         
         # 3. Reporter 노드 추가
         workflow.add_node("reporter", self._reporter_node)
@@ -76,42 +117,61 @@ class InhalerAnalysisWorkflow:
         # 엣지 추가 (워크플로우 순서)
         workflow.set_entry_point("video_processor")
         
-        # 병렬 실행: video_processor -> 모든 analyzer가 병렬로 실행
-        for model_id in self.analyzer_nodes.keys():
-            node_name = f"video_analyzer_{model_id}"
-            workflow.add_edge("video_processor", node_name)
+        # 병렬 실행: video_processor -> 모델마다 video_analyzer 작업 하나씩 분배
+        workflow.add_conditional_edges("video_processor", self._dispatch_analyzers, ["video_analyzer"])
         
-        # 모든 analyzer 결과를 reporter로 전달
-        for model_id in self.analyzer_nodes.keys():
-            node_name = f"video_analyzer_{model_id}"
-            workflow.add_edge(node_name, "reporter")
+        # 모든 analyzer 작업이 끝나면 reporter로 전달
+        workflow.add_edge("video_analyzer", "reporter")
         
         workflow.add_edge("reporter", END)
         
         return workflow
     
-    def _video_processor_node(self, state: VideoAnalysisState) -> VideoAnalysisState:
-        """비디오 처리 노드"""
+    def _dispatch_analyzers(self, state: VideoAnalysisState) -> list:
+        """앙상블 모델마다 analyzer 작업(Send) 생성"""
+        return [Send("video_analyzer", {**state, "model_id": model_id}) for model_id in self.analyzer_nodes]
+    
+    def _video_processor_node(self, state: VideoAnalysisState) -> dict:
+        """비디오 처리 노드 (상태 변경분만 반환)"""
         print("\n" + "="*50)
         print("=== 1. Video Processor Agent 실행 ===")
         print("="*50)
-        return self.video_processor.process(state)
+        with tracing.span("video_processor", video_path=state["video_path"]) as node_span:
+            update = self.video_processor.process(state)
+            node_span.set_attribute("status", update.get("status"))
+            return update
     
-    def _create_analyzer_node(self, analyzer, model_id):
-        """동적으로 Analyzer 노드 함수 생성"""
-        def analyzer_node(state: VideoAnalysisState) -> VideoAnalysisState:
+    def _create_analyzer_node(self):
+        """Analyzer 작업 노드 생성 (invoke는 동기 함수, ainvoke는 비동기 함수 사용, 상태 변경분만 반환)"""
+        def analyzer_node(state: dict) -> dict:
+            model_id = state["model_id"]
             print("\n" + "="*50)
             print(f"=== 2. Video Analyzer Agent ({model_id}) 실행 ===")
             print("="*50)
-            return analyzer.process(state)
-        return analyzer_node
+            analyzer = self.analyzer_nodes[model_id]
+            with tracing.span(f"video_analyzer_{model_id}", model=analyzer.model_name, model_id=model_id):
+                return analyzer.process(state)
+        
+        async def analyzer_node_async(state: dict) -> dict:
+            model_id = state["model_id"]
+            print("\n" + "="*50)
+            print(f"=== 2. Video Analyzer Agent ({model_id}) 비동기 실행 ===")
+            print("="*50)
+            analyzer = self.analyzer_nodes[model_id]
+            with tracing.span(f"video_analyzer_{model_id}", model=analyzer.model_name, model_id=model_id):
+                return await analyzer.aprocess(state)
+        
+        return RunnableLambda(analyzer_node, afunc=analyzer_node_async, name="video_analyzer")
     
-    def _reporter_node(self, state: VideoAnalysisState) -> VideoAnalysisState:
-        """리포트 생성 노드"""
+    def _reporter_node(self, state: VideoAnalysisState) -> dict:
+        """리포트 생성 노드 (상태 변경분만 반환)"""
         print("\n" + "="*50)
         print("=== 3. Reporter Agent 실행 ===")
         print("="*50)
-        return self.reporter.process(state)
+        with tracing.span("reporter", num_models=len(state.get("model_results", {}))) as node_span:
+            update = self.reporter.process(state)
+            node_span.set_attribute("status", update.get("status"))
+            return update
     
     def run(self, initial_state: VideoAnalysisState) -> VideoAnalysisState:
         """
@@ -127,9 +187,42 @@ class InhalerAnalysisWorkflow:
         print("### LangGraph Multi-Agent 워크플로우 시작 ###")
         print("#"*50)
         
-        # 워크플로우 실행
-        final_state = self.app.invoke(initial_state)
+        # 워크플로우 실행 (동시에 실행되는 analyzer 작업 수 제한, 추적이 켜져 있으면 전체를 하나의 trace로 기록)
+        with tracing.span("workflow", video_path=initial_state["video_path"], num_models=len(self.llm_models)) as run_span:
+            final_state = self.app.invoke(initial_state, config=self._run_config())
+            run_span.set_attribute("status", final_state.get("status"))
+        
+        self._print_completion(final_state)
+        return final_state
+    
+    async def arun(self, initial_state: VideoAnalysisState) -> VideoAnalysisState:
+        """
+        워크플로우 비동기 실행
+        Analyzer 노드의 LLM 질의를 하나의 이벤트 루프에서 비동기로 수행합니다.
         
+        Args:
+            initial_state: 초기 상태
+            
+        Returns:
+            최종 상태
+        """
+        print("\n" + "#"*50)
+        print("### LangGraph Multi-Agent 워크플로우 비동기 시작 ###")
+        print("#"*50)
+        
+        with tracing.span("workflow", video_path=initial_state["video_path"], num_models=len(self.llm_models)) as run_span:
+            final_state = await self.app.ainvoke(initial_state, config=self._run_config())
+            run_span.set_attribute("status", final_state.get("status"))
+        
+        self._print_completion(final_state)
+        return final_state
+    
+    def _run_config(self) -> dict:
+        """그래프 실행 설정 (analyzer 작업 동시 실행 상한)"""
+        return {"max_concurrency": self.max_analyzer_workers}
+    
+    def _print_completion(self, final_state: VideoAnalysisState):
+        """워크플로우 완료 메시지 및 오류 출력"""
         print("\n" + "#"*50)
         print("### LangGraph Multi-Agent 워크플로우 완료 ###")
         print("#"*50)
@@ -139,8 +232,6 @@ class InhalerAnalysisWorkflow:
             print("\n[경고] 다음 오류가 발생했습니다:")
             for error in final_state["errors"]:
                 print(f"  - {error}")
-        
-        return final_state
     
     def visualize_workflow(self, output_path: str = "workflow_diagram.png"):
         """
@@ -159,16 +250,37 @@ class InhalerAnalysisWorkflow:
             print(f"워크플로우 시각화 실패: {e}")
 
 
-def create_workflow(mllm_instances: list, llm_models: list) -> InhalerAnalysisWorkflow:
+def create_workflow(mllm_instances: list, llm_models: list, speculative_windows: int = 1,
+                    search_strategy: str = "linear", show_visualization: bool = True,
+                    max_analyzer_workers: int = 8, pipeline_detectors: bool = False,
+                    combined_query: bool = False, voting_strategy: str = "majority",
+                    model_reliability: dict = None, use_proxy: bool = False,
+                    use_frame_store: bool = False, use_frame_index: bool = False,
+                    frame_index_dir: str = None) -> InhalerAnalysisWorkflow:
     """
     워크플로우 생성 헬퍼 함수
     
     Args:
         mllm_instances: Multimodal LLM 인스턴스 리스트
         llm_models: 사용할 LLM 모델 이름 리스트 (예: ["gpt-4o", "gpt-4o-mini", ...])
+        speculative_windows: 기준 시간 탐색 시 미리 동시에 질의할 구간 수 (1이면 순차 탐색)
+        search_strategy: 기준 시간 탐색 전략 ("linear" 또는 "coarse_to_fine")
+        show_visualization: 결과 시각화를 브라우저에서도 표시할지 여부 (배치 실행 시 False)
+        max_analyzer_workers: 동시에 실행할 analyzer 작업 수 상한
+        pipeline_detectors: 기준 시점 탐지 간 파이프라인 실행 여부
+        combined_query: 구간별 통합 질의 모드 여부
+        voting_strategy: 앙상블 투표 방식
+        model_reliability: reliability 투표에 사용할 {모델 이름: 정확도}
+        use_proxy: 저해상도 프록시에서 프레임 추출 여부
+        use_frame_store: 디코딩된 프레임 저장소(메모리 맵) 사용 여부
+        use_frame_index: 프레임 색인(PTS/키프레임) 사용 여부
+        frame_index_dir: 프레임 색인 캐시 폴더 (None이면 메모리에만 보관)
         
     Returns:
         InhalerAnalysisWorkflow 인스턴스
     """
-    return InhalerAnalysisWorkflow(mllm_instances, llm_models)
+    return InhalerAnalysisWorkflow(mllm_instances, llm_models, speculative_windows, search_strategy,
+                                   show_visualization, max_analyzer_workers, pipeline_detectors, combined_query,
+                                   voting_strategy, model_reliability, use_proxy, use_frame_store,
+                                   use_frame_index, frame_index_dir)
 
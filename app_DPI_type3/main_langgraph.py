@@ -20,10 +20,44 @@ google_api_key = os.getenv("GOOGLE_API_KEY")
 # Google Gemini 모델 사용 시 google_api_key 필요
 
 import class_MultimodalLLM_QA_251107 as mLLM
+import stage_metrics
 from agents.state import create_initial_state
 from graph_workflow import create_workflow
 
 
+def create_mllm_instances(llm_models: list, response_cache=None) -> list:
+    """
+    모델 리스트의 각 모델에 대해 provider에 맞는 API 키로 multimodalLLM 인스턴스 생성
+    
+    Args:
+        llm_models: 모델 이름 리스트
+        response_cache: LLM 응답 디스크 캐시 (None이면 사용 안 함)
+        
+    Returns:
+        multimodalLLM 인스턴스 리스트
+    """
+    # 각 모델의 provider에 따라 적절한 API 키 사용
+    mllm_instances = []
+    for model_name in llm_models:
+        # 모델명으로 provider 판단
+        if "gemini" in model_name:
+            if not google_api_key:
+                raise ValueError(
+                    f"Google Gemini 모델({model_name})을 사용하려면 GOOGLE_API_KEY가 필요합니다.\n"
+                    ".env 파일에 'GOOGLE_API_KEY=your-key' 형식으로 추가하세요.\n"
+                    "API 키 발급: https://aistudio.google.com/app/apikey"
+                )
+            mllm_instances.append(mLLM.multimodalLLM(llm_name=model_name, api_key=google_api_key, response_cache=response_cache))
+        else:  # OpenAI 모델 (gpt-4o, gpt-5 등)
+            if not openai_api_key:
+                raise ValueError(
+                    f"OpenAI 모델({model_name})을 사용하려면 OPENAI_API_KEY가 필요합니다.\n"
+                    ".env 파일에 'OPENAI_API_KEY=your-key' 형식으로 추가하세요."
+                )
+            mllm_instances.append(mLLM.multimodalLLM(llm_name=model_name, api_key=openai_api_key, response_cache=response_cache))
+    return mllm_instances
+
+
 def main():
     """
     메인 실행 함수
@@ -50,29 +84,19 @@ def main():
     
     llm_models = ["gemini-2.5-pro"]
     
+    # LLM 응답 디스크 캐시: 같은 비디오/프롬프트/파라미터로 다시 실행하면 API 호출 없이 캐시된 응답 사용
+    use_response_cache = True
+    response_cache = None
+    if use_response_cache:
+        response_cache = mLLM.LLMResponseCache(
+            db_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_response_cache.sqlite")
+        )
+    
     print(f"LLM 모델 초기화 ({len(llm_models)}개):")
     for idx, model_name in enumerate(llm_models):
         print(f"  {idx+1}. {model_name}")
     
-    # 각 모델의 provider에 따라 적절한 API 키 사용
-    mllm_instances = []
-    for model_name in llm_models:
-        # 모델명으로 provider 판단
-        if "gemini" in model_name:
-            if not google_api_key:
-                raise ValueError(
-                    f"Google Gemini 모델({model_name})을 사용하려면 GOOGLE_API_KEY가 필요합니다.\n"
-                    ".env 파일에 'GOOGLE_API_KEY=your-key' 형식으로 추가하세요.\n"
-                    "API 키 발급: https://aistudio.google.com/app/apikey"
-                )
-            mllm_instances.append(mLLM.multimodalLLM(llm_name=model_name, api_key=google_api_key))
-        else:  # OpenAI 모델 (gpt-4o, gpt-5 등)
-            if not openai_api_key:
-                raise ValueError(
-                    f"OpenAI 모델({model_name})을 사용하려면 OPENAI_API_KEY가 필요합니다.\n"
-                    ".env 파일에 'OPENAI_API_KEY=your-key' 형식으로 추가하세요."
-                )
-            mllm_instances.append(mLLM.multimodalLLM(llm_name=model_name, api_key=openai_api_key))
+    mllm_instances = create_mllm_instances(llm_models, response_cache=response_cache)
     
     # ========================================
     # 비디오 파일 설정
@@ -117,6 +141,18 @@ def main():
         
         print(f"\n총 {len(final_state['agent_logs'])}개의 Agent 로그가 기록되었습니다.")
         
+        if response_cache is not None:
+            cache_stats = response_cache.get_stats()
+            print(f"LLM 응답 캐시: hit {cache_stats['hits']}회, miss {cache_stats['misses']}회, {cache_stats['entries']}개 저장")
+        
+        if final_state.get("metrics"):
+            # 단계별 소요 시간/토큰 계측 결과 (구간/탐지/모델별 상세는 JSON 파일로 저장)
+            print(f"단계별 계측 합계: {final_state['metrics']['video']}")
+            metrics_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        f"metrics_{final_state['video_info']['video_name']}.json")
+            stage_metrics.export_metrics(final_state, metrics_path)
+            print(f"계측 결과 저장: {metrics_path}")
+        
     else:
         print("\n❌ 분석 중 오류가 발생했습니다.")
         if final_state.get("errors"):
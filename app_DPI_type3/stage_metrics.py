@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+단계별 소요 시간 / 토큰 계측
+현재 작업(구간 질의, 기준 시점 탐지 등)의 기록기(StageMetrics)를 recording()으로 지정하면,
+하위 모듈(MediaEdit, multimodalLLM, FrameGridCache)이 디코딩/리사이즈/인코딩 시간, API 지연,
+토큰 수, 재시도 횟수 등을 그 기록기에 더합니다. 기록기가 지정되지 않았으면 아무것도 하지 않습니다.
+
+기록기는 contextvars로 전달되므로 asyncio 태스크와 asyncio.to_thread()에는 자동으로 이어지고,
+ThreadPoolExecutor 작업에서는 작업 함수 안에서 recording()을 다시 지정해야 합니다.
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# 구간 기록 / 합계에 사용하는 지표 (단위: *_ms는 밀리초, 나머지는 개수)
+METRIC_KEYS = (
+    "decode_ms",             # 프레임 디코딩 (grab/retrieve/seek)
+    "resize_ms",             # 그리드 합성 (셀별 리사이즈)
+    "encode_ms",             # JPEG 인코딩
+    "rate_limit_wait_ms",    # 속도 제한기 대기
+    "api_ms",                # provider API 호출 지연 (재시도 포함)
+    "api_calls",             # API 호출 시도 수
+    "window_queries",        # 기준 시간 탐색에서 새로 보낸 구간 질의 수 (memo로 공유받은 구간 제외)
+    "retries",               # 재시도 수
+    "prompt_tokens",         # 입력 토큰
+    "completion_tokens",     # 출력 토큰
+    "frame_cache_hits",      # 프레임 그리드 캐시 적중
+    "response_cache_hits",   # LLM 응답 캐시 적중
+    "pipelined_hits",        # 파이프라인 모드에서 투기적 탐지의 질의를 재사용한 구간
+    "speculative_errors",    # 파이프라인 모드에서 오류로 끝난 투기적 탐지
+)
+
+_current = ContextVar("stage_metrics", default=None)
+
+
+class StageMetrics:
+    """한 작업 단위의 지표 합계 (thread-safe)"""
+
+    def __init__(self):
+        self.values = {}
+        self.windows = []  # 구간별 기록 (탐지 단위 기록기에서 사용)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, value):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def add_window(self, record: dict):
+        with self._lock:
+            self.windows.append(record)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {key: _round(value) for key, value in self.values.items()}
+
+
+@contextmanager
+def recording(metrics: StageMetrics):
+    """with 블록 안에서 기록되는 지표를 metrics에 모음 (metrics가 None이면 기록 중단)"""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """현재 기록기 반환 (없으면 None)"""
+    return _current.get()
+
+
+def record(key: str, value):
+    """현재 기록기에 값 더하기"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(key, value)
+
+
+@contextmanager
+def timed(key: str):
+    """with 블록의 소요 시간(ms)을 현재 기록기의 key에 더함"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(key, (time.perf_counter() - start) * 1000.0)
+
+
+def summarize(records: list) -> dict:
+    """기록(dict)들의 지표를 키별로 합산"""
+    totals = {}
+    for record_values in records:
+        for key, value in record_values.items():
+            if key in METRIC_KEYS or key.endswith("_ms"):
+                totals[key] = totals.get(key, 0) + value
+    return {key: _round(value) for key, value in totals.items()}
+
+
+def export_metrics(final_state: dict, output_path: str):
+    """
+    워크플로우 최종 상태의 계측 결과를 JSON 파일로 저장
+
+    Args:
+        final_state: 워크플로우 최종 상태
+        output_path: 저장할 JSON 파일 경로
+    """
+    data = {
+        "video_path": final_state.get("video_path"),
+        "metrics": final_state.get("metrics"),
+        "models": {
+            model_id: result.get("metrics")
+            for model_id, result in (final_state.get("model_results") or {}).items()
+        },
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+워크플로우 추적(tracing) 스팬
+video_processor, video_analyzer_<model_id>, 구간 질의, reporter 단계에 스팬을 남겨
+디코딩 / 인코딩 / provider 지연 중 어디서 시간이 걸리는지 flame graph로 볼 수 있게 합니다.
+
+기본은 꺼져 있으며(아무것도 기록하지 않음) configure_tracing()으로 켭니다.
+- 파일 출력: OTLP JSON 필드 이름(traceId, spanId, parentSpanId, ...)을 따르는 스팬을 한 줄씩 JSONL로 저장
+  (OTLP 수집기 대신 사용, export_chrome_trace()로 chrome://tracing / Perfetto 형식 변환)
+- OpenTelemetry: opentelemetry 패키지가 설치되어 있으면 전역 TracerProvider로 스팬을 보냄
+  (OTLP exporter 등 provider 설정은 호출하는 쪽에서 함)
+
+현재 스팬은 contextvars로 전달되므로 asyncio 태스크에는 자동으로 이어지고,
+ThreadPoolExecutor 작업에서는 start_span(parent=...)로 부모를 직접 넘겨야 합니다.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current_span = ContextVar("tracing_span", default=None)
+_tracer = None  # 활성화된 추적기 (None이면 추적 안 함)
+
+
+class Span:
+    """하나의 추적 구간 (end()를 호출해야 기록됨)"""
+
+    def __init__(self, tracer, name: str, parent, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        # flame graph에서 같은 줄(lane)에 그릴 단위: 최상위 스팬의 직계 자식(노드) 기준
+        if parent is None or parent.parent_span_id is None:
+            self.lane = name
+        else:
+            self.lane = parent.lane
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self._otel_span = tracer.start_backend_span(self, parent)
+        self.set_attributes(attributes)
+
+    def set_attribute(self, key: str, value):
+        if value is None:
+            return
+        if not isinstance(value, (str, bool, int, float)):
+            value = str(value)
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def set_attributes(self, attributes: dict):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.set_attribute("latency_ms", round((self.end_ns - self.start_ns) / 1e6, 2))
+        self.tracer.end_backend_span(self)
+
+
+class _NoopSpan:
+    """추적이 꺼져 있을 때 사용하는 빈 스팬"""
+    trace_id = None
+    span_id = None
+    parent_span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class FileSpanExporter:
+    """끝난 스팬을 JSONL 파일에 한 줄씩 추가 (여러 스레드에서 호출 가능)"""
+
+    def __init__(self, output_path: str, service_name: str):
+        self.output_path = output_path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def start_backend_span(self, span, parent):
+        return None
+
+    def end_backend_span(self, span):
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_span_id,
+            "name": span.name,
+            "startTimeUnixNano": span.start_ns,
+            "endTimeUnixNano": span.end_ns,
+            "attributes": span.attributes,
+            "resource": {"service.name": self.service_name},
+            "lane": span.lane,
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class OpenTelemetrySpanExporter:
+    """opentelemetry의 전역 TracerProvider로 스팬을 보냄 (ID는 OpenTelemetry 스팬의 값을 사용)"""
+
+    def __init__(self, service_name: str):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(service_name)
+
+    def start_backend_span(self, span, parent):
+        parent_otel = getattr(parent, "_otel_span", None)
+        context = self._trace.set_span_in_context(parent_otel) if parent_otel is not None else None
+        otel_span = self._tracer.start_span(span.name, context=context, start_time=span.start_ns)
+        span_context = otel_span.get_span_context()
+        if span_context.is_valid:
+            span.trace_id = format(span_context.trace_id, "032x")
+            span.span_id = format(span_context.span_id, "016x")
+        return otel_span
+
+    def end_backend_span(self, span):
+        span._otel_span.end(end_time=span.end_ns)
+
+
+def configure_tracing(output_path: str = None, use_opentelemetry: bool = False,
+                      service_name: str = "inhaler-analysis"):
+    """
+    추적 켜기
+
+    Args:
+        output_path: 스팬을 저장할 JSONL 파일 경로 (use_opentelemetry=False일 때)
+        use_opentelemetry: opentelemetry 패키지로 스팬을 보낼지 여부 (설치되어 있지 않으면 파일 출력 사용)
+        service_name: 스팬에 기록할 서비스 이름
+    """
+    global _tracer
+    if use_opentelemetry:
+        try:
+            _tracer = OpenTelemetrySpanExporter(service_name)
+            return
+        except ImportError:
+            print("opentelemetry 패키지가 없어 파일로 스팬을 저장합니다.")
+    if output_path is None:
+        raise ValueError("스팬을 저장할 output_path가 필요합니다.")
+    _tracer = FileSpanExporter(output_path, service_name)
+
+
+def disable_tracing():
+    """추적 끄기"""
+    global _tracer
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def current_span():
+    """현재 스팬 반환 (없으면 None)"""
+    return _current_span.get()
+
+
+def start_span(name: str, parent=None, **attributes):
+    """
+    스팬 시작 (끝낼 때 end() 호출). 추적이 꺼져 있으면 빈 스팬 반환
+    parent를 생략하면 현재 스팬을 부모로 사용
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    if parent is None:
+        parent = _current_span.get()
+    if isinstance(parent, _NoopSpan):
+        parent = None
+    return Span(tracer, name, parent, attributes)
+
+
+@contextmanager
+def span(name: str, parent=None, **attributes):
+    """with 블록을 스팬으로 기록하고, 블록 안에서는 이 스팬을 현재 스팬으로 지정"""
+    current = start_span(name, parent, **attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set_attribute("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+@contextmanager
+def use_span(current):
+    """이미 시작한 스팬을 with 블록 안에서 현재 스팬으로 지정 (끝내지는 않음)"""
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+
+
+def export_chrome_trace(trace_path: str, output_path: str):
+    """
+    JSONL 스팬 파일을 Chrome trace 형식(chrome://tracing, Perfetto에서 flame graph로 보기)으로 변환
+
+    Args:
+        trace_path: configure_tracing(output_path=...)로 저장한 JSONL 파일
+        output_path: 저장할 Chrome trace JSON 파일 경로
+    """
+    events = []
+    trace_ids = {}
+    lane_ids = {}
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            pid = trace_ids.setdefault(record["traceId"], len(trace_ids) + 1)
+            tid = lane_ids.setdefault((pid, record.get("lane")), len(lane_ids) + 1)
+            events.append({
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["startTimeUnixNano"] / 1000.0,
+                "dur": (record["endTimeUnixNano"] - record["startTimeUnixNano"]) / 1000.0,
+                "pid": pid,
+                "tid": tid,
+                "args": record.get("attributes", {}),
+            })
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": str(lane)}}
+        for (pid, lane), tid in lane_ids.items()
+    ]
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events}, f, ensure_ascii=False)